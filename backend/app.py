@@ -1,23 +1,18 @@
 import os
+import asyncio
+import time
 import traceback
 from pathlib import Path
 import shutil
 
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query
+from fastapi.responses import StreamingResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles      # ← ADD THIS
 from dotenv import load_dotenv
 
-from pypdf import PdfReader
-from pdf2image import convert_from_path
-import pytesseract
-
-from groq import Groq
-import faiss
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
 
 import socketio as _sio_module
 from routes.auth_routes import router as auth_router
@@ -28,6 +23,19 @@ from routes.deadline_routes import router as deadline_router
 from routes.call_routes import router as call_router
 from socket_manager import sio
 from routes.chat_routes import router as chat_router
+from routes.library_routes import router as library_router
+from services.vector_index_registry import index_registry
+from services.embedding_cache import embedding_cache
+from services.embedding_service import embedding_service
+from services.answer_cache import answer_cache
+from services.hybrid_retrieval import retrieval_stats
+from services.pdf_extraction import shutdown_pool as shutdown_pdf_pool
+from services.rag_models import readiness, start_background_warm_up
+from utils.streaming import STREAM_MEDIA_TYPES, format_stream_record
+from services.rag_service import (
+    extract_text, build_vector_store, retrieve_contexts, log_prompt_tokens,
+    generate_answers, schedule_answers,
+)
 
 # ================= CONFIG =================
 load_dotenv()
@@ -50,6 +58,7 @@ app.include_router(insights_router, prefix="/api")
 app.include_router(chat_router, prefix="/api")
 app.include_router(doubt_router, prefix="/api")
 app.include_router(combined_routes.router, prefix="/api")
+app.include_router(library_router, prefix="/api")
 
 # ✅ Serve uploaded files as static assets
 # Ensures /uploads/doubt_images/filename.jpg works in the browser
@@ -77,97 +86,81 @@ socket_app = _sio_module.ASGIApp(sio, app)
 
 
 # ================= GROQ + EMBEDDINGS =================
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
-
-vector_store = None
-documents = []
-
-
-# ================= HELPERS =================
-def extract_text(pdf_path: Path | str) -> str:
-    path = Path(pdf_path)
-    print(f"Extracting: {path.name}")
-
-    try:
-        reader = PdfReader(path)
-        text = "".join(page.extract_text() or "" for page in reader.pages).strip()
-        if len(text) > 250:
-            print(f"  → Native text extracted ({len(text)} chars)")
-            return text
-    except Exception as e:
-        print(f"  Native extraction failed: {e}")
-
-    return ""
-
-
-def build_vector_store(text: str):
-    global vector_store, documents
-
-    if not text.strip():
-        raise ValueError("No text could be extracted from the document")
-
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=550,
-        chunk_overlap=80,
-        separators=["\n\n", "\n", ". ", " ", ""]
-    )
-
-    documents = splitter.split_text(text)
-    print(f"Created {len(documents)} chunks")
+# torch / faiss / SentenceTransformer / Groq load in the background (see /ready)
+@app.on_event("startup")
+async def warm_up_rag_models():
+    start_background_warm_up()
 
-    embeddings = embedder.encode(documents, show_progress_bar=False, convert_to_numpy=True)
-    embeddings = embeddings.astype("float32")
 
-    dim = embeddings.shape[1]
-    vector_store = faiss.IndexFlatL2(dim)
-    vector_store.add(embeddings)
+@app.on_event("shutdown")
+async def stop_pdf_workers():
+    shutdown_pdf_pool()
 
 
-def retrieve_context(question: str, k: int = 4) -> str:
-    if vector_store is None or not documents:
-        return ""
+@app.get("/ready")
+def ready(require: str | None = Query(None, description="Pass 'rag' to get 503 until RAG models are loaded")):
+    status = readiness()
+    if require == "rag" and not status["rag_ready"]:
+        return JSONResponse(status_code=503, content=status)
+    return status
 
-    q_emb = embedder.encode([question], convert_to_numpy=True).astype("float32")
-    distances, indices = vector_store.search(q_emb, min(k, len(documents)))
 
-    relevant_chunks = [documents[i] for i in indices[0] if i < len(documents)]
-    return "\n\n".join(relevant_chunks)
-
-
-def generate_answer(context: str, question: str) -> str:
-    if len(context.strip()) < 40:
-        return "Not enough relevant information found in the provided notes."
-
-    prompt = f"""You are a helpful teaching assistant.
-Answer the question concisely and accurately using **only** the provided context.
-If the context doesn't contain the answer, say so clearly.
-
-Context:
-{context}
-
-Question: {question}
-
-Answer:"""
+# ================= STREAMING =================
+async def stream_answers(contexts: list[str], questions: list[str], stream_format: str):
+    """Yield each answer as soon as its Groq call finishes, then a final summary record."""
+    started = time.perf_counter()
+    first_answer_seconds = None
+    cached_answers = 0
+    tasks = schedule_answers(contexts, questions)
 
     try:
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.25,
-            max_tokens=400,
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        return f"[Generation failed: {str(e)}]"
+        for next_done in asyncio.as_completed(tasks):
+            index, answer, cached = await next_done
+            cached_answers += cached
+            if first_answer_seconds is None:
+                first_answer_seconds = round(time.perf_counter() - started, 3)
+            yield format_stream_record({
+                "type": "answer",
+                "index": index,
+                "question": questions[index],
+                "answer": answer,
+                "cached": cached,
+            }, stream_format)
+
+        yield format_stream_record({
+            "type": "summary",
+            "total_questions": len(questions),
+            "cached_answers": cached_answers,
+            "first_answer_seconds": first_answer_seconds,
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+        }, stream_format)
+    finally:
+        # Client went away mid-stream: don't keep paying for the remaining answers
+        for task in tasks:
+            task.cancel()
 
 
 # ================= ENDPOINT =================
+@app.get("/rag/stats")
+def rag_stats():
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "index_registry": index_registry.stats(),
+        "embedding_batcher": embedding_service.stats(),
+        "answer_cache": answer_cache.stats(),
+        "retrieval": retrieval_stats.snapshot(),
+    }
+
+
 @app.post("/analyze")
 async def analyze_notes_and_questions(
     notes: UploadFile = File(...),
-    questions: UploadFile = File(...)
+    questions: UploadFile = File(...),
+    stream: str | None = Query(None, description="Stream answers as they complete: 'ndjson' or 'sse'")
 ):
+    if stream is not None and stream not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="stream must be 'ndjson' or 'sse'")
+
     try:
         notes_path = UPLOAD_DIR / notes.filename
         questions_path = UPLOAD_DIR / questions.filename
@@ -178,10 +171,10 @@ async def analyze_notes_and_questions(
         with questions_path.open("wb") as f:
             shutil.copyfileobj(questions.file, f)
 
-        notes_text = extract_text(notes_path)
-        questions_text = extract_text(questions_path)
+        notes_text = await asyncio.to_thread(extract_text, notes_path)
+        questions_text = await asyncio.to_thread(extract_text, questions_path)
 
-        build_vector_store(notes_text)
+        doc_index = await asyncio.to_thread(build_vector_store, notes_text)
 
         raw_questions = [line.strip() for line in questions_text.splitlines() if line.strip()]
         question_list = [q for q in raw_questions if len(q) > 5][:25]
@@ -189,14 +182,26 @@ async def analyze_notes_and_questions(
         if not question_list:
             raise HTTPException(status_code=400, detail="No valid questions found")
 
-        results = []
-        for q in question_list:
-            context = retrieve_context(q)
-            answer = generate_answer(context, q)
-            results.append({"question": q, "answer": answer})
+        contexts = await asyncio.to_thread(retrieve_contexts, doc_index, question_list)
+        log_prompt_tokens(contexts, question_list)
+
+        if stream:
+            return StreamingResponse(
+                stream_answers(contexts, question_list, stream),
+                media_type=STREAM_MEDIA_TYPES[stream],
+            )
+
+        answers = await generate_answers(contexts, question_list)
+
+        results = [
+            {"question": q, "answer": answer, "cached": cached}
+            for q, (answer, cached) in zip(question_list, answers)
+        ]
 
         return {"results": results}
 
+    except HTTPException:
+        raise
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""
+ANN recall benchmark - compares HNSW and IVF-PQ against the exact flat index.
+
+Builds synthetic clustered corpora shaped like MiniLM embeddings (384-d, unit
+norm) and reports recall@k, mean query latency and estimated memory for each
+index type, plus what choose_index_kind would pick at that size.
+
+Every index choose_index_kind can select must reach ANN_RECALL_TARGET recall@k
+against flat; rows below it are flagged and the run exits with status 1. With the
+defaults (IVF-PQ re-ranked against fp16 vectors, nprobe 16, k_factor 16) IVF-PQ
+measured 0.999 at 12k vectors and 1.000 at 100k; plain PQ codes gave 0.46.
+
+Run from backend/:
+    python -m benchmarks.ann_recall --sizes 5000 50000 200000 --k 4
+"""
+
+import argparse
+import sys
+import time
+
+import faiss
+import numpy as np
+
+from services.ann_index import (
+    INDEX_FLAT, INDEX_HNSW, INDEX_IVFPQ,
+    build_index, choose_index_kind, estimate_index_bytes,
+)
+
+
+# Minimum recall@k against the exact flat index for any index type in use
+ANN_RECALL_TARGET = 0.95
+
+
+def make_corpus(n: int, dim: int, n_queries: int, seed: int = 0):
+    """Gaussian clusters on the unit sphere - closer to real chunk embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    n_clusters = max(8, n // 200)
+    centers = rng.standard_normal((n_clusters, dim)).astype("float32")
+
+    def sample(count):
+        labels = rng.integers(0, n_clusters, size=count)
+        points = centers[labels] + 0.35 * rng.standard_normal((count, dim)).astype("float32")
+        return points / np.linalg.norm(points, axis=1, keepdims=True)
+
+    return sample(n).astype("float32"), sample(n_queries).astype("float32")
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def time_queries(index, queries: np.ndarray, k: int) -> tuple:
+    """One query at a time, as /analyze-style lookups would hit the index."""
+    results = np.empty((len(queries), k), dtype="int64")
+    threads = faiss.omp_get_max_threads()
+    faiss.omp_set_num_threads(1)
+    started = time.perf_counter()
+    for i, q in enumerate(queries):
+        _, idx = index.search(q[None, :], k)
+        results[i] = idx[0]
+    elapsed = time.perf_counter() - started
+    faiss.omp_set_num_threads(threads)
+    return results, elapsed / len(queries) * 1000
+
+
+def run(sizes, dim, n_queries, k, target=ANN_RECALL_TARGET) -> bool:
+    """Print the table; False if any index type reaches less than target recall."""
+    header = f"{'n':>8} {'index':>6} {'build s':>8} {'ms/query':>9} {'recall@' + str(k):>9} {'est MB':>8}"
+    print(header)
+    print("-" * len(header))
+    passed = True
+
+    for n in sizes:
+        corpus, queries = make_corpus(n, dim, n_queries)
+        chosen = choose_index_kind(n, dim)
+        baseline = None
+
+        for kind in (INDEX_FLAT, INDEX_HNSW, INDEX_IVFPQ):
+            if kind == INDEX_IVFPQ and n < 256 * 39:
+                continue
+
+            started = time.perf_counter()
+            index = build_index(corpus, kind=kind)
+            build_seconds = time.perf_counter() - started
+
+            found, ms_per_query = time_queries(index, queries, k)
+            if baseline is None:
+                baseline = found
+
+            recall = recall_at_k(found, baseline)
+            marker = " *" if kind == chosen else ""
+            if recall < target:
+                marker += "  BELOW TARGET"
+                passed = False
+            size_mb = estimate_index_bytes(kind, n, dim) / (1024 * 1024)
+            print(
+                f"{n:>8} {kind:>6} {build_seconds:>8.2f} {ms_per_query:>9.3f} "
+                f"{recall:>9.3f} {size_mb:>8.1f}{marker}"
+            )
+
+    print("\n* = index type choose_index_kind() selects at that size")
+    print(f"recall target: {target:.2f} ({'met' if passed else 'NOT met'})")
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 20000, 100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--target", type=float, default=ANN_RECALL_TARGET)
+    args = parser.parse_args()
+
+    sys.exit(0 if run(args.sizes, args.dim, args.queries, args.k, args.target) else 1)
@@ -0,0 +1,146 @@
+"""
+Embedding backend benchmark - float32 torch vs. the quantized CPU backends.
+
+Chunks sample notes the same way /analyze does, then for each backend reports
+encode throughput and how closely its retrieval matches the float32 baseline:
+  - cosine between each chunk's vector and the baseline vector
+  - overlap@k of the top-k chunks retrieved per query
+  - top-1 agreement
+
+Queries are read from --questions (one per line) or, if omitted, taken from the
+first sentence of every fifth chunk.
+
+Run from backend/:
+    python -m benchmarks.embedding_backends --notes notes.pdf --backends torch torch-int8 onnx-int8
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from services.rag_models import EMBEDDING_BACKENDS, load_embedder
+
+CHUNK_SIZE = 550
+CHUNK_OVERLAP = 80
+
+SAMPLE_NOTES = """
+Operating systems manage hardware resources and provide services to programs. A process is a
+program in execution with its own address space, while threads share the address space of their
+process. The scheduler decides which ready process runs next; round robin gives every process a
+fixed time quantum, whereas shortest job first minimises average waiting time but can starve long jobs.
+
+Deadlock needs four conditions at once: mutual exclusion, hold and wait, no preemption and circular
+wait. The banker's algorithm avoids deadlock by only granting requests that keep the system in a
+safe state. Paging splits memory into fixed-size frames and removes external fragmentation, while
+segmentation follows the logical structure of a program.
+
+In databases, normalization removes redundancy. First normal form requires atomic values, second
+normal form removes partial dependencies on a composite key, and third normal form removes
+transitive dependencies. Transactions follow the ACID properties: atomicity, consistency, isolation
+and durability. Two-phase locking guarantees conflict serializability.
+
+Computer networks are described by the OSI model's seven layers. TCP provides reliable, ordered
+delivery with flow and congestion control, whereas UDP is connectionless and has lower overhead.
+DNS resolves host names to IP addresses and HTTP is a stateless request-response protocol.
+"""
+
+
+def load_notes(path: str) -> str:
+    if not path:
+        return SAMPLE_NOTES * 8
+    path = Path(path)
+    if path.suffix.lower() == ".pdf":
+        from pypdf import PdfReader
+        return "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    return path.read_text(encoding="utf-8", errors="ignore")
+
+
+def chunk(text: str) -> list:
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+    return splitter.split_text(text)
+
+
+def default_queries(chunks: list) -> list:
+    return [c.split(". ")[0] for c in chunks[::5] if len(c) > 20]
+
+
+def encode(model, texts: list, repeats: int) -> tuple:
+    model.encode(texts[:8], show_progress_bar=False)  # warm-up
+    started = time.perf_counter()
+    for _ in range(repeats):
+        vectors = model.encode(texts, show_progress_bar=False, convert_to_numpy=True)
+    elapsed = (time.perf_counter() - started) / repeats
+    return np.asarray(vectors, dtype="float32"), len(texts) / elapsed
+
+
+def top_k(chunk_vectors: np.ndarray, query_vectors: np.ndarray, k: int) -> np.ndarray:
+    # Same ranking as IndexFlatL2 on these vectors
+    distances = ((query_vectors[:, None, :] - chunk_vectors[None, :, :]) ** 2).sum(axis=2)
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+
+def run(notes: str, questions: list, backends: list, k: int, repeats: int):
+    chunks = chunk(notes)
+    queries = questions or default_queries(chunks)
+    k = min(k, len(chunks))
+    print(f"{len(chunks)} chunks, {len(queries)} queries, k={k}\n")
+
+    header = f"{'backend':<12} {'load s':>7} {'chunks/s':>9} {'speedup':>8} {'cosine':>7} {'overlap@' + str(k):>10} {'top-1':>6}"
+    print(header)
+    print("-" * len(header))
+
+    baseline = None
+    for backend in backends:
+        started = time.perf_counter()
+        try:
+            model = load_embedder(backend)
+        except Exception as e:
+            print(f"{backend:<12} unavailable: {e}")
+            continue
+        load_seconds = time.perf_counter() - started
+
+        chunk_vectors, throughput = encode(model, chunks, repeats)
+        query_vectors = np.asarray(model.encode(queries, show_progress_bar=False), dtype="float32")
+        retrieved = top_k(chunk_vectors, query_vectors, k)
+
+        if baseline is None:
+            baseline = (chunk_vectors, retrieved, throughput)
+
+        base_vectors, base_retrieved, base_throughput = baseline
+        overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(retrieved, base_retrieved)])
+        top1 = np.mean(retrieved[:, 0] == base_retrieved[:, 0])
+        similarity = cosine(chunk_vectors, base_vectors).mean()
+
+        print(
+            f"{backend:<12} {load_seconds:>7.1f} {throughput:>9.1f} {throughput / base_throughput:>7.2f}x "
+            f"{similarity:>7.4f} {overlap:>10.3f} {top1:>6.3f}"
+        )
+
+    print(f"\nAgreement columns compare against the first backend ({backends[0]}).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--notes", help="PDF or text file (defaults to built-in sample notes)")
+    parser.add_argument("--questions", help="text file with one query per line")
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS), choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    question_list = []
+    if args.questions:
+        question_list = [l.strip() for l in Path(args.questions).read_text().splitlines() if l.strip()]
+
+    run(load_notes(args.notes), question_list, args.backends, args.k, args.repeats)
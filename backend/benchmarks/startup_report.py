@@ -0,0 +1,106 @@
+"""
+Startup time report - breaks `import app` time down by module.
+
+Runs a fresh interpreter with `python -X importtime -c "import app"` and prints:
+  1. the modules app.py imports directly, by cumulative import time
+  2. self time grouped by top-level package (torch, faiss, groq, ...)
+With --warm-up it also runs the RAG background warm-up in the same process and
+prints its per-step load times, i.e. what a worker pays before /ready says rag_ready.
+
+Run from backend/:
+    python -m benchmarks.startup_report --top 20 --warm-up
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+WARM_UP_SNIPPET = """
+import sys, time
+started = time.perf_counter()
+import app
+print(f"IMPORT_APP {time.perf_counter() - started:.3f}", file=sys.stderr)
+from services import rag_models
+rag_models.warm_up()
+for step, seconds in rag_models.load_seconds.items():
+    print(f"WARMUP {step} {seconds}", file=sys.stderr)
+"""
+
+
+def run_import(module: str, warm_up: bool) -> str:
+    code = WARM_UP_SNIPPET if warm_up else f"import {module}"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        raise SystemExit(f"import {module} failed with exit code {proc.returncode}")
+    return proc.stderr
+
+
+def parse(stderr: str):
+    entries = []
+    for line in stderr.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((len(indent) // 2, name, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def report(stderr: str, module: str, top: int):
+    entries = parse(stderr)
+    root = next((e for e in entries if e[0] == 0 and e[1] == module), None)
+    total_ms = root[3] / 1000 if root else sum(e[2] for e in entries) / 1000
+    print(f"\nimport {module}: {total_ms:.0f} ms total\n")
+
+    # -X importtime prints children before their parent, so direct imports of the
+    # root are the depth-1 entries (modules already imported elsewhere don't show)
+    direct = sorted((e for e in entries if e[0] == 1), key=lambda e: e[3], reverse=True)
+    print(f"{'direct import':<45} {'cumulative ms':>14} {'share':>7}")
+    print("-" * 68)
+    for _, name, _, cumulative_us in direct[:top]:
+        print(f"{name:<45} {cumulative_us / 1000:>14.1f} {cumulative_us / 1000 / total_ms:>7.1%}")
+
+    by_package = defaultdict(int)
+    for _, name, self_us, _ in entries:
+        by_package[name.split(".")[0]] += self_us
+
+    print(f"\n{'top-level package':<45} {'self ms':>14} {'share':>7}")
+    print("-" * 68)
+    for package, self_us in sorted(by_package.items(), key=lambda kv: kv[1], reverse=True)[:top]:
+        print(f"{package:<45} {self_us / 1000:>14.1f} {self_us / 1000 / total_ms:>7.1%}")
+
+
+def report_warm_up(stderr: str):
+    lines = [l.split() for l in stderr.splitlines() if l.startswith(("IMPORT_APP", "WARMUP"))]
+    if not lines:
+        return
+    print(f"\n{'startup phase':<45} {'seconds':>14}")
+    print("-" * 60)
+    for parts in lines:
+        if parts[0] == "IMPORT_APP":
+            print(f"{'import app (serving lightweight routes)':<45} {float(parts[1]):>14.3f}")
+        else:
+            print(f"{'warm-up: ' + parts[1]:<45} {float(parts[2]):>14.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--warm-up", action="store_true", help="also time the RAG warm-up (app only)")
+    args = parser.parse_args()
+
+    stderr = run_import(args.module, args.warm_up and args.module == "app")
+    report(stderr, args.module, args.top)
+    report_warm_up(stderr)
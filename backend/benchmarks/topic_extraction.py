@@ -0,0 +1,151 @@
+"""
+Topic extraction benchmark - the previous split-everything extractor vs. ranked, capped topics.
+
+For each document reports, per extractor:
+  - topics returned and extraction time (also on the text repeated --scale times,
+    to show how each extractor grows with large OCR output)
+  - topics actually used for the requested quiz/flashcard counts
+  - Groq calls those topics cost: "separate" is research + generation per topic for
+    both quiz and flashcards, "combined" is one call per topic (GENERATION_MODE);
+    "worst" is the combined calls when short or failed topics make the pipeline
+    top up from every remaining topic
+
+Run from backend/:
+    python -m benchmarks.topic_extraction --docs syllabus.pdf notes.txt --questions 10 --flashcards 10
+"""
+
+import argparse
+import re
+import time
+from pathlib import Path
+
+from services.topic_extraction import allocate_topic_counts, extract_topics, topic_cap, topics_needed
+
+SAMPLE_SYLLABUS = """
+UNIT I - Introduction to Operating Systems
+Operating System Structure, System Calls, Process Concept - Process Scheduling, Operations on Processes,
+Inter-process Communication. Threads - Multithreading Models, Thread Libraries.
+CPU Scheduling: Scheduling Criteria, Scheduling Algorithms - FCFS, SJF, Round Robin, Priority Scheduling.
+
+UNIT II - Process Synchronization
+The Critical Section Problem, Peterson's Solution, Synchronization Hardware, Semaphores,
+Classic Problems of Synchronization – Producer Consumer, Readers Writers, Dining Philosophers. Monitors.
+Deadlocks - Deadlock Characterization, Deadlock Prevention, Deadlock Avoidance (Banker's Algorithm),
+Deadlock Detection and Recovery from Deadlock.
+
+UNIT III - Memory Management
+Swapping, Contiguous Memory Allocation, Paging, Structure of the Page Table, Segmentation.
+Virtual Memory - Demand Paging, Copy-on-Write, Page Replacement Algorithms (FIFO, LRU, Optimal),
+Allocation of Frames, Thrashing. Paging reduces external fragmentation; segmentation follows the
+logical structure of a program, and paging with a TLB speeds up address translation.
+
+UNIT IV - Database Management Systems
+Relational Model, Keys, Relational Algebra, SQL - DDL, DML, Joins, Nested Queries, Views.
+Normalization - Functional Dependencies, 1NF, 2NF, 3NF, BCNF. Transactions - ACID Properties,
+Concurrency Control, Two Phase Locking, Timestamp Ordering, Recovery, Indexing - B+ Trees, Hashing.
+
+UNIT V - Computer Networks
+OSI Model, TCP/IP Model, Data Link Layer - Framing, Error Detection, Flow Control, Sliding Window.
+Network Layer - IP Addressing, Subnetting, Routing Algorithms (Distance Vector, Link State).
+Transport Layer - TCP, UDP, Congestion Control. Application Layer - DNS, HTTP, SMTP, FTP.
+"""
+
+
+def extract_topics_previous(text: str) -> list:
+    """The extractor generate_mcq_quiz used before ranking: every fragment and capitalized phrase."""
+    topics = []
+
+    lines = text.replace('–', '\n').replace('-', '\n').replace(',', '\n').split('\n')
+    for line in lines:
+        line = line.strip()
+        line = re.sub(r'^\d+[\.\)]\s*', '', line)
+        line = re.sub(r'^[•\-*]\s*', '', line)
+        if len(line) < 3:
+            continue
+        if not any(c.isalpha() for c in line):
+            continue
+        line = line.strip('.,;:!? ')
+        if len(line) > 2 and len(line) < 200:
+            topics.append(line)
+
+    capitalized = re.findall(r'\b[A-Z][a-zA-Z\s]+(?:\([A-Z]+\))?', text)
+    for cap in capitalized:
+        cap = cap.strip()
+        if 3 < len(cap) < 100 and cap not in topics:
+            topics.append(cap)
+
+    unique_topics = []
+    seen = set()
+    for topic in topics:
+        topic_lower = topic.lower().strip()
+        if topic_lower not in seen and len(topic_lower) > 3:
+            seen.add(topic_lower)
+            unique_topics.append(topic.strip())
+    return unique_topics
+
+
+def load_document(path: str) -> str:
+    path = Path(path)
+    if path.suffix.lower() == ".pdf":
+        from pypdf import PdfReader
+        return "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    return path.read_text(encoding="utf-8", errors="ignore")
+
+
+def timed(fn, *args) -> tuple:
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def groq_calls(n_topics: int, num_questions: int, num_cards: int) -> tuple:
+    """(quiz topics, flashcard topics, separate-mode calls, combined-mode calls) for n_topics topics."""
+    if not n_topics:
+        return 0, 0, 0, 0
+    quiz_topics = topics_needed(allocate_topic_counts(num_questions, n_topics), num_questions)
+    card_topics = topics_needed(allocate_topic_counts(num_cards, n_topics), num_cards)
+    return quiz_topics, card_topics, 2 * quiz_topics + 2 * card_topics, max(quiz_topics, card_topics)
+
+
+def run(name: str, text: str, num_questions: int, num_cards: int, scale: int):
+    cap = topic_cap(max(num_questions, num_cards))
+    large_text = text * scale
+    print(f"\n{name}: {len(text)} chars (x{scale} = {len(large_text)} chars), cap {cap} topics")
+
+    header = (
+        f"{'extractor':<10} {'topics':>7} {'ms':>8} {'ms x' + str(scale):>10} "
+        f"{'quiz':>5} {'cards':>6} {'separate':>9} {'combined':>9} {'worst':>6}"
+    )
+    print(header)
+    print("-" * len(header))
+
+    extractors = [
+        ("previous", extract_topics_previous),
+        ("ranked", lambda t: extract_topics(t, cap)),
+    ]
+    results = {}
+    for label, extractor in extractors:
+        topics, ms = timed(extractor, text)
+        results[label] = topics
+        _, large_ms = timed(extractor, large_text)
+        quiz_topics, card_topics, separate, combined = groq_calls(len(topics), num_questions, num_cards)
+        print(
+            f"{label:<10} {len(topics):>7} {ms:>8.1f} {large_ms:>10.1f} "
+            f"{quiz_topics:>5} {card_topics:>6} {separate:>9} {combined:>9} {len(topics):>6}"
+        )
+
+    for label, topics in results.items():
+        print(f"\n{label} topics used: {'; '.join(topics[:cap])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", nargs="*", default=[], help="PDF or text files (defaults to a built-in sample syllabus)")
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--flashcards", type=int, default=10)
+    parser.add_argument("--scale", type=int, default=50, help="repeat each document this many times for the large-text timing")
+    args = parser.parse_args()
+
+    documents = [(path, load_document(path)) for path in args.docs] or [("sample syllabus", SAMPLE_SYLLABUS)]
+    for name, text in documents:
+        run(name, text, args.questions, args.flashcards, args.scale)
@@ -1,4 +1,8 @@
+import asyncio
+import time
+import traceback
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
@@ -9,8 +13,17 @@ from services.combined_services import (
     extract_text_from_image,
     aggressive_ocr_cleanup,
     generate_mcq_quiz,
-    generate_flashcards
+    generate_flashcards,
+    generate_quiz_and_flashcards,
+    stream_quiz_and_flashcards
 )
+from services.job_queue import JobProgress, JobQueueFull, upload_job_queue
+from services.llm_client import LLMError, llm_client
+from services.question_bank import question_bank
+from services.question_dedup import question_deduplicator
+from services.research_cache import research_cache
+from services.structured_output import structured_output_stats
+from utils.streaming import STREAM_MEDIA_TYPES, format_stream_record
 
 router = APIRouter()
 
@@ -27,6 +40,8 @@ quiz_attempts_collection = db["quiz_attempts"]
 class GenerateRequest(BaseModel):
     text: str
     count: int = 10
+    # Share of questions generated fresh instead of served from the question bank (0-1)
+    freshness: Optional[float] = None
 
 
 class QuestionAnswer(BaseModel):
@@ -45,6 +60,196 @@ class QuizAttemptRequest(BaseModel):
     total_questions: int
 
 
+# ============================================================================
+# SESSION HELPERS
+# ============================================================================
+
+def new_session_id() -> str:
+    return str(datetime.now().timestamp()).replace(".", "")
+
+
+def process_quiz_question(q: dict, idx: int) -> dict:
+    """Shape a generated MCQ for storage, with correct_answer always an index."""
+    # Handle both string and int correct_answer
+    correct_ans = q.get("correct_answer", 0)
+    if isinstance(correct_ans, str):
+        # If it's a string, find its index in options
+        options = q.get("options", [])
+        try:
+            correct_ans = options.index(correct_ans)
+        except ValueError:
+            correct_ans = 0
+    
+    return {
+        "id": idx,
+        "question": q.get("question", ""),
+        "options": q.get("options", []),
+        "correct_answer": correct_ans,  # Now always an index
+        "explanation": q.get("explanation", "")
+    }
+
+
+def process_flashcard(card: dict, idx: int) -> dict:
+    return {
+        "id": idx,
+        "question": card.get("front", card.get("question", "")),
+        "answer": card.get("back", card.get("answer", "")),
+        "card_order": idx
+    }
+
+
+def save_upload_sessions(session_id: str, final_text: str, user_email: Optional[str], processed_quiz: list, processed_flashcards: list):
+    """Store the quiz and flashcard sessions for an upload in MongoDB."""
+    quiz_session_doc = {
+        "session_id": session_id,
+        "questions": processed_quiz,
+        "text": final_text,
+        "created_at": datetime.now().isoformat(),
+        "user_email": user_email
+    }
+    quiz_sessions_collection.insert_one(quiz_session_doc)
+    
+    flashcard_session_doc = {
+        "session_id": session_id,
+        "cards": processed_flashcards,
+        "text": final_text,
+        "created_at": datetime.now().isoformat(),
+        "user_email": user_email
+    }
+    flashcard_sessions_collection.insert_one(flashcard_session_doc)
+
+
+def stream_upload(
+    final_text: str,
+    num_questions: int,
+    num_flashcards: int,
+    difficulty: str,
+    user_email: Optional[str],
+    stream_format: str,
+    freshness: Optional[float] = None
+):
+    """Yield each question and flashcard as soon as it is generated, then save the session."""
+    started = time.perf_counter()
+    first_item_seconds = None
+    session_id = new_session_id()
+    processed_quiz = []
+    processed_flashcards = []
+    
+    yield format_stream_record({
+        "type": "session",
+        "session_id": session_id,
+        "extracted_text": final_text[:500],
+    }, stream_format)
+    
+    try:
+        for kind, item in stream_quiz_and_flashcards(
+            final_text, num_questions, num_flashcards, difficulty=difficulty, freshness=freshness
+        ):
+            if first_item_seconds is None:
+                first_item_seconds = round(time.perf_counter() - started, 3)
+            
+            if kind == "questions":
+                record = process_quiz_question(item, len(processed_quiz))
+                processed_quiz.append(record)
+                yield format_stream_record({"type": "question", "question": record}, stream_format)
+            else:
+                record = process_flashcard(item, len(processed_flashcards))
+                processed_flashcards.append(record)
+                yield format_stream_record({"type": "flashcard", "card": record}, stream_format)
+        
+        save_upload_sessions(session_id, final_text, user_email, processed_quiz, processed_flashcards)
+        print(f"✅ Streamed generation complete! Session ID: {session_id}")
+        
+        yield format_stream_record({
+            "type": "complete",
+            "session_id": session_id,
+            "total_questions": len(processed_quiz),
+            "total_cards": len(processed_flashcards),
+            "first_item_seconds": first_item_seconds,
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+        }, stream_format)
+    
+    except LLMError as e:
+        print(f"❌ Generation unavailable: {e}")
+        yield format_stream_record({
+            "type": "error",
+            "status": 503,
+            "detail": f"Question generation is unavailable: {str(e)}",
+        }, stream_format)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        traceback.print_exc()
+        yield format_stream_record({"type": "error", "detail": f"Error generating content: {str(e)}"}, stream_format)
+
+
+# ============================================================================
+# UPLOAD JOBS
+# ============================================================================
+
+class UploadRejected(ValueError):
+    """The upload cannot be processed (e.g. no readable text); answered with 400."""
+
+
+def extract_upload_text(filename: str, data: bytes) -> str:
+    """Extract and clean the text of an uploaded PDF or image."""
+    if filename.endswith(".pdf"):
+        print("📄 Extracting text from PDF...")
+        text = extract_text_from_pdf(data)
+    else:
+        print("🖼️ Extracting text from image...")
+        text = extract_text_from_image(data)
+    
+    if not text or len(text.strip()) < 20:
+        raise UploadRejected("Could not extract sufficient text from file")
+    
+    print(f"✅ Extracted {len(text)} characters")
+    
+    # Clean OCR text
+    print("🧹 Cleaning text...")
+    return aggressive_ocr_cleanup(text)
+
+
+def run_upload_job(payload: dict, progress: JobProgress) -> dict:
+    """Job handler behind /upload: extract, generate, save; returns the /upload response body."""
+    progress.stage("extracting")
+    final_text = extract_upload_text(payload["filename"], payload["data"])
+    
+    num_questions = payload["num_questions"]
+    num_flashcards = payload["num_flashcards"]
+    difficulty = payload["difficulty"]
+    progress.stage("generating", questions_requested=num_questions, flashcards_requested=num_flashcards)
+    print(f"🧠 Generating {num_questions} quiz questions and {num_flashcards} flashcards... (Difficulty: {difficulty})")
+    quiz_data, flashcard_data = generate_quiz_and_flashcards(
+        final_text, num_questions, num_flashcards, difficulty=difficulty, freshness=payload["freshness"],
+        on_progress=progress.update,
+    )
+    
+    processed_quiz = [process_quiz_question(q, idx) for idx, q in enumerate(quiz_data.get("questions", []))]
+    processed_flashcards = [
+        process_flashcard(card, idx) for idx, card in enumerate(flashcard_data.get("flashcards", []))
+    ]
+    progress.stage("saving", questions=len(processed_quiz), flashcards=len(processed_flashcards))
+    
+    # Store in session
+    session_id = new_session_id()
+    save_upload_sessions(session_id, final_text, payload["user_email"], processed_quiz, processed_flashcards)
+    
+    print(f"✅ Generation complete! Session ID: {session_id}")
+    
+    return {
+        "session_id": session_id,
+        "extracted_text": final_text[:500],
+        "quiz": {
+            "total_questions": len(processed_quiz),
+            "questions": processed_quiz
+        },
+        "flashcards": {
+            "total_cards": len(processed_flashcards),
+            "cards": processed_flashcards
+        }
+    }
+
+
 # ============================================================================
 # FILE UPLOAD ENDPOINTS
 # ============================================================================
@@ -55,121 +260,79 @@ async def upload_and_generate(
     num_questions: int = 3, 
     num_flashcards: int = 3,
     user_email: Optional[str] = Form(None),
-    difficulty: str = Form("medium")
+    difficulty: str = Form("medium"),
+    freshness: Optional[float] = Form(None, description="Share of questions generated fresh instead of served from the question bank (0-1)"),
+    stream: Optional[str] = Query(None, description="'ndjson' or 'sse' to receive items as they are generated"),
+    background: bool = Query(False, description="Return a job ID at once and poll /upload/jobs/{job_id}")
 ):
     """
     Upload file, extract text, and generate both quiz and flashcards.
     Returns session IDs for quiz and flashcard data.
+    With stream set, questions and flashcards are sent one by one as they are
+    generated, followed by a completion record once the session is saved.
+    Otherwise the work runs on the upload job pool: with background set the
+    response is 202 with a job ID, without it the request waits for the job.
     """
+    if stream is not None and stream not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="stream must be 'ndjson' or 'sse'")
+    
     try:
         print(f"📤 Uploading file: {file.filename}")
         data = await file.read()
         
-        # Extract text
-        if file.filename.endswith(".pdf"):
-            print("📄 Extracting text from PDF...")
-            text = extract_text_from_pdf(data)
-        else:
-            print("🖼️ Extracting text from image...")
-            text = extract_text_from_image(data)
-        
-        if not text or len(text.strip()) < 20:
-            raise HTTPException(
-                status_code=400, 
-                detail="Could not extract sufficient text from file"
+        if stream:
+            final_text = await asyncio.to_thread(extract_upload_text, file.filename, data)
+            return StreamingResponse(
+                stream_upload(final_text, num_questions, num_flashcards, difficulty, user_email, stream, freshness),
+                media_type=STREAM_MEDIA_TYPES[stream],
             )
         
-        print(f"✅ Extracted {len(text)} characters")
-        
-        # Clean OCR text
-        print("🧹 Cleaning text...")
-        final_text = aggressive_ocr_cleanup(text)
-        
-        # Generate quiz
-        print(f"🧠 Generating {num_questions} quiz questions... (Difficulty: {difficulty})")
-        quiz_data = generate_mcq_quiz(final_text, num_questions, difficulty=difficulty)
-        
-        # Generate flashcards
-        print(f"📚 Generating {num_flashcards} flashcards...")
-        flashcard_data = generate_flashcards(final_text, num_flashcards)
-        
-        # Store in session
-        session_id = str(datetime.now().timestamp()).replace(".", "")
-        
-        # FIXED: Process quiz data properly
-        processed_quiz = []
-        questions_list = quiz_data.get("questions", [])
-        
-        for idx, q in enumerate(questions_list):
-            # Handle both string and int correct_answer
-            correct_ans = q.get("correct_answer", 0)
-            if isinstance(correct_ans, str):
-                # If it's a string, find its index in options
-                options = q.get("options", [])
-                try:
-                    correct_ans = options.index(correct_ans)
-                except ValueError:
-                    correct_ans = 0
-            
-            processed_quiz.append({
-                "id": idx,
-                "question": q.get("question", ""),
-                "options": q.get("options", []),
-                "correct_answer": correct_ans,  # Now always an index
-                "explanation": q.get("explanation", "")
-            })
-        
-        # FIXED: Process flashcard data properly
-        processed_flashcards = []
-        flashcards_list = flashcard_data.get("flashcards", [])
+        job_id, job = upload_job_queue.submit(
+            run_upload_job,
+            {
+                "filename": file.filename,
+                "data": data,
+                "num_questions": num_questions,
+                "num_flashcards": num_flashcards,
+                "difficulty": difficulty,
+                "freshness": freshness,
+                "user_email": user_email,
+            },
+            info={
+                "filename": file.filename,
+                "user_email": user_email,
+                "num_questions": num_questions,
+                "num_flashcards": num_flashcards,
+                "difficulty": difficulty,
+            },
+        )
         
-        for idx, card in enumerate(flashcards_list):
-            processed_flashcards.append({
-                "id": idx,
-                "question": card.get("front", card.get("question", "")),
-                "answer": card.get("back", card.get("answer", "")),
-                "card_order": idx
+        if background:
+            print(f"📥 Queued upload job {job_id}")
+            return JSONResponse(status_code=202, content={
+                "job_id": job_id,
+                "status": "queued",
+                "status_url": f"/api/upload/jobs/{job_id}",
             })
         
-        # Store sessions in MongoDB
-        quiz_session_doc = {
-            "session_id": session_id,
-            "questions": processed_quiz,
-            "text": final_text,
-            "created_at": datetime.now().isoformat(),
-            "user_email": user_email
-        }
-        quiz_sessions_collection.insert_one(quiz_session_doc)
-        
-        flashcard_session_doc = {
-            "session_id": session_id,
-            "cards": processed_flashcards,
-            "text": final_text,
-            "created_at": datetime.now().isoformat(),
-            "user_email": user_email
-        }
-        flashcard_sessions_collection.insert_one(flashcard_session_doc)
-        
-        print(f"✅ Generation complete! Session ID: {session_id}")
-        
-        return {
-            "session_id": session_id,
-            "extracted_text": final_text[:500],
-            "quiz": {
-                "total_questions": len(processed_quiz),
-                "questions": processed_quiz
-            },
-            "flashcards": {
-                "total_cards": len(processed_flashcards),
-                "cards": processed_flashcards
-            }
-        }
+        return await asyncio.wrap_future(job)
     
     except HTTPException:
         raise
+    except UploadRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except JobQueueFull as e:
+        print(f"⚠️ Upload refused: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Too many uploads are being processed, please try again shortly",
+            headers={"Retry-After": "30"},
+        )
+    except LLMError as e:
+        print(f"❌ Generation unavailable: {e}")
+        raise HTTPException(status_code=503, detail=f"Question generation is unavailable: {str(e)}")
     except Exception as e:
         print(f"❌ Error: {e}")
-        import traceback
         traceback.print_exc()
         raise HTTPException(
             status_code=500, 
@@ -177,6 +340,15 @@ async def upload_and_generate(
         )
 
 
+@router.get("/upload/jobs/{job_id}")
+def get_upload_job(job_id: str):
+    """Status of a background upload: status, stage, progress counters, then result or error."""
+    job = upload_job_queue.status(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
 @router.post("/file")
 async def upload(file: UploadFile = File(...)):
     """Legacy endpoint: Upload and process a file."""
@@ -255,7 +427,10 @@ def get_quiz_attempt(attempt_id: str):
 
 @router.post("/quiz")
 def quiz(req: GenerateRequest):
-    return generate_mcq_quiz(req.text, req.count)
+    try:
+        return generate_mcq_quiz(req.text, req.count, freshness=req.freshness)
+    except LLMError as e:
+        raise HTTPException(status_code=503, detail=f"Question generation is unavailable: {str(e)}")
 
 
 # ============================================================================
@@ -303,7 +478,27 @@ def save_flashcard_progress(session_id: str, card_id: int, is_known: bool):
 
 @router.post("/flashcards")
 def flashcards(req: GenerateRequest):
-    return generate_flashcards(req.text, req.count)
+    try:
+        return generate_flashcards(req.text, req.count)
+    except LLMError as e:
+        raise HTTPException(status_code=503, detail=f"Flashcard generation is unavailable: {str(e)}")
+
+
+# ============================================================================
+# GENERATION STATS
+# ============================================================================
+
+@router.get("/generation/stats")
+def generation_stats():
+    """Cache effectiveness, Groq latency/token metrics and circuit state, upload job backlog"""
+    return {
+        "research_cache": research_cache.stats(),
+        "question_bank": question_bank.stats(),
+        "question_dedup": question_deduplicator.stats(),
+        "structured_output": structured_output_stats.snapshot(),
+        "llm": llm_client.stats(),
+        "upload_jobs": upload_job_queue.stats(),
+    }
 
 
 # ============================================================================
@@ -0,0 +1,103 @@
+"""
+Notes library routes - upload notes once, then ask questions across them later
+"""
+
+import asyncio
+import shutil
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Query
+from pydantic import BaseModel
+
+from services.notes_library import notes_library
+from services.rag_service import extract_text, log_prompt_tokens, generate_answers
+
+router = APIRouter(prefix="/library", tags=["Library"])
+
+MAX_QUESTIONS = 25
+
+
+# ============================================================================
+# REQUEST MODELS
+# ============================================================================
+
+class LibraryQuestionRequest(BaseModel):
+    user_email: str
+    questions: List[str]
+    document_ids: Optional[List[str]] = None
+
+
+# ============================================================================
+# DOCUMENTS
+# ============================================================================
+
+@router.post("/documents")
+async def add_document(file: UploadFile = File(...), user_email: str = Form(...)):
+    """Extract, chunk and embed a PDF into the user's library (once per unique document)"""
+    if not file.filename or Path(file.filename).suffix.lower() != ".pdf":
+        raise HTTPException(400, "Only PDF notes are supported")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "notes.pdf"
+        with path.open("wb") as f:
+            shutil.copyfileobj(file.file, f)
+
+        text = await asyncio.to_thread(extract_text, path)
+
+    if not text:
+        raise HTTPException(400, "Could not extract meaningful text from notes PDF")
+
+    try:
+        document, created = await asyncio.to_thread(notes_library.ingest, user_email, file.filename, text)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    return {"document": document, "already_in_library": not created}
+
+
+@router.get("/documents")
+def list_documents(email: str = Query(...)):
+    documents = notes_library.list_documents(email)
+    return {"documents": documents, "total": len(documents)}
+
+
+@router.delete("/documents/{document_id}")
+def delete_document(document_id: str, email: str = Query(...)):
+    if not notes_library.delete_document(email, document_id):
+        raise HTTPException(404, "Document not found")
+    return {"message": "Document removed from library"}
+
+
+# ============================================================================
+# QUESTIONS
+# ============================================================================
+
+@router.post("/ask")
+async def ask_library(request: LibraryQuestionRequest):
+    """Answer questions from the user's stored notes without re-uploading them"""
+    questions = [q.strip() for q in request.questions if len(q.strip()) > 5][:MAX_QUESTIONS]
+    if not questions:
+        raise HTTPException(400, "No valid questions provided")
+
+    if request.document_ids:
+        known = {doc["document_id"] for doc in notes_library.list_documents(request.user_email)}
+        unknown = [doc_id for doc_id in request.document_ids if doc_id not in known]
+        if unknown:
+            raise HTTPException(404, f"Documents not found: {', '.join(unknown)}")
+
+    contexts, sources = await asyncio.to_thread(
+        notes_library.retrieve_contexts, request.user_email, questions, request.document_ids
+    )
+    log_prompt_tokens(contexts, questions)
+    answers = await generate_answers(contexts, questions)
+
+    return {
+        "status": "success",
+        "total_questions": len(questions),
+        "results": [
+            {"question": q, "answer": answer, "cached": cached, "document_ids": doc_ids}
+            for q, (answer, cached), doc_ids in zip(questions, answers, sources)
+        ],
+    }
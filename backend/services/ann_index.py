@@ -0,0 +1,174 @@
+"""
+ANN index selection - picks the FAISS index type from the number of chunks.
+
+Small notes keep the exact IndexFlatL2. Larger documents move to HNSW, and very
+large ones (or anything that would break the memory limit) to IVF-PQ. PQ codes
+alone only find about half of the true top 4, so IVF-PQ candidates
+(PQ_REFINE_K_FACTOR x k of them) are re-ranked against an fp16 copy of the vectors,
+or an 8-bit copy where fp16 would break the memory limit. Defaults are tuned
+with benchmarks/ann_recall.py against its ANN_RECALL_TARGET. Thresholds and
+limits come from the environment.
+"""
+
+import math
+import os
+
+import numpy as np
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+ANN_FLAT_MAX_VECTORS = int(os.getenv("ANN_FLAT_MAX_VECTORS", "10000"))
+ANN_HNSW_MAX_VECTORS = int(os.getenv("ANN_HNSW_MAX_VECTORS", "200000"))
+ANN_MAX_INDEX_BYTES = int(os.getenv("ANN_MAX_INDEX_MB", "256")) * 1024 * 1024
+
+HNSW_M = int(os.getenv("ANN_HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("ANN_HNSW_EF_CONSTRUCTION", "80"))
+HNSW_EF_SEARCH = int(os.getenv("ANN_HNSW_EF_SEARCH", "64"))
+
+IVF_NPROBE = int(os.getenv("ANN_IVF_NPROBE", "16"))
+PQ_NBITS = 8
+# IVF-PQ returns k * this many candidates, re-ranked by (near-)exact distance
+PQ_REFINE_K_FACTOR = int(os.getenv("ANN_PQ_REFINE_K_FACTOR", "16"))
+
+# k-means wants ~39 training points per centroid; PQ has 2**nbits centroids
+MIN_TRAINING_POINTS_PER_CENTROID = 39
+MAX_TRAINING_POINTS = int(os.getenv("ANN_MAX_TRAINING_POINTS", "50000"))
+
+INDEX_FLAT = "flat"
+INDEX_HNSW = "hnsw"
+INDEX_IVFPQ = "ivfpq"
+
+
+# ============================================================================
+# SIZING
+# ============================================================================
+
+def _ivf_nlist(n: int) -> int:
+    """Roughly 4 * sqrt(n) lists, capped so every list still gets training points."""
+    nlist = int(4 * math.sqrt(n))
+    return max(1, min(nlist, n // MIN_TRAINING_POINTS_PER_CENTROID))
+
+
+def _pq_subquantizers(dim: int) -> int:
+    """Largest divisor of dim giving sub-vectors of at least 4 dims (96 for MiniLM's 384)."""
+    for m in range(dim // 4, 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def _ivfpq_bytes(n: int, dim: int, refine_bytes_per_dim: int) -> int:
+    m = _pq_subquantizers(dim)
+    codebooks = (2 ** PQ_NBITS) * dim * 4
+    centroids = _ivf_nlist(n) * dim * 4
+    return n * (m * PQ_NBITS // 8 + 8 + dim * refine_bytes_per_dim) + codebooks + centroids
+
+
+def _refine_bytes_per_dim(n: int, dim: int) -> int:
+    """2 (fp16 re-ranking copy) when it fits the memory limit, else 1 (8-bit)."""
+    return 2 if _ivfpq_bytes(n, dim, 2) <= ANN_MAX_INDEX_BYTES else 1
+
+
+def estimate_index_bytes(kind: str, n: int, dim: int) -> int:
+    """Approximate resident memory of an index of the given kind."""
+    if kind == INDEX_HNSW:
+        # Full vectors + ~2*M level-0 neighbour ids per node
+        return n * (dim * 4 + HNSW_M * 2 * 4)
+    if kind == INDEX_IVFPQ:
+        return _ivfpq_bytes(n, dim, _refine_bytes_per_dim(n, dim))
+    return n * dim * 4
+
+
+def _can_train_ivfpq(n: int) -> bool:
+    return n >= (2 ** PQ_NBITS) * MIN_TRAINING_POINTS_PER_CENTROID
+
+
+def choose_index_kind(n: int, dim: int) -> str:
+    """Pick flat / HNSW / IVF-PQ from chunk count, downgrading if over the memory limit."""
+    if n <= ANN_FLAT_MAX_VECTORS:
+        kind = INDEX_FLAT
+    elif n <= ANN_HNSW_MAX_VECTORS:
+        kind = INDEX_HNSW
+    else:
+        kind = INDEX_IVFPQ
+
+    if kind != INDEX_IVFPQ and estimate_index_bytes(kind, n, dim) > ANN_MAX_INDEX_BYTES:
+        kind = INDEX_IVFPQ
+
+    if kind == INDEX_IVFPQ and not _can_train_ivfpq(n):
+        kind = INDEX_FLAT
+
+    return kind
+
+
+# ============================================================================
+# BUILD / CONFIGURE
+# ============================================================================
+
+def build_index(embeddings: np.ndarray, kind: str = None) -> "faiss.Index":
+    """Build and fill an L2 index for the embeddings, choosing the type if not given."""
+    import faiss  # heavy; loaded on first index build, not at app import
+
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    n, dim = embeddings.shape
+    kind = kind or choose_index_kind(n, dim)
+
+    if kind == INDEX_HNSW:
+        index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    elif kind == INDEX_IVFPQ:
+        quantizer = faiss.IndexFlatL2(dim)
+        ivfpq = faiss.IndexIVFPQ(quantizer, dim, _ivf_nlist(n), _pq_subquantizers(dim), PQ_NBITS)
+        precision = faiss.ScalarQuantizer.QT_fp16 if _refine_bytes_per_dim(n, dim) == 2 else faiss.ScalarQuantizer.QT_8bit
+        index = faiss.IndexRefine(ivfpq, faiss.IndexScalarQuantizer(dim, precision))
+        index.train(_training_sample(embeddings))
+    else:
+        index = faiss.IndexFlatL2(dim)
+
+    index.add(embeddings)
+    configure_search(index)
+
+    if kind != INDEX_FLAT:
+        size_mb = estimate_index_bytes(kind, n, dim) / (1024 * 1024)
+        print(f"🧭 Built {kind} index for {n} vectors (~{size_mb:.1f} MB)")
+
+    return index
+
+
+def _training_sample(embeddings: np.ndarray) -> np.ndarray:
+    if len(embeddings) <= MAX_TRAINING_POINTS:
+        return embeddings
+    rng = np.random.default_rng(0)
+    picked = rng.choice(len(embeddings), size=MAX_TRAINING_POINTS, replace=False)
+    return embeddings[np.sort(picked)]
+
+
+def configure_search(index: "faiss.Index") -> "faiss.Index":
+    """Apply query-time parameters; call after faiss.read_index as well."""
+    import faiss
+
+    if isinstance(index, faiss.IndexRefine):
+        index.k_factor = PQ_REFINE_K_FACTOR
+        configure_search(faiss.downcast_index(index.base_index))
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(IVF_NPROBE, index.nlist)
+    return index
+
+
+def index_kind(index: "faiss.Index") -> str:
+    import faiss
+
+    if isinstance(index, faiss.IndexHNSW):
+        return INDEX_HNSW
+    if isinstance(index, (faiss.IndexIVFPQ, faiss.IndexRefine)):
+        return INDEX_IVFPQ
+    return INDEX_FLAT
+
+
+def index_nbytes(index: "faiss.Index") -> int:
+    return estimate_index_bytes(index_kind(index), index.ntotal, index.d)
@@ -0,0 +1,132 @@
+"""
+Answer cache - reuses generate_answer completions across students.
+
+Keyed by a hash of (model, prompt template version, retrieved context, normalized
+question). The first tier is an in-process TTL LRU; with ANSWER_CACHE_MONGO=1 a
+MongoDB collection with a TTL index acts as a shared second tier across workers.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from utils.ttl_cache import TTLCache
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+ANSWER_CACHE_MONGO = os.getenv("ANSWER_CACHE_MONGO", "0") == "1"
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, drop numbering like '1.' / 'Q3)' and collapse whitespace and trailing punctuation."""
+    question = question.strip().lower()
+    question = re.sub(r"^(q(uestion)?\s*)?\d+\s*[\.\):-]\s*", "", question)
+    question = re.sub(r"\s+", " ", question)
+    return question.rstrip(" ?.!")
+
+
+def answer_cache_key(model: str, prompt_version: str, context: str, question: str) -> str:
+    digest = hashlib.sha256()
+    for part in (model, prompt_version, context, normalize_question(question)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+class AnswerCache:
+    """In-memory TTL LRU with an optional MongoDB second tier."""
+
+    def __init__(self, use_mongo: bool = ANSWER_CACHE_MONGO):
+        self.memory = TTLCache(ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL_SECONDS)
+        self._collection = self._init_collection() if use_mongo else None
+
+        self._lock = threading.Lock()
+        self._memory_hits = 0
+        self._mongo_hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def _init_collection():
+        try:
+            from db.connection import db
+            collection = db["answer_cache"]
+            # Mongo removes documents once expires_at has passed
+            collection.create_index("expires_at", expireAfterSeconds=0)
+            return collection
+        except Exception as e:
+            print(f"⚠️ Answer cache MongoDB tier disabled: {e}")
+            return None
+
+    def get(self, key: str) -> Optional[str]:
+        answer = self.memory.get(key)
+        if answer is not None:
+            self._count("memory")
+            return answer
+
+        if self._collection is not None:
+            try:
+                doc = self._collection.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+            except Exception as e:
+                print(f"⚠️ Answer cache lookup failed: {e}")
+                doc = None
+            if doc:
+                remaining = (doc["expires_at"] - datetime.utcnow()).total_seconds()
+                self.memory.set(key, doc["answer"], ttl_seconds=remaining)
+                self._count("mongo")
+                return doc["answer"]
+
+        self._count("miss")
+        return None
+
+    def set(self, key: str, answer: str):
+        self.memory.set(key, answer)
+
+        if self._collection is not None:
+            try:
+                self._collection.update_one(
+                    {"_id": key},
+                    {"$set": {
+                        "answer": answer,
+                        "expires_at": datetime.utcnow() + timedelta(seconds=ANSWER_CACHE_TTL_SECONDS),
+                    }},
+                    upsert=True,
+                )
+            except Exception as e:
+                print(f"⚠️ Answer cache write failed: {e}")
+
+    def _count(self, outcome: str):
+        with self._lock:
+            if outcome == "memory":
+                self._memory_hits += 1
+            elif outcome == "mongo":
+                self._mongo_hits += 1
+            else:
+                self._misses += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._memory_hits + self._mongo_hits + self._misses
+            hits = self._memory_hits + self._mongo_hits
+            return {
+                "memory_hits": self._memory_hits,
+                "mongo_hits": self._mongo_hits,
+                "misses": self._misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                "memory_entries": len(self.memory),
+                "mongo_enabled": self._collection is not None,
+            }
+
+
+answer_cache = AnswerCache()
@@ -0,0 +1,86 @@
+"""
+BM25 index - a small inverted index over note chunks, built next to the FAISS index.
+"""
+
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "by", "at", "from",
+    "is", "are", "was", "were", "be", "been", "it", "its", "this", "that", "these", "those",
+    "as", "what", "which", "who", "whom", "how", "why", "when", "where", "do", "does", "did",
+    "can", "could", "should", "would", "will", "shall", "may", "might", "about", "into", "than",
+    "then", "there", "their", "them", "they", "we", "you", "your", "i", "me", "my", "not", "no",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of chunks."""
+
+    def __init__(self, postings: Dict[str, List[Tuple[int, int]]], doc_lengths: List[int], k1: float = 1.5, b: float = 0.75):
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.n_docs = len(doc_lengths)
+        self.avg_length = (sum(doc_lengths) / self.n_docs) if self.n_docs else 0.0
+        self.idf = {
+            term: math.log(1 + (self.n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for term, posting in postings.items()
+        }
+        # Weight given to query terms the notes never mention
+        self.max_idf = math.log(1 + (self.n_docs + 0.5) / 0.5)
+
+    @classmethod
+    def build(cls, chunks: List[str]) -> "BM25Index":
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        doc_lengths = []
+        for doc_id, chunk in enumerate(chunks):
+            tokens = tokenize(chunk)
+            doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings[term].append((doc_id, tf))
+        return cls(dict(postings), doc_lengths)
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Top-k (chunk index, score) pairs, best first."""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = self.idf[term]
+            for doc_id, tf in posting:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / (self.avg_length or 1))
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def coverage(self, query: str, doc_id: int) -> float:
+        """IDF-weighted share of the query's terms that appear in the chunk."""
+        terms = set(tokenize(query))
+        if not terms:
+            return 0.0
+        total = 0.0
+        matched = 0.0
+        for term in terms:
+            weight = self.idf.get(term, self.max_idf)
+            total += weight
+            if any(d == doc_id for d, _ in self.postings.get(term, ())):
+                matched += weight
+        return matched / total if total else 0.0
+
+    def to_dict(self) -> dict:
+        return {"postings": self.postings, "doc_lengths": self.doc_lengths, "k1": self.k1, "b": self.b}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BM25Index":
+        postings = {term: [tuple(p) for p in posting] for term, posting in data["postings"].items()}
+        return cls(postings, data["doc_lengths"], data.get("k1", 1.5), data.get("b", 0.75))
@@ -1,16 +1,16 @@
 import io
 import re
-import json
 import random
-import time
 import requests
 import os
-from typing import List, Dict, Tuple
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
 from PIL import Image
 import PyPDF2
 import pytesseract
 from pdf2image import convert_from_bytes
-from groq import Groq
 
 # Optional: DOCX support
 try:
@@ -20,6 +20,18 @@ except ImportError:
     DOCX_SUPPORT = False
     print("⚠️ python-docx not installed. DOCX files will not be supported.")
 
+from services.document_grounding import ground_topics
+from services.llm_client import LLMError, LLMUnavailableError, llm_client
+from services.question_bank import question_bank
+from services.question_dedup import overgeneration_allowance, question_deduplicator
+from services.research_cache import research_cache
+from services.structured_output import (
+    ITEM_VALIDATORS, LLM_JSON_MODE, STRUCTURED_OUTPUT_REPROMPTS,
+    salvage_items, structured_output_stats, validate_flashcards, validate_questions,
+)
+from services.topic_extraction import allocate_topic_counts, extract_topics, topic_cap, topics_needed
+from utils.json_stream import JsonArrayItemParser
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -28,42 +40,105 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 if not GROQ_API_KEY:
     raise ValueError("GROQ_API_KEY not found in environment variables")
 
-groq_client = Groq(api_key=GROQ_API_KEY)
+# Topics researched at the same time; the Groq rate limiter paces the actual calls
+TOPIC_CONCURRENCY = int(os.getenv("TOPIC_CONCURRENCY", "4"))
+
+# Bump when the research prompt changes so cached research is not reused
+RESEARCH_PROMPT_VERSION = "v1"
+
+# "combined": one Groq call per topic returns MCQs and flashcards together (used by /upload)
+# "separate": research + quiz and research + flashcards per topic (no research for topics
+# grounded in the uploaded document, see services/document_grounding.py)
+GENERATION_MODE = os.getenv("GENERATION_MODE", "combined")
+
+# generate_mcq_quiz packs several topics into one prompt, sized to an output-token budget
+QUIZ_BATCHING = os.getenv("QUIZ_BATCHING", "1") == "1"
+QUIZ_BATCH_TOKEN_BUDGET = int(os.getenv("QUIZ_BATCH_TOKEN_BUDGET", "3500"))
+QUIZ_BATCH_MAX_TOPICS = int(os.getenv("QUIZ_BATCH_MAX_TOPICS", "8"))
+# Rough completion size of one MCQ with options and explanation, plus per-topic JSON overhead
+TOKENS_PER_QUESTION = 220
+TOKENS_PER_TOPIC = 20
+# Document excerpt per topic in a batched prompt (the per-topic prompts take the whole excerpt)
+QUIZ_BATCH_EXCERPT_CHARS = int(os.getenv("QUIZ_BATCH_EXCERPT_CHARS", "1200"))
+# Existing stems listed in a dedup top-up prompt
+TOP_UP_AVOID_MAX = 40
+
+# Appended to prompts grounded in the uploaded document instead of research
+GROUNDED_PROMPT_RULES = """Base everything on the notes above; where they only touch on a point, complete it from standard knowledge of the subject.
+Every item must make sense on its own: never refer to "the notes", "the excerpt" or "the document"."""
 
 # ============================================================================
 # GROQ API FUNCTIONS
 # ============================================================================
 
-def call_groq_api(prompt: str, max_tokens: int = 8000, temperature: float = 0.7) -> str:
-    """Call Groq API with error handling."""
-    try:
-        print(f"🤖 Calling Groq API...")
-        
-        chat_completion = groq_client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert educational researcher and content creator specializing in exam and placement preparation. You create challenging, diverse questions and flashcards that test deep understanding, application, analysis, and problem-solving skills. Avoid repetition, ensure variety in question types, and focus on high-value concepts for competitive exams and job placements."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            model="llama-3.3-70b-versatile",
-            temperature=temperature,
-            max_tokens=max_tokens,
-            top_p=1,
-            stream=False
-        )
-        
-        response = chat_completion.choices[0].message.content
-        print(f"✅ Groq API response received ({len(response)} chars)")
-        return response
-        
-    except Exception as e:
-        print(f"❌ Groq API error: {e}")
-        return None
+GROQ_MODEL = "llama-3.3-70b-versatile"
+
+
+class GenerationStopped(Exception):
+    """Raised instead of a Groq call once the request already has the items it needs."""
+
+GROQ_SYSTEM_PROMPT = "You are an expert educational researcher and content creator specializing in exam and placement preparation. You create challenging, diverse questions and flashcards that test deep understanding, application, analysis, and problem-solving skills. Avoid repetition, ensure variety in question types, and focus on high-value concepts for competitive exams and job placements."
+
+
+def check_stop(stop: Optional[threading.Event], label: str = "generation"):
+    if stop is not None and stop.is_set():
+        raise GenerationStopped(f"{label} skipped, enough items were already generated")
+
+
+def groq_messages(prompt: str) -> List[Dict]:
+    return [
+        {
+            "role": "system",
+            "content": GROQ_SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+
+def call_groq_api(
+    prompt: str,
+    max_tokens: int = 8000,
+    temperature: float = 0.7,
+    label: str = "completion",
+    json_mode: bool = False,
+    stop: Optional[threading.Event] = None
+) -> str:
+    """
+    Call Groq through the shared LLM client; raises LLMError once retries are exhausted,
+    or GenerationStopped without calling if stop is set.
+    """
+    check_stop(stop, label)
+    print(f"🤖 Calling Groq API ({label})...")
+    return llm_client.complete(
+        groq_messages(prompt),
+        model=GROQ_MODEL,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        label=label,
+        json_mode=json_mode,
+    )
+
+
+def call_groq_api_stream(
+    prompt: str,
+    max_tokens: int = 8000,
+    temperature: float = 0.7,
+    label: str = "completion",
+    stop: Optional[threading.Event] = None
+) -> Iterator[str]:
+    """Stream a Groq completion, yielding text deltas as they arrive; raises LLMError if the call fails."""
+    check_stop(stop, label)
+    print(f"🤖 Streaming Groq API ({label})...")
+    return llm_client.stream(
+        groq_messages(prompt),
+        model=GROQ_MODEL,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        label=label,
+    )
 
 
 # ============================================================================
@@ -155,72 +230,118 @@ Ensure questions are appropriate for someone with basic knowledge seeking deeper
 # TOPIC EXTRACTION
 # ============================================================================
 
-def extract_all_topics(text: str) -> List[str]:
-    """Extract ALL topics from the document."""
+def extract_all_topics(text: str, max_topics: Optional[int] = None) -> List[str]:
+    """
+    Extract the most salient topics from the document, best first.
+    max_topics caps how many come back, and so how many topics get Groq calls.
+    """
     print(f"\n{'='*60}")
-    print("🎯 EXTRACTING ALL TOPICS FROM DOCUMENT")
+    print("🎯 EXTRACTING TOPICS FROM DOCUMENT")
     print(f"{'='*60}\n")
     
     print(f"📄 Document content:\n{text[:500]}...\n")
     
-    topics = []
+    topics = extract_topics(text) if max_topics is None else extract_topics(text, max_topics)
     
-    # Method 1: Split by common delimiters
-    lines = text.replace('–', '\n').replace('-', '\n').replace(',', '\n').split('\n')
+    print(f"✅ Selected {len(topics)} topics:")
+    for i, topic in enumerate(topics, 1):
+        print(f"   {i}. {topic}")
     
-    for line in lines:
-        line = line.strip()
-        
-        # Remove prefixes like numbers, bullets
-        line = re.sub(r'^\d+[\.\)]\s*', '', line)
-        line = re.sub(r'^[•\-*]\s*', '', line)
-        
-        # Skip empty or very short lines
-        if len(line) < 3:
-            continue
-        
-        # Skip lines with only special characters
-        if not any(c.isalpha() for c in line):
-            continue
+    return topics
+
+
+# ============================================================================
+# STRUCTURED ITEM GENERATION
+# ============================================================================
+
+def generate_items(
+    build_prompt: Callable[[Dict[str, int]], str],
+    counts: Dict[str, int],
+    topic: str,
+    max_tokens: int,
+    temperature: float,
+    label: str,
+    stop: Optional[threading.Event] = None
+) -> Dict[str, List[Dict]]:
+    """
+    Ask for counts[kind] items of each kind ("questions", "flashcards") with
+    build_prompt(counts) in JSON mode, keeping every valid item that can be
+    salvaged. Kinds that come up short are asked for again with a prompt for just
+    the missing counts, up to STRUCTURED_OUTPUT_REPROMPTS times. Only the first
+    call's LLMError propagates. Setting stop skips calls not yet made.
+    """
+    items: Dict[str, List[Dict]] = {kind: [] for kind in counts}
+    missing = {kind: count for kind, count in counts.items() if count > 0}
+    reprompts = 0
+    while missing:
+        prompt = build_prompt({kind: missing.get(kind, 0) for kind in counts})
+        try:
+            response = call_groq_api(
+                prompt, max_tokens=max_tokens, temperature=temperature, label=label, json_mode=LLM_JSON_MODE, stop=stop
+            )
+        except LLMError as e:
+            if not reprompts:
+                raise
+            print(f"⚠️ Re-prompt for '{topic}' failed, keeping what was generated: {e}")
+            break
         
-        # Clean up the line
-        line = line.strip('.,;:!? ')
+        raw = salvage_items(response, missing)
+        for kind, count in missing.items():
+            items[kind] += ITEM_VALIDATORS[kind](raw[kind], topic)[:count]
         
-        # Add if it looks like a topic
-        if len(line) > 2 and len(line) < 200:
-            topics.append(line)
-    
-    # Method 2: Extract capitalized phrases
-    capitalized = re.findall(r'\b[A-Z][a-zA-Z\s]+(?:\([A-Z]+\))?', text)
-    for cap in capitalized:
-        cap = cap.strip()
-        if 3 < len(cap) < 100 and cap not in topics:
-            topics.append(cap)
-    
-    # Remove duplicates while preserving order
-    unique_topics = []
-    seen = set()
-    for topic in topics:
-        topic_lower = topic.lower().strip()
-        if topic_lower not in seen and len(topic_lower) > 3:
-            seen.add(topic_lower)
-            unique_topics.append(topic.strip())
-    
-    print(f"✅ Extracted {len(unique_topics)} unique topics:")
-    for i, topic in enumerate(unique_topics, 1):
-        print(f"   {i}. {topic}")
+        missing = {kind: count - len(items[kind]) for kind, count in counts.items() if len(items[kind]) < count}
+        if not missing or reprompts >= STRUCTURED_OUTPUT_REPROMPTS:
+            break
+        reprompts += 1
+        structured_output_stats.add(reprompts=1)
+        print(f"🔁 Re-prompting for the missing items on '{topic}': {missing}")
     
-    return unique_topics
+    return items
 
 
 # ============================================================================
 # INDIVIDUAL TOPIC RESEARCH & QUIZ GENERATION
 # ============================================================================
 
-def research_and_generate_questions_for_topic(topic: str, num_questions: int = 2, difficulty: str = "medium") -> List[Dict]:
+def research_topic(topic: str, difficulty: str = "medium", stop: Optional[threading.Event] = None) -> Optional[str]:
+    """
+    Research a topic at the given difficulty. Quiz and flashcard generation share
+    this research through the research cache, as do different users' uploads.
+    """
+    difficulty = difficulty.lower().strip()
+    if difficulty not in ("easy", "hard"):
+        difficulty = "medium"
+    research_instructions = get_difficulty_prompts(difficulty)["research_instructions"]
+    
+    research_prompt = f"""You are an expert in exam and placement preparation. Provide research on the topic: {topic}.
+
+{research_instructions}
+
+Also cover key differences from similar concepts, common exam traps and memory aids where useful.
+
+Provide 600-800 words of structured information suitable for generating {difficulty} level MCQs and flashcards."""
+
+    return research_cache.get_or_research(
+        topic, difficulty, RESEARCH_PROMPT_VERSION,
+        lambda: call_groq_api(research_prompt, max_tokens=3000, temperature=0.6, label="research", stop=stop),
+    )
+
+
+def research_and_generate_questions_for_topic(
+    topic: str,
+    num_questions: int = 2,
+    difficulty: str = "medium",
+    context: Optional[str] = None,
+    avoid: Optional[List[str]] = None,
+    stop: Optional[threading.Event] = None
+) -> List[Dict]:
     """
     Research a single topic and generate questions from that research.
     This ensures questions are meaningful and based on actual knowledge.
+    With context (the topic's excerpt of the uploaded document) the questions
+    are written from the document instead and the research call is skipped.
+    avoid lists question stems the new questions must not repeat.
+    Setting stop raises GenerationStopped before the next Groq call.
     Difficulty can be: easy, medium, or hard
     """
     print(f"\n{'='*60}")
@@ -229,41 +350,48 @@ def research_and_generate_questions_for_topic(topic: str, num_questions: int = 2
     
     # Get difficulty-specific prompts
     difficulty_info = get_difficulty_prompts(difficulty)
-    research_instructions = difficulty_info["research_instructions"]
     quiz_style = difficulty_info["quiz_style"]
     temperature = difficulty_info["temperature"]
     
-    # Step 1: Research the topic thoroughly
-    print(f"📚 Step 1: Researching '{topic}' at {difficulty} level...")
-    
-    research_prompt = f"""You are an expert in exam and placement preparation. Provide research on the topic: {topic}.
-
-{research_instructions}
-
-Provide 600-800 words of structured information suitable for generating {difficulty} level MCQs."""
-
-    research_content = call_groq_api(research_prompt, max_tokens=3000, temperature=0.6)
-    
-    if not research_content:
-        print(f"⚠️ Research failed for '{topic}', using fallback")
-        research_content = f"{topic} is an important concept in the field. It involves various aspects and applications that are crucial for understanding the subject matter."
-    
-    print(f"✅ Research complete: {len(research_content)} characters")
-    print(f"Preview: {research_content[:200]}...\n")
-    
-    # Step 2: Generate questions from the research
-    print(f"🧠 Step 2: Generating {num_questions} {difficulty} questions from research...")
-    
-    quiz_prompt = f"""Using the following research on {topic}, {quiz_style.format(num_questions=num_questions)}
+    if context:
+        print(f"📎 Step 1: Using {len(context)} characters of the document for '{topic}' (no research call)\n")
+        source = f"notes on {topic}"
+        source_block = f"NOTES:\n{context}\n\n{GROUNDED_PROMPT_RULES}"
+        explanation = "Detailed explanation of why the answer is correct"
+    else:
+        # Step 1: Research the topic thoroughly (shared with flashcards via the research cache)
+        print(f"📚 Step 1: Researching '{topic}' at {difficulty} level...")
+        
+        research_content = research_topic(topic, difficulty, stop=stop)
+        
+        if not research_content:
+            print(f"⚠️ Research failed for '{topic}', using fallback")
+            research_content = f"{topic} is an important concept in the field. It involves various aspects and applications that are crucial for understanding the subject matter."
+        
+        print(f"✅ Research complete: {len(research_content)} characters")
+        print(f"Preview: {research_content[:200]}...\n")
+        source = f"research on {topic}"
+        source_block = f"RESEARCH:\n{research_content}"
+        explanation = "Detailed explanation with references to research"
+    
+    # Step 2: Generate questions from the research or the document
+    print(f"🧠 Step 2: Generating {num_questions} {difficulty} questions from {source}...")
+    
+    avoid_block = ""
+    if avoid:
+        existing = "\n".join(f"- {stem}" for stem in avoid)
+        avoid_block = f"\nThese questions already exist; ask about different points:\n{existing}\n"
+    
+    def build_quiz_prompt(counts: Dict[str, int]) -> str:
+        return f"""Using the following {source}, {quiz_style.format(num_questions=counts["questions"])}
 
-RESEARCH:
-{research_content}
+{source_block}
 
 Each MCQ must:
 - Have 4 options: 1 correct, 3 distractors
-- Include a detailed explanation referencing the research
+- Include a detailed explanation
 - Vary question types: no repetition in style or focus
-
+{avoid_block}
 Return ONLY valid JSON:
 {{
   "questions": [
@@ -271,47 +399,18 @@ Return ONLY valid JSON:
       "question": "Question text for {topic}",
       "options": ["Correct answer", "Distractor 1", "Distractor 2", "Distractor 3"],
       "correct_answer": 0,
-      "explanation": "Detailed explanation with references to research",
+      "explanation": "{explanation}",
       "topic": "{topic}"
     }}
   ]
 }}"""
 
-    quiz_response = call_groq_api(quiz_prompt, max_tokens=4000, temperature=temperature)
-    
-    questions = []
-    
-    if quiz_response:
-        try:
-            # Extract JSON
-            json_match = re.search(r'\{.*\}', quiz_response, re.DOTALL)
-            if json_match:
-                quiz_data = json.loads(json_match.group())
-                questions = quiz_data.get("questions", [])
-                
-                # Validate questions
-                valid_questions = []
-                for q in questions:
-                    if all(key in q for key in ["question", "options", "correct_answer"]):
-                        # Ensure exactly 4 options
-                        if len(q["options"]) >= 4:
-                            q["options"] = q["options"][:4]
-                        else:
-                            while len(q["options"]) < 4:
-                                q["options"].append(f"Additional option {len(q['options']) + 1}")
-                        
-                        # Validate correct_answer
-                        if isinstance(q["correct_answer"], int) and 0 <= q["correct_answer"] < 4:
-                            q["topic"] = topic
-                            if "explanation" not in q:
-                                q["explanation"] = f"This is the correct answer about {topic}."
-                            valid_questions.append(q)
-                
-                questions = valid_questions
-                print(f"✅ Generated {len(questions)} valid questions for '{topic}'")
-                
-        except json.JSONDecodeError as e:
-            print(f"⚠️ JSON parsing error: {e}")
+    questions = generate_items(
+        build_quiz_prompt, {"questions": num_questions}, topic,
+        max_tokens=4000, temperature=temperature, label="quiz", stop=stop,
+    )["questions"]
+    print(f"✅ Generated {len(questions)} valid questions for '{topic}'")
+    question_bank.add(questions, difficulty)
     
     # Fallback if generation failed
     if not questions:
@@ -332,43 +431,46 @@ Return ONLY valid JSON:
     return questions
 
 
-def research_and_generate_flashcards_for_topic(topic: str, num_cards: int = 2) -> List[Dict]:
+def research_and_generate_flashcards_for_topic(
+    topic: str,
+    num_cards: int = 2,
+    difficulty: str = "medium",
+    context: Optional[str] = None,
+    stop: Optional[threading.Event] = None
+) -> List[Dict]:
     """
-    Research a single topic and generate flashcards from that research.
+    Research a single topic and generate flashcards from that research,
+    or from context (the topic's excerpt of the uploaded document) without researching.
+    Setting stop raises GenerationStopped before the next Groq call.
     """
     print(f"\n{'='*60}")
     print(f"📚 GENERATING FLASHCARDS FOR: {topic}")
     print(f"{'='*60}\n")
     
-    # Step 1: Research the topic
-    print(f"🔬 Step 1: Researching '{topic}'...")
-    
-    research_prompt = f"""Provide exam-focused research on {topic} for placement and competitive prep.
-
-Include:
-1. Core definitions with nuances
-2. Key differences from similar concepts
-3. Applications, pros/cons, and optimizations
-4. Common exam traps and interview questions
-5. Mnemonics or memory aids if applicable
-6. Recent trends or advanced topics
-
-Deliver 600-800 words of structured, memorable content for flashcards."""
-
-    research_content = call_groq_api(research_prompt, max_tokens=3000, temperature=0.6)
-    
-    if not research_content:
-        research_content = f"{topic} is an important area of study with various applications and considerations."
-    
-    print(f"✅ Research complete: {len(research_content)} characters\n")
+    if context:
+        print(f"📎 Step 1: Using {len(context)} characters of the document for '{topic}' (no research call)\n")
+        source = f"notes on {topic}"
+        source_block = f"NOTES:\n{context}\n\n{GROUNDED_PROMPT_RULES}"
+    else:
+        # Step 1: Research the topic (usually already cached by quiz generation)
+        print(f"🔬 Step 1: Researching '{topic}'...")
+        
+        research_content = research_topic(topic, difficulty, stop=stop)
+        
+        if not research_content:
+            research_content = f"{topic} is an important area of study with various applications and considerations."
+        
+        print(f"✅ Research complete: {len(research_content)} characters\n")
+        source = f"research on {topic}"
+        source_block = f"RESEARCH:\n{research_content}"
     
     # Step 2: Generate flashcards
     print(f"🎴 Step 2: Generating {num_cards} flashcards...")
     
-    flashcard_prompt = f"""From the research on {topic}, create EXACTLY {num_cards} diverse flashcards for exam/placement prep.
+    def build_flashcard_prompt(counts: Dict[str, int]) -> str:
+        return f"""From the {source}, create EXACTLY {counts["flashcards"]} diverse flashcards for exam/placement prep.
 
-RESEARCH:
-{research_content}
+{source_block}
 
 Each flashcard must:
 - Front: A key concept, term, difference, or scenario question
@@ -392,31 +494,11 @@ Return ONLY valid JSON:
 
 Ensure no overlap with MCQ styles; prioritize unique, high-yield content."""
 
-    flashcard_response = call_groq_api(flashcard_prompt, max_tokens=4000, temperature=0.8)
-    
-    flashcards = []
-    
-    if flashcard_response:
-        try:
-            json_match = re.search(r'\{.*\}', flashcard_response, re.DOTALL)
-            if json_match:
-                data = json.loads(json_match.group())
-                flashcards = data.get("flashcards", [])
-                
-                # Validate
-                valid_cards = []
-                for card in flashcards:
-                    if "front" in card and "back" in card:
-                        card["question"] = card.get("question", card["front"])
-                        card["answer"] = card.get("answer", card["back"])
-                        card["topic"] = topic
-                        valid_cards.append(card)
-                
-                flashcards = valid_cards
-                print(f"✅ Generated {len(flashcards)} valid flashcards for '{topic}'")
-                
-        except json.JSONDecodeError as e:
-            print(f"⚠️ JSON parsing error: {e}")
+    flashcards = generate_items(
+        build_flashcard_prompt, {"flashcards": num_cards}, topic,
+        max_tokens=4000, temperature=0.8, label="flashcards", stop=stop,
+    )["flashcards"]
+    print(f"✅ Generated {len(flashcards)} valid flashcards for '{topic}'")
     
     # Fallback
     if not flashcards:
@@ -432,16 +514,458 @@ Ensure no overlap with MCQ styles; prioritize unique, high-yield content."""
     return flashcards
 
 
+# ============================================================================
+# COMBINED PER-TOPIC GENERATION
+# ============================================================================
+
+def build_combined_prompt(
+    topic: str,
+    num_questions: int,
+    num_cards: int,
+    difficulty: str = "medium",
+    context: Optional[str] = None
+) -> str:
+    """One prompt asking for both MCQs and flashcards on a topic, grounded in context when given."""
+    difficulty_info = get_difficulty_prompts(difficulty)
+    
+    sections = []
+    if num_questions:
+        sections.append(f"""MCQs: {difficulty_info["quiz_style"].format(num_questions=num_questions)}
+Each MCQ must have 4 options (1 correct, 3 distractors) and a detailed explanation.""")
+    if num_cards:
+        sections.append(f"""FLASHCARDS: Create EXACTLY {num_cards} diverse flashcards.
+- Front: A key concept, term, difference, or scenario question
+- Back: Concise yet detailed answer with examples, pros/cons, or steps
+- Vary types: definitions, comparisons, processes, pitfalls
+- Do not repeat the MCQs; prioritize unique, high-yield content""")
+    
+    if context:
+        source = f"""Work from these notes the student uploaded on {topic}:
+
+NOTES:
+{context}
+
+{GROUNDED_PROMPT_RULES}
+
+Use them to produce:"""
+    else:
+        source = f"First recall the key definitions, principles, applications, differences from similar concepts and common exam traps for {topic}. Then use that knowledge to produce:"
+    
+    return f"""You are preparing exam and placement study material on: {topic}.
+
+{source}
+
+{chr(10).join(sections)}
+
+Return ONLY valid JSON:
+{{
+  "questions": [
+    {{
+      "question": "Question text for {topic}",
+      "options": ["Correct answer", "Distractor 1", "Distractor 2", "Distractor 3"],
+      "correct_answer": 0,
+      "explanation": "Detailed explanation",
+      "topic": "{topic}"
+    }}
+  ],
+  "flashcards": [
+    {{
+      "front": "Key term or question",
+      "back": "Detailed, memorable answer with examples and tips",
+      "topic": "{topic}"
+    }}
+  ]
+}}"""
+
+
+def generate_topic_questions_and_flashcards(
+    topic: str,
+    num_questions: int = 2,
+    num_cards: int = 2,
+    difficulty: str = "medium",
+    context: Optional[str] = None,
+    stop: Optional[threading.Event] = None
+) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Generate MCQs and flashcards for one topic with a single Groq call, grounded
+    in context (the topic's document excerpt) when given. Items missing after
+    validation are asked for once more; a part that still has no valid items
+    falls back to the separate generation path with the same context.
+    Setting stop raises GenerationStopped before the next Groq call.
+    """
+    print(f"\n{'='*60}")
+    print(f"⚡ COMBINED GENERATION FOR: {topic} ({num_questions} questions, {num_cards} flashcards, {difficulty})")
+    print(f"{'='*60}\n")
+    
+    temperature = get_difficulty_prompts(difficulty)["temperature"]
+    
+    items = generate_items(
+        lambda counts: build_combined_prompt(topic, counts["questions"], counts["flashcards"], difficulty, context),
+        {"questions": num_questions, "flashcards": num_cards}, topic,
+        max_tokens=6000, temperature=temperature, label="combined", stop=stop,
+    )
+    questions, flashcards = items["questions"], items["flashcards"]
+    print(f"✅ Combined call gave {len(questions)} questions and {len(flashcards)} flashcards for '{topic}'")
+    question_bank.add(questions, difficulty)
+    
+    if num_questions and not questions:
+        print(f"⚠️ No valid questions from combined call for '{topic}', using separate path")
+        questions = research_and_generate_questions_for_topic(
+            topic, num_questions, difficulty=difficulty, context=context, stop=stop
+        )
+    
+    if num_cards and not flashcards:
+        print(f"⚠️ No valid flashcards from combined call for '{topic}', using separate path")
+        flashcards = research_and_generate_flashcards_for_topic(
+            topic, num_cards, difficulty=difficulty, context=context, stop=stop
+        )
+    
+    return questions, flashcards
+
+
+def stream_topic_questions_and_flashcards(
+    topic: str,
+    num_questions: int = 2,
+    num_cards: int = 2,
+    difficulty: str = "medium",
+    stop: Optional[threading.Event] = None,
+    context: Optional[str] = None
+) -> Iterator[Tuple[str, Dict]]:
+    """
+    Streaming version of generate_topic_questions_and_flashcards: yields
+    ("questions", item) / ("flashcards", item) as soon as each item's JSON object
+    closes in the completion. Parts that yield nothing valid fall back to the
+    separate path once the stream ends. Setting stop ends generation early.
+    """
+    if stop is not None and stop.is_set():
+        return
+    
+    prompt = build_combined_prompt(topic, num_questions, num_cards, difficulty, context)
+    temperature = get_difficulty_prompts(difficulty)["temperature"]
+    limits = {"questions": num_questions, "flashcards": num_cards}
+    emitted = {"questions": 0, "flashcards": 0}
+    
+    parser = JsonArrayItemParser(limits.keys())
+    streamed_questions = []
+    deltas = call_groq_api_stream(prompt, max_tokens=6000, temperature=temperature, label="combined", stop=stop)
+    try:
+        for delta in deltas:
+            for kind, item in parser.feed(delta):
+                valid = validate_questions([item], topic) if kind == "questions" else validate_flashcards([item], topic)
+                if valid and emitted[kind] < limits[kind]:
+                    emitted[kind] += 1
+                    if kind == "questions":
+                        streamed_questions.append(valid[0])
+                    yield kind, valid[0]
+            if parser.done or (stop is not None and stop.is_set()):
+                break
+    finally:
+        deltas.close()
+        question_bank.add(streamed_questions, difficulty)
+    
+    if stop is not None and stop.is_set():
+        return
+    
+    print(f"✅ Streamed {emitted['questions']} questions and {emitted['flashcards']} flashcards for '{topic}'")
+    
+    if num_questions and not emitted["questions"]:
+        print(f"⚠️ No valid streamed questions for '{topic}', using separate path")
+        for q in research_and_generate_questions_for_topic(
+            topic, num_questions, difficulty=difficulty, context=context, stop=stop
+        ):
+            yield "questions", q
+    
+    if num_cards and not emitted["flashcards"]:
+        print(f"⚠️ No valid streamed flashcards for '{topic}', using separate path")
+        for card in research_and_generate_flashcards_for_topic(
+            topic, num_cards, difficulty=difficulty, context=context, stop=stop
+        ):
+            yield "flashcards", card
+
+
+# ============================================================================
+# BATCHED MULTI-TOPIC QUIZ GENERATION
+# ============================================================================
+
+def plan_quiz_batches(counts: List[int], token_budget: int = QUIZ_BATCH_TOKEN_BUDGET) -> List[List[int]]:
+    """
+    Group consecutive topic indices so each batch's expected completion fits the
+    token budget. A topic that alone exceeds the budget gets a batch of its own.
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for i, count in enumerate(counts):
+        tokens = TOKENS_PER_TOPIC + count * TOKENS_PER_QUESTION
+        if current and (current_tokens + tokens > token_budget or len(current) >= QUIZ_BATCH_MAX_TOPICS):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def excerpt_for_batch(context: str, max_chars: int = QUIZ_BATCH_EXCERPT_CHARS) -> str:
+    """Shorten a topic's document excerpt for a batched prompt, at a word boundary."""
+    if len(context) <= max_chars:
+        return context
+    return context[:max_chars].rsplit(None, 1)[0] + " ..."
+
+
+def generate_questions_for_topic_batch(
+    topics: List[str],
+    counts: List[int],
+    difficulty: str = "medium",
+    grounding: Optional[Dict[str, str]] = None,
+    stop: Optional[threading.Event] = None
+) -> List[Dict]:
+    """
+    Generate MCQs for several topics with one Groq call and split them back out
+    by topic, in topic order. grounding maps topics to document excerpts that
+    are included (shortened) in the prompt. Topics left short of valid questions
+    ask the per-topic path for the missing count.
+    """
+    grounding = grounding or {}
+    if len(topics) == 1:
+        return research_and_generate_questions_for_topic(
+            topics[0], counts[0], difficulty=difficulty, context=grounding.get(topics[0]), stop=stop
+        )
+    
+    print(f"\n{'='*60}")
+    print(f"📦 BATCHED QUIZ GENERATION FOR {len(topics)} TOPICS ({sum(counts)} questions, {difficulty})")
+    print(f"{'='*60}\n")
+    
+    difficulty_info = get_difficulty_prompts(difficulty)
+    topic_list = "\n".join(
+        f"{i}. {topic} - {count} question(s)" for i, (topic, count) in enumerate(zip(topics, counts), 1)
+    )
+    notes = "\n\n".join(
+        f"[{i}] {topic}\n{excerpt_for_batch(grounding[topic])}"
+        for i, topic in enumerate(topics, 1) if topic in grounding
+    )
+    notes_block = f"\n\nNOTES the student uploaded, by topic number:\n{notes}\n\n{GROUNDED_PROMPT_RULES}" if notes else ""
+    
+    prompt = f"""You are writing exam and placement MCQs for several topics at once. {difficulty_info["quiz_style"].format(num_questions=sum(counts))}
+
+TOPICS (generate exactly the listed number of MCQs for each topic):
+{topic_list}{notes_block}
+
+Each MCQ must:
+- Have 4 options: 1 correct, 3 distractors
+- Include a detailed explanation
+- Set "topic_id" to the number of the topic it is about
+
+Return ONLY valid JSON:
+{{
+  "questions": [
+    {{
+      "topic_id": 1,
+      "question": "Question text",
+      "options": ["Correct answer", "Distractor 1", "Distractor 2", "Distractor 3"],
+      "correct_answer": 0,
+      "explanation": "Detailed explanation"
+    }}
+  ]
+}}"""
+
+    expected_tokens = sum(TOKENS_PER_TOPIC + count * TOKENS_PER_QUESTION for count in counts)
+    response = call_groq_api(
+        prompt, max_tokens=min(8000, expected_tokens * 3 // 2 + 500),
+        temperature=difficulty_info["temperature"], label="quiz_batch", json_mode=LLM_JSON_MODE, stop=stop,
+    )
+    raw_questions = salvage_items(response, ["questions"])["questions"]
+    
+    # Attribute each question to its topic by topic_id, falling back to an exact topic name
+    by_topic: List[List[Dict]] = [[] for _ in topics]
+    topic_lookup = {topic.lower().strip(): i for i, topic in enumerate(topics)}
+    for q in raw_questions:
+        if not isinstance(q, dict):
+            continue
+        topic_id = q.pop("topic_id", None)
+        if isinstance(topic_id, int) and 1 <= topic_id <= len(topics):
+            by_topic[topic_id - 1].append(q)
+        elif isinstance(q.get("topic"), str) and q["topic"].lower().strip() in topic_lookup:
+            by_topic[topic_lookup[q["topic"].lower().strip()]].append(q)
+    
+    all_questions = []
+    for topic, count, questions in zip(topics, counts, by_topic):
+        questions = validate_questions(questions, topic)[:count]
+        question_bank.add(questions, difficulty)
+        if not questions:
+            print(f"⚠️ No valid batched questions for '{topic}', using per-topic path")
+            questions = research_and_generate_questions_for_topic(
+                topic, count, difficulty=difficulty, context=grounding.get(topic), stop=stop
+            )
+        elif len(questions) < count and STRUCTURED_OUTPUT_REPROMPTS > 0:
+            print(f"⚠️ {len(questions)}/{count} valid batched questions for '{topic}', asking for the rest")
+            try:
+                extra = generate_items(
+                    lambda counts: build_combined_prompt(topic, counts["questions"], 0, difficulty, grounding.get(topic)),
+                    {"questions": count - len(questions)}, topic,
+                    max_tokens=4000, temperature=difficulty_info["temperature"], label="quiz", stop=stop,
+                )["questions"]
+                question_bank.add(extra, difficulty)
+                questions += extra
+            except LLMError as e:
+                print(f"⚠️ Could not top up '{topic}', keeping {len(questions)} question(s): {e}")
+        all_questions.extend(questions)
+    
+    print(f"✅ Batch produced {len(all_questions)} questions for {len(topics)} topics")
+    return all_questions
+
+
 # ============================================================================
 # MAIN GENERATION FUNCTIONS
 # ============================================================================
 
-def generate_mcq_quiz(text: str, num_questions: int = 10, difficulty: str = "medium") -> Dict:
+def generate_for_topics(
+    topics: List[str],
+    counts: List[int],
+    target: int,
+    generate_fn: Callable[[str, int, threading.Event], List[Dict]],
+) -> List[Dict]:
+    """
+    Run generate_fn(topic, count, stop) for topics concurrently and return the items in topic order.
+    Like the old sequential loop, topics stop being added once target items are collected;
+    only as many topics are started as are expected to reach the target. stop is set
+    on return, so topics still running skip their remaining Groq calls.
+    A topic whose Groq call fails is skipped, but an open circuit, or every topic
+    failing, raises the LLMError instead of returning nothing.
+    """
+    items: List[Dict] = []
+    llm_error: Optional[LLMError] = None
+    finished: Dict[int, List[Dict]] = {}
+    running = {}
+    next_topic = 0
+    merged_upto = 0
+    stop = threading.Event()
+
+    pool = ThreadPoolExecutor(max_workers=max(1, TOPIC_CONCURRENCY), thread_name_prefix="topic")
+    try:
+        while True:
+            expected = len(items) + sum(len(r) for r in finished.values()) + sum(counts[i] for i in running.values())
+            while next_topic < len(topics) and len(running) < TOPIC_CONCURRENCY and expected < target:
+                print(f"\n[{next_topic+1}/{len(topics)}] Processing topic: {topics[next_topic]}")
+                running[pool.submit(generate_fn, topics[next_topic], counts[next_topic], stop)] = next_topic
+                expected += counts[next_topic]
+                next_topic += 1
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = running.pop(future)
+                try:
+                    finished[i] = future.result()
+                except LLMUnavailableError:
+                    raise
+                except Exception as e:
+                    print(f"❌ Topic '{topics[i]}' failed: {e}")
+                    finished[i] = []
+                    if isinstance(e, LLMError):
+                        llm_error = e
+
+            while merged_upto in finished and len(items) < target:
+                items.extend(finished.pop(merged_upto))
+                merged_upto += 1
+
+            if len(items) >= target:
+                break
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if not items and llm_error is not None:
+        raise llm_error
+    return items
+
+def top_up_unique_questions(
+    questions: List[Dict],
+    num_questions: int,
+    topics: List[str],
+    difficulty: str,
+    grounding: Dict[str, str]
+) -> List[Dict]:
+    """
+    Drop near-duplicate questions, then generate replacements for the shortfall
+    on the least covered topics (told which stems to avoid) until num_questions
+    is reached or the request's over-generation budget is spent.
+    """
+    unique = question_deduplicator.dedupe(questions)
+    budget = overgeneration_allowance(num_questions)
+    
+    while len(unique) < num_questions and budget > 0 and topics:
+        shortfall = min(num_questions - len(unique), budget)
+        budget -= shortfall
+        
+        covered = {topic: 0 for topic in topics}
+        for q in unique:
+            if q.get("topic") in covered:
+                covered[q["topic"]] += 1
+        top_up_topics = sorted(topics, key=lambda topic: covered[topic])[:shortfall]
+        avoid = [q["question"] for q in unique][:TOP_UP_AVOID_MAX]
+        print(f"🔁 Topping up {shortfall} question(s) after dedup ({budget} left in the over-generation budget)")
+        
+        try:
+            replacements = generate_for_topics(
+                top_up_topics, allocate_topic_counts(shortfall, len(top_up_topics)), shortfall,
+                lambda topic, count, stop: research_and_generate_questions_for_topic(
+                    topic, count, difficulty=difficulty, context=grounding.get(topic), avoid=avoid, stop=stop
+                ),
+            )[:shortfall]
+        except LLMError as e:
+            print(f"⚠️ Top-up failed, returning {len(unique)} questions: {e}")
+            break
+        
+        question_deduplicator.record_top_up(len(replacements))
+        unique = question_deduplicator.dedupe(unique + replacements)
+    
+    return unique
+
+
+def take_banked_questions(
+    topics: List[str],
+    counts: List[int],
+    target: int,
+    difficulty: str,
+    freshness: Optional[float]
+) -> Tuple[List[Dict], List[str], List[int]]:
+    """
+    Questions the bank serves for the leading topics that reach target, plus the
+    topics and counts still to generate (topics the bank covered are dropped).
+    """
+    needed = topics_needed(counts, target)
+    banked, remaining = question_bank.take_for_topics(topics[:needed], counts[:needed], difficulty, freshness)
+    remaining += counts[needed:]
+    fresh = [(topic, count) for topic, count in zip(topics, remaining) if count > 0]
+    return [q for questions in banked for q in questions], [t for t, _ in fresh], [c for _, c in fresh]
+
+
+def order_by_topic(questions: List[Dict], topics: List[str]) -> List[Dict]:
+    """Group banked and generated questions back into topic order."""
+    position = {topic: i for i, topic in enumerate(topics)}
+    return sorted(questions, key=lambda q: position.get(q.get("topic"), len(topics)))
+
+
+def generate_mcq_quiz(
+    text: str,
+    num_questions: int = 10,
+    difficulty: str = "medium",
+    freshness: Optional[float] = None
+) -> Dict:
     """
     Generate quiz by:
-    1. Extracting all topics from document
-    2. For each topic: research it and generate questions based on difficulty
-    3. Combine all questions
+    1. Extracting the most salient topics from the document (capped by the requested count)
+    2. Serving what the question bank holds for those topics, keeping the
+       freshness share (default QUESTION_BANK_FRESHNESS) for new questions
+    3. For each topic: generate the remaining questions based on difficulty from the
+       document's own excerpt for it, researching only topics the document barely covers
+       (with QUIZ_BATCHING, several topics share one prompt sized to a token budget)
+    4. Combine all questions, drop near duplicates and top up the shortfall
+       within the over-generation budget
     
     Difficulty levels: easy, medium, hard
     """
@@ -449,8 +973,8 @@ def generate_mcq_quiz(text: str, num_questions: int = 10, difficulty: str = "med
     print(f"🎓 STARTING QUIZ GENERATION ({num_questions} questions at {difficulty} level)")
     print(f"{'='*70}\n")
     
-    # Extract all topics
-    topics = extract_all_topics(text)
+    # Extract the topics worth a Groq call for this many questions
+    topics = extract_all_topics(text, topic_cap(num_questions))
     
     if not topics:
         print("⚠️ No topics found!")
@@ -465,32 +989,48 @@ def generate_mcq_quiz(text: str, num_questions: int = 10, difficulty: str = "med
     print(f"\n📊 Will generate questions from {len(topics)} topics")
     print(f"Target: {num_questions} total questions at {difficulty} level\n")
     
-    # Calculate questions per topic
-    questions_per_topic = max(1, num_questions // len(topics))
-    extra_questions = num_questions % len(topics)
-    
-    all_questions = []
-    
-    # Generate questions for each topic
-    for i, topic in enumerate(topics):
-        # Give some topics extra questions if needed
-        topic_question_count = questions_per_topic + (1 if i < extra_questions else 0)
+    # Calculate questions per topic, giving some topics extra questions if needed
+    counts = allocate_topic_counts(num_questions, len(topics))
+    all_topics = topics
+    
+    # Serve from the question bank first; only the shortfall goes to Groq
+    banked_questions, topics, counts = take_banked_questions(topics, counts, num_questions, difficulty, freshness)
+    target = num_questions - len(banked_questions)
+    grounding = ground_topics(text, all_topics) if target > 0 else {}
+    
+    if target <= 0 or not topics:
+        all_questions = []
+    elif QUIZ_BATCHING and len(topics) > 1:
+        # Several topics per prompt; batches run concurrently like single topics do
+        batches = plan_quiz_batches(counts)
+        labels = [" | ".join(topics[i] for i in batch) for batch in batches]
+        batch_by_label = dict(zip(labels, batches))
+        print(f"📦 Packed {len(topics)} topics into {len(batches)} batch(es)")
         
-        if len(all_questions) >= num_questions:
-            break
-        
-        print(f"\n[{i+1}/{len(topics)}] Processing topic: {topic}")
-        print(f"Generating {topic_question_count} {difficulty} question(s)...")
-        
-        topic_questions = research_and_generate_questions_for_topic(topic, topic_question_count, difficulty=difficulty)
-        all_questions.extend(topic_questions)
-        
-        # Small delay to avoid rate limiting
-        if i < len(topics) - 1:
-            time.sleep(1)
+        all_questions = generate_for_topics(
+            labels, [sum(counts[i] for i in batch) for batch in batches], target,
+            lambda label, _, stop: generate_questions_for_topic_batch(
+                [topics[i] for i in batch_by_label[label]],
+                [counts[i] for i in batch_by_label[label]],
+                difficulty=difficulty,
+                grounding=grounding,
+                stop=stop,
+            ),
+        )
+    else:
+        # Generate topics concurrently; the rate limiter replaces the old fixed delay
+        all_questions = generate_for_topics(
+            topics, counts, target,
+            lambda topic, count, stop: research_and_generate_questions_for_topic(
+                topic, count, difficulty=difficulty, context=grounding.get(topic), stop=stop
+            ),
+        )
     
-    # Trim to exact number requested
-    all_questions = all_questions[:num_questions]
+    # Replace near duplicates, then trim to exact number requested
+    all_questions = top_up_unique_questions(
+        banked_questions + all_questions, num_questions, all_topics, difficulty, grounding
+    )
+    all_questions = order_by_topic(all_questions[:num_questions], all_topics)
     
     print(f"\n{'='*70}")
     print(f"✅ QUIZ GENERATION COMPLETE!")
@@ -509,19 +1049,20 @@ def generate_mcq_quiz(text: str, num_questions: int = 10, difficulty: str = "med
     return {"questions": all_questions}
 
 
-def generate_flashcards(text: str, num_cards: int = 10) -> Dict:
+def generate_flashcards(text: str, num_cards: int = 10, difficulty: str = "medium") -> Dict:
     """
     Generate flashcards by:
-    1. Extracting all topics from document
-    2. For each topic: research it and generate flashcards
+    1. Extracting the most salient topics from the document (capped by the requested count)
+    2. For each topic: generate flashcards from the document's excerpt for it,
+       researching only topics the document barely covers
     3. Combine all flashcards
     """
     print(f"\n{'='*70}")
     print(f"📚 STARTING FLASHCARD GENERATION ({num_cards} cards)")
     print(f"{'='*70}\n")
     
-    # Extract all topics
-    topics = extract_all_topics(text)
+    # Extract the topics worth a Groq call for this many flashcards
+    topics = extract_all_topics(text, topic_cap(num_cards))
     
     if not topics:
         return {"flashcards": [{
@@ -536,27 +1077,16 @@ def generate_flashcards(text: str, num_cards: int = 10) -> Dict:
     print(f"Target: {num_cards} total flashcards\n")
     
     # Calculate cards per topic
-    cards_per_topic = max(1, num_cards // len(topics))
-    extra_cards = num_cards % len(topics)
-    
-    all_flashcards = []
+    counts = allocate_topic_counts(num_cards, len(topics))
+    grounding = ground_topics(text, topics)
     
-    # Generate flashcards for each topic
-    for i, topic in enumerate(topics):
-        topic_card_count = cards_per_topic + (1 if i < extra_cards else 0)
-        
-        if len(all_flashcards) >= num_cards:
-            break
-        
-        print(f"\n[{i+1}/{len(topics)}] Processing topic: {topic}")
-        print(f"Generating {topic_card_count} flashcard(s)...")
-        
-        topic_cards = research_and_generate_flashcards_for_topic(topic, topic_card_count)
-        all_flashcards.extend(topic_cards)
-        
-        # Small delay
-        if i < len(topics) - 1:
-            time.sleep(1)
+    # Generate flashcards for topics concurrently
+    all_flashcards = generate_for_topics(
+        topics, counts, num_cards,
+        lambda topic, count, stop: research_and_generate_flashcards_for_topic(
+            topic, count, difficulty=difficulty, context=grounding.get(topic), stop=stop
+        ),
+    )
     
     # Trim to exact number
     all_flashcards = all_flashcards[:num_cards]
@@ -578,6 +1108,239 @@ def generate_flashcards(text: str, num_cards: int = 10) -> Dict:
     return {"flashcards": all_flashcards}
 
 
+def plan_combined_topics(
+    topics: List[str],
+    question_counts: List[int],
+    card_counts: List[int],
+    num_questions: int,
+    num_cards: int
+) -> Dict[str, Tuple[int, int]]:
+    """(questions, flashcards) per leading topic; topics past what one side needs only generate for the other."""
+    question_topics = topics_needed(question_counts, num_questions)
+    card_topics = topics_needed(card_counts, num_cards)
+    return {
+        topic: (question_counts[i] if i < question_topics else 0, card_counts[i] if i < card_topics else 0)
+        for i, topic in enumerate(topics[:max(question_topics, card_topics)])
+    }
+
+
+def bank_combined_plan(
+    plan: Dict[str, Tuple[int, int]],
+    difficulty: str,
+    freshness: Optional[float]
+) -> Tuple[Dict[str, Tuple[int, int]], List[Dict]]:
+    """Serve the plan's questions from the bank; the returned plan keeps only what is left to generate."""
+    topics = list(plan)
+    banked, remaining = question_bank.take_for_topics(topics, [q for q, _ in plan.values()], difficulty, freshness)
+    fresh_plan = {topic: (remaining[i], plan[topic][1]) for i, topic in enumerate(topics)}
+    return fresh_plan, [q for questions in banked for q in questions]
+
+
+def generate_quiz_and_flashcards(
+    text: str,
+    num_questions: int = 10,
+    num_cards: int = 10,
+    difficulty: str = "medium",
+    freshness: Optional[float] = None,
+    on_progress: Optional[Callable[..., None]] = None
+) -> Tuple[Dict, Dict]:
+    """
+    Generate a quiz and flashcards from the same document.
+    In combined mode each topic costs one Groq call instead of four
+    (research + quiz, research + flashcards); topic selection, ordering,
+    question bank use, deduplication and trimming follow generate_mcq_quiz and generate_flashcards.
+    Prompts carry each topic's excerpt of the document where it covers the topic.
+    on_progress(topics_done=, topics_total=, questions=, flashcards=) is called as each topic finishes.
+    """
+    topics = extract_all_topics(text, topic_cap(max(num_questions, num_cards))) if GENERATION_MODE == "combined" else []
+    if not topics:
+        return (
+            generate_mcq_quiz(text, num_questions, difficulty=difficulty, freshness=freshness),
+            generate_flashcards(text, num_cards, difficulty=difficulty),
+        )
+    
+    print(f"\n{'='*70}")
+    print(f"⚡ STARTING COMBINED GENERATION ({num_questions} questions, {num_cards} cards at {difficulty} level)")
+    print(f"{'='*70}\n")
+    
+    question_counts = allocate_topic_counts(num_questions, len(topics))
+    card_counts = allocate_topic_counts(num_cards, len(topics))
+    plan = plan_combined_topics(topics, question_counts, card_counts, num_questions, num_cards)
+    n = len(plan)
+    
+    # Serve from the question bank first; topics it fully covers only generate flashcards, if any
+    plan, banked_questions = bank_combined_plan(plan, difficulty, freshness)
+    live_topics = [topic for topic, counts in plan.items() if any(counts)]
+    grounding = ground_topics(text, topics)
+    done = {"topics_done": 0, "questions": len(banked_questions), "flashcards": 0}
+    done_lock = threading.Lock()
+    
+    def run_topic(topic: str, _, stop: threading.Event) -> List[Tuple[List[Dict], List[Dict]]]:
+        questions, flashcards = generate_topic_questions_and_flashcards(
+            topic, *plan[topic], difficulty=difficulty, context=grounding.get(topic), stop=stop
+        )
+        if on_progress is not None:
+            with done_lock:
+                done["topics_done"] += 1
+                done["questions"] += len(questions)
+                done["flashcards"] += len(flashcards)
+                counters = dict(done)
+            on_progress(topics_total=len(live_topics), **counters)
+        return [(questions, flashcards)]
+    
+    results = generate_for_topics(live_topics, [1] * len(live_topics), len(live_topics), run_topic)
+    all_questions = banked_questions + [q for questions, _ in results for q in questions]
+    all_flashcards = [card for _, cards in results for card in cards]
+    
+    # Topics that under-delivered: continue with the remaining topics like the separate path would
+    if len(all_questions) < num_questions and n < len(topics):
+        all_questions += generate_for_topics(
+            topics[n:], question_counts[n:], num_questions - len(all_questions),
+            lambda topic, count, stop: research_and_generate_questions_for_topic(
+                topic, count, difficulty=difficulty, context=grounding.get(topic), stop=stop
+            ),
+        )
+    if len(all_flashcards) < num_cards and n < len(topics):
+        all_flashcards += generate_for_topics(
+            topics[n:], card_counts[n:], num_cards - len(all_flashcards),
+            lambda topic, count, stop: research_and_generate_flashcards_for_topic(
+                topic, count, difficulty=difficulty, context=grounding.get(topic), stop=stop
+            ),
+        )
+    
+    all_questions = top_up_unique_questions(all_questions, num_questions, topics, difficulty, grounding)
+    all_questions = order_by_topic(all_questions[:num_questions], topics)
+    all_flashcards = all_flashcards[:num_cards]
+    
+    print(f"\n{'='*70}")
+    print(f"✅ COMBINED GENERATION COMPLETE: {len(all_questions)} questions, {len(all_flashcards)} flashcards from {n} topics")
+    print(f"{'='*70}")
+    
+    return {"questions": all_questions}, {"flashcards": all_flashcards}
+
+
+def stream_quiz_and_flashcards(
+    text: str,
+    num_questions: int = 10,
+    num_cards: int = 10,
+    difficulty: str = "medium",
+    freshness: Optional[float] = None
+) -> Iterator[Tuple[str, Dict]]:
+    """
+    Yield ("questions", item) and ("flashcards", item) as soon as each item is
+    generated, across topics streaming concurrently (arrival order, not topic
+    order). Question bank hits come first, before the document is indexed for
+    grounding. Each question is checked against those already sent and near
+    duplicates are dropped. Stops once both targets are met; like
+    generate_quiz_and_flashcards, remaining topics and then dedup top-ups (within
+    the over-generation budget) make up any shortfall.
+    """
+    topics = extract_all_topics(text, topic_cap(max(num_questions, num_cards)))
+    if not topics:
+        quiz_data, flashcard_data = generate_quiz_and_flashcards(
+            text, num_questions, num_cards, difficulty=difficulty, freshness=freshness
+        )
+        yield from (("questions", q) for q in quiz_data["questions"])
+        yield from (("flashcards", card) for card in flashcard_data["flashcards"])
+        return
+    
+    question_counts = allocate_topic_counts(num_questions, len(topics))
+    card_counts = allocate_topic_counts(num_cards, len(topics))
+    plan = plan_combined_topics(topics, question_counts, card_counts, num_questions, num_cards)
+    n = len(plan)
+    plan, banked_questions = bank_combined_plan(plan, difficulty, freshness)
+    live_plan = {topic: counts for topic, counts in plan.items() if any(counts)}
+    
+    limits = {"questions": num_questions, "flashcards": num_cards}
+    emitted = {"questions": 0, "flashcards": 0}
+    unique = question_deduplicator.stream_filter()
+    sent_questions: List[Dict] = []
+    
+    def admit(kind: str, item: Dict) -> bool:
+        if emitted[kind] >= limits[kind] or (kind == "questions" and not unique.admit(item)):
+            return False
+        emitted[kind] += 1
+        if kind == "questions":
+            sent_questions.append(item)
+        return True
+    
+    for q in banked_questions:
+        if admit("questions", q):
+            yield "questions", q
+    grounding = ground_topics(text, topics)
+    results: "queue.Queue[Optional[Tuple[str, Dict]]]" = queue.Queue()
+    stop = threading.Event()
+    llm_error: Optional[LLMError] = None
+    
+    def run_topic(topic: str, topic_questions: int, topic_cards: int):
+        try:
+            for entry in stream_topic_questions_and_flashcards(
+                topic, topic_questions, topic_cards, difficulty, stop, context=grounding.get(topic)
+            ):
+                results.put(entry)
+        except GenerationStopped:
+            pass
+        except Exception as e:
+            print(f"❌ Topic '{topic}' failed: {e}")
+            if isinstance(e, LLMError):
+                results.put(("error", e))
+        finally:
+            results.put(None)
+    
+    pool = ThreadPoolExecutor(max_workers=max(1, TOPIC_CONCURRENCY), thread_name_prefix="topic-stream")
+    try:
+        for topic, (topic_questions, topic_cards) in live_plan.items():
+            pool.submit(run_topic, topic, topic_questions, topic_cards)
+        
+        running = len(live_plan)
+        while running and emitted != limits:
+            entry = results.get()
+            if entry is None:
+                running -= 1
+                continue
+            kind, item = entry
+            if kind == "error":
+                if isinstance(item, LLMUnavailableError):
+                    raise item
+                llm_error = item
+            elif admit(kind, item):
+                yield kind, item
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+    
+    if llm_error is not None and not any(emitted.values()):
+        raise llm_error
+    
+    # Topics that under-delivered: continue with the remaining topics
+    if emitted["questions"] < num_questions and n < len(topics):
+        for q in generate_for_topics(
+            topics[n:], question_counts[n:], num_questions - emitted["questions"],
+            lambda topic, count, stop: research_and_generate_questions_for_topic(
+                topic, count, difficulty=difficulty, context=grounding.get(topic), stop=stop
+            ),
+        ):
+            if admit("questions", q):
+                yield "questions", q
+    if emitted["flashcards"] < num_cards and n < len(topics):
+        for card in generate_for_topics(
+            topics[n:], card_counts[n:], num_cards - emitted["flashcards"],
+            lambda topic, count, stop: research_and_generate_flashcards_for_topic(
+                topic, count, difficulty=difficulty, context=grounding.get(topic), stop=stop
+            ),
+        ):
+            if admit("flashcards", card):
+                yield "flashcards", card
+    
+    # Replace near duplicates dropped above
+    if emitted["questions"] < num_questions:
+        sent = {id(q) for q in sent_questions}
+        for q in top_up_unique_questions(sent_questions, num_questions, topics, difficulty, grounding):
+            if id(q) not in sent and emitted["questions"] < num_questions:
+                emitted["questions"] += 1
+                yield "questions", q
+
+
 # ============================================================================
 # TEXT EXTRACTION FUNCTIONS
 # ============================================================================
@@ -697,8 +1460,7 @@ def process_document(file_bytes: bytes, filename: str, num_questions: int = 10,
     
     text = aggressive_ocr_cleanup(text)
     
-    quiz_data = generate_mcq_quiz(text, num_questions)
-    flashcard_data = generate_flashcards(text, num_cards)
+    quiz_data, flashcard_data = generate_quiz_and_flashcards(text, num_questions, num_cards)
     
     return {
         "text": text,
@@ -706,4 +1468,4 @@ def process_document(file_bytes: bytes, filename: str, num_questions: int = 10,
         "quiz": quiz_data,
         "flashcards": flashcard_data,
         "success": True
-    }
\ No newline at end of file
+    }
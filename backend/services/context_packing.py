@@ -0,0 +1,103 @@
+"""
+Context packing - turns retrieved chunks into the smallest prompt context that
+still carries the best evidence.
+
+Retrieved chunks overlap by CHUNK_OVERLAP characters and neighbours are often
+retrieved together, so spans are merged by their offsets in the source text
+(dropping the duplicated overlap), ranked by retrieval score and added until the
+token budget is full. The packed spans are emitted in document order.
+"""
+
+import math
+import os
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "450"))
+RAG_RETRIEVE_CANDIDATES = int(os.getenv("RAG_RETRIEVE_CANDIDATES", "8"))
+
+# Chunks this close in the source text (whitespace the splitter stripped) count as adjacent
+MERGE_GAP_CHARS = 4
+
+# Llama-family tokenizers average roughly 4 characters per token on English prose
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+@dataclass
+class _Span:
+    start: int
+    end: int
+    text: str
+    score: float
+
+
+# ============================================================================
+# PACKING
+# ============================================================================
+
+def _merge_spans(spans: List[_Span]) -> List[_Span]:
+    """Merge spans that overlap or touch in the source text, keeping the best score."""
+    merged: List[_Span] = []
+    for span in sorted(spans, key=lambda s: s.start):
+        if merged and span.start <= merged[-1].end + MERGE_GAP_CHARS:
+            current = merged[-1]
+            overlap = current.end - span.start
+            if overlap < len(span.text):
+                joiner = "" if overlap >= 0 else " "
+                current.text += joiner + span.text[max(overlap, 0):]
+                current.end = max(current.end, span.end)
+            current.score = max(current.score, span.score)
+        else:
+            merged.append(_Span(span.start, span.end, span.text, span.score))
+    return merged
+
+
+def pack_context(
+    chunks: Sequence[str],
+    starts: Sequence[int],
+    hits: Sequence[Tuple[int, float]],
+    token_budget: int = RAG_CONTEXT_TOKEN_BUDGET,
+) -> str:
+    """
+    Build a prompt context from (chunk index, L2 distance) hits.
+    starts holds each chunk's offset in the source text; without it chunks are
+    only de-duplicated, not merged.
+    """
+    valid = [(i, d) for i, d in hits if 0 <= i < len(chunks)]
+    if not valid:
+        return ""
+
+    if len(starts) == len(chunks):
+        spans = [_Span(starts[i], starts[i] + len(chunks[i]), chunks[i], -d) for i, d in valid]
+        spans = _merge_spans(spans)
+    else:
+        seen = set()
+        spans = []
+        for rank, (i, d) in enumerate(valid):
+            if chunks[i] not in seen:
+                seen.add(chunks[i])
+                spans.append(_Span(rank, rank, chunks[i], -d))
+
+    # Best evidence first until the budget is spent
+    selected: List[_Span] = []
+    used = 0
+    for span in sorted(spans, key=lambda s: s.score, reverse=True):
+        tokens = estimate_tokens(span.text)
+        if used + tokens <= token_budget:
+            selected.append(span)
+            used += tokens
+        elif not selected:
+            # Even the best span is over budget: keep its leading part
+            selected.append(_Span(span.start, span.end, span.text[:token_budget * CHARS_PER_TOKEN], span.score))
+            break
+
+    return "\n\n".join(span.text for span in sorted(selected, key=lambda s: s.start))
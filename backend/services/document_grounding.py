@@ -0,0 +1,60 @@
+"""
+Document grounding - excerpts of the uploaded document per topic, for quiz and flashcard prompts.
+
+The extracted text is chunked and indexed once with the same MiniLM/FAISS + BM25
+stack /analyze uses (the index registry caches it by content hash, so asking
+again for the same document is free), then one batched retrieval packs each
+topic's best chunks into a token-budgeted excerpt. Prompts built from these
+excerpts replace the per-topic research call. Topics the document barely
+covers (a syllabus that only names them) get no excerpt and keep the research path.
+"""
+
+import os
+import time
+from typing import Dict, List
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# "document": ground prompts in the upload's own chunks; "research": always research topics
+GROUNDING_MODE = os.getenv("GROUNDING_MODE", "document")
+# Prompt tokens of document excerpt per topic
+GROUNDING_TOKEN_BUDGET = int(os.getenv("GROUNDING_TOKEN_BUDGET", "700"))
+# Chunks considered per topic before packing
+GROUNDING_CANDIDATES = int(os.getenv("GROUNDING_CANDIDATES", "8"))
+# Excerpts shorter than this are too thin to write questions from; those topics are researched
+GROUNDING_MIN_CHARS = int(os.getenv("GROUNDING_MIN_CHARS", "300"))
+
+
+def ground_topics(text: str, topics: List[str]) -> Dict[str, str]:
+    """
+    Document excerpt per topic, for the topics the document covers well enough.
+    Topics missing from the result should fall back to research. Never raises:
+    if the index cannot be built, every topic falls back.
+    """
+    if GROUNDING_MODE != "document" or not topics or not text or not text.strip():
+        return {}
+
+    started = time.perf_counter()
+    try:
+        # Imported here: the embedder and FAISS load on first use, not with the routes
+        from services.rag_service import build_vector_store, retrieve_contexts
+
+        doc_index = build_vector_store(text)
+        contexts = retrieve_contexts(doc_index, topics, k=GROUNDING_CANDIDATES, token_budget=GROUNDING_TOKEN_BUDGET)
+    except Exception as e:
+        print(f"⚠️ Document grounding unavailable, researching topics instead: {e}")
+        return {}
+
+    grounded = {
+        topic: context.strip()
+        for topic, context in zip(topics, contexts)
+        if len(context.strip()) >= GROUNDING_MIN_CHARS
+    }
+    print(
+        f"📎 Grounded {len(grounded)}/{len(topics)} topics in the document "
+        f"({time.perf_counter() - started:.2f}s)"
+    )
+    return grounded
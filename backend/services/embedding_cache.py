@@ -0,0 +1,304 @@
+"""
+Embedding cache - content-addressed chunk vectors shared by every /analyze request.
+
+Vectors are keyed by a hash of (model name, chunk text) and stored per model as one
+append-only float32 file that is read back through a memory map, plus an index.json
+mapping keys to rows. When the vector file grows past the size cap, the least
+recently used rows are dropped by rewriting a compacted file under a new generation.
+Each process batches its last-use times and merges them into index.json with its
+next insert, or at least every EMBEDDING_CACHE_TOUCH_FLUSH_SECONDS, so eviction
+follows recency across processes. A reader whose vector file was just compacted
+away re-reads the index once and otherwise treats the lookup as a miss.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from utils.file_lock import FileLock
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+EMBEDDING_CACHE_DIR = Path(os.getenv("EMBEDDING_CACHE_DIR", "data/embedding_cache"))
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "1024")) * 1024 * 1024
+
+# Compaction keeps this fraction of the cap so we don't rewrite on every insert
+EVICTION_TARGET_RATIO = 0.8
+# Longest a process keeps cache hits' last-use times before writing them to index.json
+EMBEDDING_CACHE_TOUCH_FLUSH_SECONDS = float(os.getenv("EMBEDDING_CACHE_TOUCH_FLUSH_SECONDS", "60"))
+
+
+def embedding_key(text: str, model_name: str) -> str:
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+# ============================================================================
+# PER-MODEL STORE
+# ============================================================================
+
+class _ModelStore:
+    """Vector file + row index for one embedding model."""
+
+    def __init__(self, root: Path, model_name: str):
+        self.dir = root / hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:16]
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.model_name = model_name
+        self.index_path = self.dir / "index.json"
+        self.lock_path = self.dir / ".lock"
+
+        self.dim: Optional[int] = None
+        self.generation = 0
+        self.n_rows = 0
+        self.rows: Dict[str, list] = {}  # key -> [row, last_used]
+        self._index_mtime = None
+        self._memmap: Optional[np.memmap] = None
+        # key -> last use by this process, not yet written to index.json
+        self._touched: Dict[str, float] = {}
+        self._touches_flushed_at = time.time()
+
+    @property
+    def vectors_path(self) -> Path:
+        return self.dir / f"vectors.{self.generation}.f32"
+
+    def _file_lock(self):
+        return FileLock(self.lock_path)
+
+    def refresh(self, force: bool = False):
+        """
+        Reload index.json if another process changed it since we last read it.
+        Only its n_rows rows are mapped, so a vector file tail no row points to is ignored.
+        """
+        if force:
+            self._index_mtime = None
+        try:
+            mtime = self.index_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._index_mtime:
+            return
+
+        with self.index_path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        self.dim = data["dim"]
+        self.n_rows = data["n_rows"]
+        self.rows = data["rows"]
+        if data["generation"] != self.generation:
+            self._memmap = None
+        self.generation = data["generation"]
+        self._index_mtime = mtime
+
+    def _vectors(self) -> np.memmap:
+        if self._memmap is None or self._memmap.shape[0] < self.n_rows:
+            self._memmap = np.memmap(self.vectors_path, dtype="float32", mode="r", shape=(self.n_rows, self.dim))
+        return self._memmap
+
+    def lookup(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Cached vectors for keys. Never raises: an unreadable vector file is a miss."""
+        for attempt in range(2):
+            try:
+                self.refresh(force=attempt > 0)
+                found = {key: self.rows[key][0] for key in keys if key in self.rows and self.rows[key][0] < self.n_rows}
+                if not found:
+                    return {}
+                vectors = self._vectors()
+                result = {key: np.array(vectors[row]) for key, row in found.items()}
+                break
+            except (OSError, ValueError) as e:
+                # Another process compacted and unlinked the generation we were about to map
+                self._memmap = None
+                if attempt:
+                    print(f"⚠️ Embedding cache unreadable, encoding instead: {e}")
+                    return {}
+
+        now = time.time()
+        for key in result:
+            self._touched[key] = now
+        if now - self._touches_flushed_at >= EMBEDDING_CACHE_TOUCH_FLUSH_SECONDS:
+            self.flush_touches()
+        return result
+
+    def _merge_touches(self) -> bool:
+        merged = bool(self._touched)
+        for key, last_used in self._touched.items():
+            entry = self.rows.get(key)
+            if entry is not None and last_used > entry[1]:
+                entry[1] = last_used
+        self._touched = {}
+        self._touches_flushed_at = time.time()
+        return merged
+
+    def flush_touches(self):
+        """Write this process's last-use times to index.json so other processes evict by them."""
+        if not self._touched:
+            self._touches_flushed_at = time.time()
+            return
+        try:
+            with self._file_lock():
+                self.refresh()
+                self._merge_touches()
+                self._write_index()
+        except Exception as e:
+            print(f"⚠️ Could not record embedding cache use: {e}")
+
+    def add(self, keys: List[str], vectors: np.ndarray, max_bytes: int):
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+
+        with self._file_lock():
+            self.refresh()
+            touched = self._merge_touches()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+
+            new = {k: v for k, v in zip(keys, vectors) if k not in self.rows}
+            if not new:
+                if touched:
+                    self._write_index()
+                return
+
+            # Bytes past n_rows were left by a write that never reached index.json; overwrite them
+            with self.vectors_path.open("ab") as f:
+                f.truncate(self.n_rows * self.dim * 4)
+                f.write(b"".join(vector.tobytes() for vector in new.values()))
+
+            try:
+                now = time.time()
+                for row, key in enumerate(new, start=self.n_rows):
+                    self.rows[key] = [row, now]
+                self.n_rows += len(new)
+
+                if self.n_rows * self.dim * 4 > max_bytes:
+                    self._compact(int(max_bytes * EVICTION_TARGET_RATIO))
+
+                self._write_index()
+            except BaseException:
+                self._reload()
+                raise
+
+    def _reload(self):
+        """Drop in-memory changes that never reached index.json and read it again."""
+        self.dim = None
+        self.generation = 0
+        self.n_rows = 0
+        self.rows = {}
+        self._memmap = None
+        self.refresh(force=True)
+
+    def _compact(self, target_bytes: int):
+        """Rewrite the vector file keeping only the most recently used rows."""
+        keep_rows = max(1, target_bytes // (self.dim * 4))
+        survivors = sorted(self.rows.items(), key=lambda item: item[1][1], reverse=True)[:keep_rows]
+        old_vectors = np.memmap(self.vectors_path, dtype="float32", mode="r", shape=(self.n_rows, self.dim))
+        old_path = self.vectors_path
+
+        self.generation += 1
+        new_rows = {}
+        with self.vectors_path.open("wb") as f:
+            for new_row, (key, (old_row, last_used)) in enumerate(survivors):
+                f.write(np.asarray(old_vectors[old_row]).tobytes())
+                new_rows[key] = [new_row, last_used]
+
+        print(f"🧹 Embedding cache compacted: {self.n_rows} -> {len(new_rows)} vectors")
+        self.rows = new_rows
+        self.n_rows = len(new_rows)
+        self._memmap = None
+        del old_vectors
+        # Readers still mapping the old file keep a valid view until they refresh
+        old_path.unlink(missing_ok=True)
+
+    def _write_index(self):
+        tmp_path = self.index_path.with_suffix(f".{os.getpid()}.tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump({
+                "model": self.model_name,
+                "dim": self.dim,
+                "generation": self.generation,
+                "n_rows": self.n_rows,
+                "rows": self.rows,
+            }, f)
+        os.replace(tmp_path, self.index_path)
+        self._index_mtime = self.index_path.stat().st_mtime_ns
+
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+class EmbeddingCache:
+    """Encode only the chunks whose vectors are not already on disk."""
+
+    def __init__(self, root: Path = EMBEDDING_CACHE_DIR, max_bytes: int = EMBEDDING_CACHE_MAX_BYTES):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self._stores: Dict[str, _ModelStore] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _store(self, model_name: str) -> _ModelStore:
+        store = self._stores.get(model_name)
+        if store is None:
+            store = self._stores[model_name] = _ModelStore(self.root, model_name)
+        return store
+
+    def encode(
+        self,
+        texts: List[str],
+        encode_fn: Callable[[List[str]], np.ndarray],
+        model_name: str,
+    ) -> np.ndarray:
+        """Return float32 embeddings for texts, calling encode_fn only for cache misses."""
+        if not texts:
+            return np.zeros((0, 0), dtype="float32")
+
+        keys = [embedding_key(text, model_name) for text in texts]
+
+        with self._lock:
+            store = self._store(model_name)
+            cached = store.lookup(keys)
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        with self._lock:
+            self._hits += len(texts) - sum(1 for k in keys if k in missing)
+            self._misses += sum(1 for k in keys if k in missing)
+
+        if missing:
+            fresh = np.asarray(encode_fn(list(missing.values())), dtype="float32")
+            fresh_by_key = dict(zip(missing.keys(), fresh))
+            cached.update(fresh_by_key)
+            try:
+                with self._lock:
+                    store.add(list(missing.keys()), fresh, self.max_bytes)
+            except Exception as e:
+                print(f"⚠️ Could not write embedding cache: {e}")
+
+        return np.stack([cached[key] for key in keys]).astype("float32", copy=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total, 4) if total else 0.0,
+                "max_bytes": self.max_bytes,
+                "stored_vectors": {name: store.n_rows for name, store in self._stores.items()},
+            }
+
+
+embedding_cache = EmbeddingCache()
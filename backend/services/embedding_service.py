@@ -0,0 +1,193 @@
+"""
+Embedding service - dynamic micro-batching for SentenceTransformer encode calls.
+
+Concurrent handlers submit texts and get a Future back. A single worker thread
+collects requests until either EMBED_MAX_BATCH_SIZE texts are queued or
+EMBED_MAX_WAIT_MS has passed since the first one arrived, then runs one forward
+pass for the whole batch, so the CPU isn't thrashed by many tiny encodes.
+"""
+
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, List
+
+import numpy as np
+
+from services.rag_models import get_embedder
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", "64"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+
+# Upper bounds (in texts) of the batch-size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+@dataclass
+class _EncodeRequest:
+    texts: List[str]
+    future: Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+# ============================================================================
+# BATCHER
+# ============================================================================
+
+class EmbeddingBatcher:
+    """Gathers encode requests into micro-batches run on one dedicated thread."""
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = EMBED_MAX_BATCH_SIZE,
+        max_wait_ms: float = EMBED_MAX_WAIT_MS,
+    ):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue: "queue.Queue[_EncodeRequest]" = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._texts = 0
+        self._batches = 0
+        self._encode_seconds = 0.0
+        self._queue_wait_seconds = 0.0
+        self._histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self._histogram_overflow = 0
+
+    def submit(self, texts: List[str]) -> Future:
+        """Queue texts for encoding; the Future resolves to a float32 (len(texts), dim) array."""
+        future: Future = Future()
+        if not texts:
+            future.set_result(np.zeros((0, 0), dtype="float32"))
+            return future
+
+        self._ensure_worker()
+        self._queue.put(_EncodeRequest(list(texts), future))
+        return future
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Blocking encode for code already running in a worker thread."""
+        return self.submit(texts).result()
+
+    async def encode_async(self, texts: List[str]) -> np.ndarray:
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            histogram = {f"<={bucket}": count for bucket, count in self._histogram.items()}
+            histogram[f">{BATCH_SIZE_BUCKETS[-1]}"] = self._histogram_overflow
+            return {
+                "requests": self._requests,
+                "texts": self._texts,
+                "batches": self._batches,
+                "avg_batch_size": round(self._texts / self._batches, 2) if self._batches else 0.0,
+                "texts_per_second": round(self._texts / self._encode_seconds, 1) if self._encode_seconds else 0.0,
+                "avg_queue_wait_ms": round(self._queue_wait_seconds / self._requests * 1000, 2) if self._requests else 0.0,
+                "batch_size_histogram": histogram,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+            }
+
+    # ------------------------------------------------------------------------
+    # worker
+    # ------------------------------------------------------------------------
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+
+    def _next_live_request(self, timeout=None) -> _EncodeRequest:
+        """Dequeue the next request whose caller is still waiting (encode_async callers can cancel)."""
+        while True:
+            request = self._queue.get(timeout=timeout)
+            # Marks the future running, so it can no longer be cancelled under the worker
+            if request.future.set_running_or_notify_cancel():
+                return request
+
+    def _collect_batch(self) -> List[_EncodeRequest]:
+        first = self._next_live_request()
+        batch = [first]
+        size = len(first.texts)
+        deadline = time.perf_counter() + self.max_wait
+
+        # A single oversized request runs alone; otherwise top up until full or timed out
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._next_live_request(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.texts)
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            texts = [text for request in batch for text in request.texts]
+
+            started = time.perf_counter()
+            try:
+                vectors = np.asarray(self.encode_fn(texts), dtype="float32")
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+
+            offset = 0
+            for request in batch:
+                count = len(request.texts)
+                request.future.set_result(vectors[offset:offset + count])
+                offset += count
+
+            self._record(batch, len(texts), started, finished)
+
+    def _record(self, batch: List[_EncodeRequest], n_texts: int, started: float, finished: float):
+        with self._stats_lock:
+            self._requests += len(batch)
+            self._texts += n_texts
+            self._batches += 1
+            self._encode_seconds += finished - started
+            self._queue_wait_seconds += sum(started - request.enqueued_at for request in batch)
+
+            for bucket in BATCH_SIZE_BUCKETS:
+                if n_texts <= bucket:
+                    self._histogram[bucket] += 1
+                    break
+            else:
+                self._histogram_overflow += 1
+
+
+def _encode_with_model(texts: List[str]) -> np.ndarray:
+    return get_embedder().encode(
+        texts,
+        batch_size=EMBED_MAX_BATCH_SIZE,
+        show_progress_bar=False,
+        convert_to_numpy=True,
+    )
+
+
+embedding_service = EmbeddingBatcher(_encode_with_model)
@@ -0,0 +1,157 @@
+"""
+Hybrid retrieval - BM25 fast path in front of dense FAISS search.
+
+RETRIEVAL_MODE:
+  dense  - embed every question and search FAISS (previous behaviour)
+  bm25   - lexical only, no question embedding at all
+  hybrid - questions whose best BM25 hit is a confident match (most of the
+           question's informative terms, clearly ahead of the runner-up) are
+           answered lexically; the rest are embedded in one batch and their
+           dense and BM25 rankings are fused with reciprocal rank fusion.
+
+Hits are returned as (chunk index, distance) pairs, lower is better, so they can
+go straight into pack_context.
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from services.bm25_index import BM25Index
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+RETRIEVAL_MODES = ("dense", "bm25", "hybrid")
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+
+BM25_CONFIDENT_COVERAGE = float(os.getenv("BM25_CONFIDENT_COVERAGE", "0.8"))
+BM25_CONFIDENT_MARGIN = float(os.getenv("BM25_CONFIDENT_MARGIN", "1.3"))
+RRF_K = 60
+
+Hits = List[Tuple[int, float]]
+
+
+# ============================================================================
+# STATS
+# ============================================================================
+
+class RetrievalStats:
+    """Question counts and latency per retrieval path."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._questions: Dict[str, int] = defaultdict(int)
+        self._seconds: Dict[str, float] = defaultdict(float)
+
+    def record(self, path: str, questions: int, seconds: float):
+        if not questions:
+            return
+        with self._lock:
+            self._questions[path] += questions
+            self._seconds[path] += seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            paths = {
+                path: {
+                    "questions": count,
+                    "avg_ms_per_question": round(self._seconds[path] / count * 1000, 3),
+                }
+                for path, count in self._questions.items()
+            }
+            lexical = self._questions.get("lexical_fast_path", 0)
+            hybrid_total = lexical + self._questions.get("fused", 0)
+            return {
+                "mode": RETRIEVAL_MODE,
+                "paths": paths,
+                "lexical_hit_rate": round(lexical / hybrid_total, 4) if hybrid_total else 0.0,
+            }
+
+
+retrieval_stats = RetrievalStats()
+
+
+# ============================================================================
+# RETRIEVAL
+# ============================================================================
+
+def is_confident_lexical_match(bm25: BM25Index, question: str, hits: Hits) -> bool:
+    if not hits:
+        return False
+    top_doc, top_score = hits[0]
+    runner_up = hits[1][1] if len(hits) > 1 else 0.0
+    if runner_up and top_score < BM25_CONFIDENT_MARGIN * runner_up:
+        return False
+    return bm25.coverage(question, top_doc) >= BM25_CONFIDENT_COVERAGE
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int) -> Hits:
+    scores: Dict[int, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += 1.0 / (RRF_K + rank + 1)
+    fused = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+    return [(doc_id, -score) for doc_id, score in fused]
+
+
+def retrieve_hits(
+    index,
+    bm25: BM25Index,
+    n_chunks: int,
+    questions: List[str],
+    k: int,
+    encode: Callable[[List[str]], np.ndarray],
+    mode: str = RETRIEVAL_MODE,
+) -> List[Hits]:
+    """Per-question hit lists; questions needing dense search share one encode + one FAISS query."""
+    k = min(k, n_chunks)
+    if mode not in RETRIEVAL_MODES or bm25 is None:
+        mode = "dense"
+
+    results: List[Hits] = [[] for _ in questions]
+    lexical: List[Hits] = [[] for _ in questions]
+    needs_dense = list(range(len(questions)))
+
+    if mode in ("bm25", "hybrid"):
+        started = time.perf_counter()
+        lexical = [bm25.search(q, k) for q in questions]
+        lexical_seconds = time.perf_counter() - started
+
+        if mode == "bm25":
+            retrieval_stats.record("bm25", len(questions), lexical_seconds)
+            return [[(doc_id, -score) for doc_id, score in hits] for hits in lexical]
+
+        needs_dense = []
+        for i, (question, hits) in enumerate(zip(questions, lexical)):
+            if is_confident_lexical_match(bm25, question, hits):
+                results[i] = [(doc_id, -score) for doc_id, score in hits]
+            else:
+                needs_dense.append(i)
+        answered = len(questions) - len(needs_dense)
+        per_question = lexical_seconds / len(questions) if questions else 0.0
+        retrieval_stats.record("lexical_fast_path", answered, per_question * answered)
+
+    if needs_dense:
+        started = time.perf_counter()
+        q_embs = encode([questions[i] for i in needs_dense])
+        distances, indices = index.search(q_embs, k)
+
+        for row, i in enumerate(needs_dense):
+            dense_hits = [(int(d), float(dist)) for d, dist in zip(indices[row], distances[row]) if d >= 0]
+            if mode == "hybrid":
+                results[i] = reciprocal_rank_fusion(
+                    [[d for d, _ in dense_hits], [d for d, _ in lexical[i]]], k
+                )
+            else:
+                results[i] = dense_hits
+
+        retrieval_stats.record("fused" if mode == "hybrid" else "dense", len(needs_dense), time.perf_counter() - started)
+
+    return results
@@ -0,0 +1,277 @@
+"""
+Job queue - runs slow upload processing (OCR + quiz/flashcard generation) off the request.
+
+A job is a status document (stage, progress counters, result or error) that
+clients poll, while the work runs on a bounded pool of worker threads fed by an
+in-process queue. Job documents live in MongoDB (TTL-indexed) so any API worker
+can answer a status poll; UPLOAD_JOB_STORE=memory keeps them in-process instead,
+which is enough for a single worker or tests. Queued work is held in memory, so
+a job whose process dies stops updating and is reported as failed once stale.
+"""
+
+import os
+import queue
+import threading
+import uuid
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+UPLOAD_JOB_WORKERS = int(os.getenv("UPLOAD_JOB_WORKERS", "2"))
+# Jobs waiting for a worker; further submissions are refused until the queue drains
+UPLOAD_JOB_MAX_PENDING = int(os.getenv("UPLOAD_JOB_MAX_PENDING", "32"))
+UPLOAD_JOB_TTL_SECONDS = int(os.getenv("UPLOAD_JOB_TTL_SECONDS", str(2 * 24 * 3600)))
+# A queued/running job that has not been updated for this long is reported as failed
+UPLOAD_JOB_STALE_SECONDS = int(os.getenv("UPLOAD_JOB_STALE_SECONDS", "1800"))
+# "mongo" or "memory"
+UPLOAD_JOB_STORE = os.getenv("UPLOAD_JOB_STORE", "mongo")
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobQueueFull(Exception):
+    """Every worker is busy and the pending queue is at UPLOAD_JOB_MAX_PENDING."""
+
+
+# ============================================================================
+# JOB STORES
+# ============================================================================
+
+class MemoryJobStore:
+    """Job documents in a dict; they expire after UPLOAD_JOB_TTL_SECONDS like the MongoDB ones."""
+
+    def __init__(self):
+        self._jobs: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job: dict):
+        with self._lock:
+            now = datetime.utcnow()
+            for job_id in [k for k, v in self._jobs.items() if v["expires_at"] <= now]:
+                del self._jobs[job_id]
+            self._jobs[job["_id"]] = dict(job)
+
+    def update(self, job_id: str, fields: dict):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            for key, value in fields.items():
+                # "progress.questions" style keys, as MongoDB's $set understands them
+                if "." in key:
+                    parent, child = key.split(".", 1)
+                    job.setdefault(parent, {})[child] = value
+                else:
+                    job[key] = value
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return {**job, "progress": dict(job["progress"])} if job else None
+
+
+class MongoJobStore:
+    """Job documents in the upload_jobs collection, removed by a TTL index on expires_at."""
+
+    def __init__(self):
+        from db.connection import db
+        self.collection = db["upload_jobs"]
+        self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    def create(self, job: dict):
+        self.collection.insert_one(dict(job))
+
+    def update(self, job_id: str, fields: dict):
+        self.collection.update_one({"_id": job_id}, {"$set": fields})
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self.collection.find_one({"_id": job_id})
+
+
+# ============================================================================
+# PROGRESS
+# ============================================================================
+
+class JobProgress:
+    """Handed to a job handler to report its stage and progress counters."""
+
+    def __init__(self, store, job_id: str):
+        self._store = store
+        self.job_id = job_id
+
+    def _write(self, fields: dict):
+        fields["updated_at"] = datetime.utcnow()
+        try:
+            self._store.update(self.job_id, fields)
+        except Exception as e:
+            # Losing a progress update must not fail the job itself
+            print(f"⚠️ Job {self.job_id} progress update failed: {e}")
+
+    def stage(self, name: str, **progress):
+        """Enter a stage, e.g. "extracting"; progress replaces the counters shown for it."""
+        self._write({"stage": name, "progress": progress})
+
+    def update(self, **progress):
+        self._write({f"progress.{key}": value for key, value in progress.items()})
+
+
+# ============================================================================
+# QUEUE
+# ============================================================================
+
+class JobQueue:
+    """
+    Bounded worker pool over an in-process queue. submit() returns the job id and
+    a Future for callers that want to wait in-process; everyone else polls status().
+    """
+
+    def __init__(
+        self,
+        workers: int = UPLOAD_JOB_WORKERS,
+        max_pending: int = UPLOAD_JOB_MAX_PENDING,
+        store_kind: str = UPLOAD_JOB_STORE,
+    ):
+        self.workers = max(1, workers)
+        self._pending: queue.Queue = queue.Queue(maxsize=max(1, max_pending))
+        self._store_kind = store_kind
+        self._store = None
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def _get_store(self):
+        """Pick the store on first use so importing the routes never blocks on MongoDB."""
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    store = None
+                    if self._store_kind == "mongo":
+                        try:
+                            store = MongoJobStore()
+                        except Exception as e:
+                            print(f"⚠️ Upload jobs falling back to in-memory store: {e}")
+                    self._store = store or MemoryJobStore()
+        return self._store
+
+    def _start_workers(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"upload-job-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, handler: Callable[[dict, JobProgress], dict], payload: dict, info: Optional[dict] = None):
+        """
+        Queue handler(payload, progress) and return (job_id, future). info is stored on
+        the job document for status polls; payload (e.g. file bytes) stays in memory.
+        Raises JobQueueFull when UPLOAD_JOB_MAX_PENDING jobs are already waiting.
+        """
+        self._start_workers()
+        store = self._get_store()
+
+        now = datetime.utcnow()
+        job_id = uuid.uuid4().hex
+        store.create({
+            "_id": job_id,
+            "status": "queued",
+            "stage": "queued",
+            "progress": {},
+            "info": info or {},
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "expires_at": now + timedelta(seconds=UPLOAD_JOB_TTL_SECONDS),
+        })
+
+        future: Future = Future()
+        try:
+            self._pending.put_nowait((job_id, handler, payload, future))
+        except queue.Full:
+            store.update(job_id, {"status": "failed", "error": "Too many uploads in progress", "updated_at": now})
+            raise JobQueueFull(f"{self._pending.qsize()} upload jobs already waiting")
+        return job_id, future
+
+    def _persist(self, store, job_id: str, fields: dict) -> bool:
+        """Write job fields; a store error is logged, never raised into the worker loop."""
+        try:
+            store.update(job_id, fields)
+            return True
+        except Exception as e:
+            print(f"⚠️ Upload job {job_id} status update failed: {e}")
+            return False
+
+    def _work(self):
+        while True:
+            job_id, handler, payload, future = self._pending.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            store = self._get_store()
+            started = datetime.utcnow()
+            self._persist(store, job_id, {"status": "running", "started_at": started, "updated_at": started})
+            try:
+                result = handler(payload, JobProgress(store, job_id))
+            except Exception as e:
+                print(f"❌ Upload job {job_id} failed: {e}")
+                # Resolve the future first: in-process waiters must not depend on the store
+                future.set_exception(e)
+                finished = datetime.utcnow()
+                self._persist(store, job_id, {
+                    "status": "failed", "error": str(e),
+                    "error_type": type(e).__name__,
+                    "finished_at": finished, "updated_at": finished,
+                })
+                continue
+
+            future.set_result(result)
+            finished = datetime.utcnow()
+            saved = self._persist(store, job_id, {
+                "status": "completed", "stage": "completed",
+                "result": result,
+                "finished_at": finished, "updated_at": finished,
+            })
+            if not saved:
+                # e.g. a result the store cannot encode: pollers should not wait on it forever
+                self._persist(store, job_id, {
+                    "status": "failed", "error": "Job finished but its result could not be saved",
+                    "error_type": "JobStoreError",
+                    "finished_at": finished, "updated_at": finished,
+                })
+                continue
+            print(f"✅ Upload job {job_id} completed in {(finished - started).total_seconds():.1f}s")
+
+    def status(self, job_id: str) -> Optional[dict]:
+        job = self._get_store().get(job_id)
+        if job is None:
+            return None
+
+        job["job_id"] = job.pop("_id")
+        job.pop("expires_at", None)
+        if job["status"] in ACTIVE_STATUSES:
+            idle = (datetime.utcnow() - job["updated_at"]).total_seconds()
+            if idle > UPLOAD_JOB_STALE_SECONDS:
+                job["status"] = "failed"
+                job["error"] = "Job stopped reporting progress (the server may have restarted)"
+
+        for key in ("created_at", "updated_at", "started_at", "finished_at"):
+            if isinstance(job.get(key), datetime):
+                job[key] = job[key].isoformat()
+        return job
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": self._pending.qsize(),
+            "max_pending": self._pending.maxsize,
+            "store": type(self._store).__name__ if self._store is not None else None,
+        }
+
+
+upload_job_queue = JobQueue()
@@ -0,0 +1,512 @@
+"""
+LLM client - the one Groq client shared by quiz/flashcard generation and /analyze answers.
+
+Calls run through AsyncGroq and a single pooled httpx.AsyncClient on a dedicated
+event loop thread: coroutines await them without blocking FastAPI's loop, and
+the threaded generators use the same connections through a blocking facade.
+Every attempt passes the Groq rate limiter. 429s, 5xx, timeouts and connection
+errors are retried with jittered exponential backoff (honouring Retry-After),
+and a circuit breaker fails calls fast while the provider keeps failing.
+Failures raise LLMError rather than returning None. With json_mode the response
+is constrained to a JSON object; if Groq rejects the output as invalid JSON, the
+rejected text is returned anyway so callers can salvage the well-formed part.
+"""
+
+import asyncio
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Dict, Iterator, List, Optional
+
+from services.rate_limiter import estimate_request_tokens, groq_rate_limiter
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "16"))
+
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "20"))
+
+# Consecutive provider failures (5xx, timeouts, connection errors) that open the circuit; <= 0 disables it
+LLM_CIRCUIT_FAILURES = int(os.getenv("LLM_CIRCUIT_FAILURES", "5"))
+LLM_CIRCUIT_RESET_SECONDS = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30"))
+
+# Latency samples kept per call label for the percentiles in stats()
+LLM_METRICS_WINDOW = int(os.getenv("LLM_METRICS_WINDOW", "500"))
+
+_STREAM_END = object()
+
+
+class LLMError(Exception):
+    """A Groq call failed: a non-retryable error, or retries ran out."""
+
+
+class LLMUnavailableError(LLMError):
+    """The circuit breaker is open, so the call was not attempted."""
+
+
+# ============================================================================
+# CIRCUIT BREAKER
+# ============================================================================
+
+class CircuitBreaker:
+    """
+    closed: calls go through. After `threshold` consecutive provider failures the
+    circuit opens and calls fail fast; once reset_seconds have passed a single
+    probe call is let through (half-open), and its outcome closes or re-opens it.
+    A probe that ends without a verdict (429, other 4xx, cancellation) is released
+    so the next call can probe instead.
+    """
+
+    def __init__(self, threshold: int, reset_seconds: float):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def admit(self) -> Optional[bool]:
+        """None if the call is refused, else whether it is the half-open probe."""
+        if self.threshold <= 0:
+            return False
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half-open"
+                self._probing = False
+            if self.state == "closed":
+                return False
+            if self.state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return None
+
+    def allow(self) -> bool:
+        return self.admit() is not None
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                print("✅ Groq circuit closed")
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def release(self, probe: bool):
+        """End a call admitted by admit(); a probe that recorded no outcome frees the slot for the next call."""
+        if not probe:
+            return
+        with self._lock:
+            if self.state == "half-open":
+                self._probing = False
+
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.state == "open"
+
+    def record_failure(self):
+        if self.threshold <= 0:
+            return
+        with self._lock:
+            self.failures += 1
+            if self.state == "half-open" or (self.state == "closed" and self.failures >= self.threshold):
+                print(f"🔌 Groq circuit opened after {self.failures} consecutive failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+                self._probing = False
+
+    def retry_in(self) -> float:
+        with self._lock:
+            if self.state != "open":
+                return 0.0
+            return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "times_opened": self.times_opened,
+            }
+
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+def _percentile(samples: List[float], fraction: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class LLMMetrics:
+    """Per-label call counts, token totals and recent latencies."""
+
+    def __init__(self, window: int = LLM_METRICS_WINDOW):
+        self.window = window
+        self._labels: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, label: str) -> dict:
+        entry = self._labels.get(label)
+        if entry is None:
+            entry = self._labels[label] = {
+                "calls": 0, "failed": 0, "rejected": 0, "retries": 0,
+                "prompt_tokens": 0, "completion_tokens": 0,
+                "latencies": deque(maxlen=self.window),
+                "first_token": deque(maxlen=self.window),
+            }
+        return entry
+
+    def record(
+        self,
+        label: str,
+        seconds: float,
+        attempts: int,
+        ok: bool,
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None,
+        first_token_seconds: Optional[float] = None,
+    ):
+        with self._lock:
+            entry = self._entry(label)
+            entry["calls"] += 1
+            entry["failed"] += int(not ok)
+            entry["retries"] += max(0, attempts - 1)
+            entry["prompt_tokens"] += prompt_tokens or 0
+            entry["completion_tokens"] += completion_tokens or 0
+            entry["latencies"].append(seconds)
+            if first_token_seconds is not None:
+                entry["first_token"].append(first_token_seconds)
+
+    def record_rejected(self, label: str):
+        with self._lock:
+            self._entry(label)["rejected"] += 1
+
+    def snapshot(self) -> dict:
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 1) if value is not None else None
+
+        with self._lock:
+            result = {}
+            for label, entry in self._labels.items():
+                latencies = list(entry["latencies"])
+                first_token = list(entry["first_token"])
+                result[label] = {
+                    "calls": entry["calls"],
+                    "failed": entry["failed"],
+                    "rejected": entry["rejected"],
+                    "retries": entry["retries"],
+                    "prompt_tokens": entry["prompt_tokens"],
+                    "completion_tokens": entry["completion_tokens"],
+                    "latency_p50_ms": ms(_percentile(latencies, 0.5)),
+                    "latency_p95_ms": ms(_percentile(latencies, 0.95)),
+                    "first_token_p50_ms": ms(_percentile(first_token, 0.5)),
+                }
+            return result
+
+
+# ============================================================================
+# CLIENT
+# ============================================================================
+
+def _describe(error: Exception) -> str:
+    status = getattr(error, "status_code", None)
+    return f"HTTP {status}" if status else type(error).__name__
+
+
+def _failed_generation(error: Exception) -> Optional[str]:
+    """The completion Groq refused in JSON mode (400 json_validate_failed), if that is what error is."""
+    body = getattr(error, "body", None)
+    details = body.get("error", body) if isinstance(body, dict) else None
+    if getattr(error, "status_code", None) == 400 and isinstance(details, dict) \
+            and details.get("code") == "json_validate_failed":
+        return details.get("failed_generation") or ""
+    return None
+
+
+class LLMClient:
+    """Pooled AsyncGroq client on its own event loop, with retries, a circuit breaker and metrics."""
+
+    def __init__(self):
+        self.breaker = CircuitBreaker(LLM_CIRCUIT_FAILURES, LLM_CIRCUIT_RESET_SECONDS)
+        self.metrics = LLMMetrics()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client = None
+        self._lock = threading.Lock()
+
+    def start(self) -> "LLMClient":
+        """Start the loop thread and build the pooled client; safe to call more than once."""
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    import httpx
+                    from groq import AsyncGroq
+
+                    http_client = httpx.AsyncClient(
+                        limits=httpx.Limits(
+                            max_connections=LLM_MAX_CONNECTIONS,
+                            max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                        ),
+                        timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS),
+                    )
+                    # Retries are ours, so they pass the rate limiter and the circuit breaker
+                    self._client = AsyncGroq(api_key=os.getenv("GROQ_API_KEY"), http_client=http_client, max_retries=0)
+
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="llm-client", daemon=True).start()
+                    self._loop = loop
+        return self
+
+    def _submit(self, coro) -> Future:
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    # ------------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------------
+
+    async def acomplete(
+        self,
+        messages: List[Dict],
+        *,
+        model: str,
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        top_p: float = 1,
+        label: str = "completion",
+        json_mode: bool = False,
+    ) -> str:
+        """Completion text; raises LLMError. Safe to await from any event loop."""
+        return await asyncio.wrap_future(
+            self._submit(self._complete(messages, model, temperature, max_tokens, top_p, label, json_mode))
+        )
+
+    def complete(
+        self,
+        messages: List[Dict],
+        *,
+        model: str,
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        top_p: float = 1,
+        label: str = "completion",
+        json_mode: bool = False,
+    ) -> str:
+        """Blocking acomplete() for worker threads; never call it from an event loop."""
+        return self._submit(
+            self._complete(messages, model, temperature, max_tokens, top_p, label, json_mode)
+        ).result()
+
+    def stream(
+        self,
+        messages: List[Dict],
+        *,
+        model: str,
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        top_p: float = 1,
+        label: str = "completion",
+    ) -> Iterator[str]:
+        """
+        Blocking iterator of text deltas for worker threads. Raises LLMError when the
+        call fails (retries only happen before the first delta); closing the
+        iterator early cancels the request.
+        """
+        deltas: queue.Queue = queue.Queue()
+        future = self._submit(self._stream(messages, model, temperature, max_tokens, top_p, label, deltas.put))
+        try:
+            while True:
+                delta = deltas.get()
+                if delta is _STREAM_END:
+                    break
+                yield delta
+            future.result()
+        finally:
+            future.cancel()
+
+    def stats(self) -> dict:
+        return {"circuit": self.breaker.snapshot(), "calls": self.metrics.snapshot()}
+
+    # ------------------------------------------------------------------------
+    # Attempts (run on the client loop)
+    # ------------------------------------------------------------------------
+
+    def _admit(self, label: str) -> bool:
+        """Admit one logical call through the breaker; returns whether it is the half-open probe."""
+        probe = self.breaker.admit()
+        if probe is None:
+            self.metrics.record_rejected(label)
+            raise LLMUnavailableError(
+                f"Groq is failing, calls paused for another {self.breaker.retry_in():.0f}s"
+            )
+        return probe
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying error, or None if it should be raised."""
+        import groq
+
+        status = getattr(error, "status_code", None)
+        if isinstance(error, groq.APIConnectionError) or (status is not None and status >= 500):
+            # Provider-side failure: counts towards opening the circuit, which ends the retries
+            self.breaker.record_failure()
+            if self.breaker.is_open():
+                return None
+        elif status != 429:
+            return None
+
+        if attempt > LLM_MAX_RETRIES:
+            return None
+
+        delay = random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** (attempt - 1)))
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            delay = max(delay, min(LLM_BACKOFF_MAX_SECONDS, float(retry_after)))
+        except (TypeError, ValueError):
+            pass
+        return delay
+
+    async def _complete(self, messages, model, temperature, max_tokens, top_p, label, json_mode=False) -> str:
+        # The breaker is consulted once per call; retries belong to the call it admitted
+        probe = self._admit(label)
+        try:
+            return await self._complete_attempts(messages, model, temperature, max_tokens, top_p, label, json_mode)
+        finally:
+            self.breaker.release(probe)
+
+    async def _complete_attempts(self, messages, model, temperature, max_tokens, top_p, label, json_mode) -> str:
+        prompt_text = "\n".join(m["content"] for m in messages)
+        options = {"response_format": {"type": "json_object"}} if json_mode else {}
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt += 1
+            reserved = await groq_rate_limiter.acquire_async(estimate_request_tokens(prompt_text, max_tokens))
+            try:
+                response = await self._client.chat.completions.create(
+                    messages=messages,
+                    model=model,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    top_p=top_p,
+                    stream=False,
+                    **options,
+                )
+            except Exception as e:
+                failed_generation = _failed_generation(e) if json_mode else None
+                if failed_generation is not None:
+                    # The provider answered; what it wrote is for the caller to salvage
+                    self.breaker.record_success()
+                    self.metrics.record(label, time.perf_counter() - started, attempt, ok=True)
+                    print(f"⚠️ Groq {label} call returned invalid JSON ({len(failed_generation)} chars)")
+                    return failed_generation
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    self.metrics.record(label, time.perf_counter() - started, attempt, ok=False)
+                    raise LLMError(f"Groq {label} call failed after {attempt} attempt(s): {e}") from e
+                print(f"🔁 Groq {label} call failed ({_describe(e)}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            usage = getattr(response, "usage", None)
+            groq_rate_limiter.settle(reserved, getattr(usage, "total_tokens", None))
+            self.breaker.record_success()
+            seconds = time.perf_counter() - started
+            self.metrics.record(
+                label, seconds, attempt, ok=True,
+                prompt_tokens=getattr(usage, "prompt_tokens", None),
+                completion_tokens=getattr(usage, "completion_tokens", None),
+            )
+            text = response.choices[0].message.content or ""
+            print(f"✅ Groq {label} call: {len(text)} chars in {seconds:.2f}s")
+            return text
+
+    async def _stream(self, messages, model, temperature, max_tokens, top_p, label, emit):
+        try:
+            probe = self._admit(label)
+            try:
+                await self._stream_attempts(messages, model, temperature, max_tokens, top_p, label, emit)
+            finally:
+                self.breaker.release(probe)
+        finally:
+            emit(_STREAM_END)
+
+    async def _stream_attempts(self, messages, model, temperature, max_tokens, top_p, label, emit):
+        prompt_text = "\n".join(m["content"] for m in messages)
+        started = time.perf_counter()
+        first_token = None
+        received = 0
+        attempt = 0
+        while True:
+            attempt += 1
+            reserved = await groq_rate_limiter.acquire_async(estimate_request_tokens(prompt_text, max_tokens))
+            usage = None
+            stream = None
+            try:
+                stream = await self._client.chat.completions.create(
+                    messages=messages,
+                    model=model,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    top_p=top_p,
+                    stream=True,
+                )
+                async for chunk in stream:
+                    # Groq reports usage on the final chunk
+                    chunk_usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+                    if chunk_usage is not None:
+                        usage = chunk_usage
+
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        if first_token is None:
+                            first_token = time.perf_counter() - started
+                        received += len(delta)
+                        emit(delta)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Once text has been handed out a retry would repeat it
+                delay = self._retry_delay(e, attempt) if not received else None
+                if delay is None:
+                    self.metrics.record(label, time.perf_counter() - started, attempt, ok=False,
+                                        first_token_seconds=first_token)
+                    raise LLMError(f"Groq {label} stream failed after {attempt} attempt(s): {e}") from e
+                print(f"🔁 Groq {label} stream failed ({_describe(e)}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            finally:
+                groq_rate_limiter.settle(reserved, getattr(usage, "total_tokens", None))
+                if stream is not None:
+                    await stream.close()
+
+            self.breaker.record_success()
+            seconds = time.perf_counter() - started
+            self.metrics.record(
+                label, seconds, attempt, ok=True,
+                prompt_tokens=getattr(usage, "prompt_tokens", None),
+                completion_tokens=getattr(usage, "completion_tokens", None),
+                first_token_seconds=first_token,
+            )
+            print(f"✅ Groq {label} stream: {received} chars in {seconds:.2f}s")
+            return
+
+
+llm_client = LLMClient()
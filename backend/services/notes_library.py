@@ -0,0 +1,398 @@
+"""
+Notes library - per-user persistent documents for cross-document questions.
+
+A document is ingested once: its chunks are written to disk and its vectors are
+appended to the owner's shard. Each user has their own shard directory holding:
+  manifest.json        document metadata, each document's row range and the embedder id
+  vectors.<gen>.f32    append-only float32 vectors, read through np.memmap
+  docs/<id>.json       chunk texts and offsets
+Search only touches the rows of the requested documents, in fixed-size blocks,
+so one user's large library never has to be loaded into memory, and only the
+most recently used shards stay open.
+
+Deleting a document drops it from the manifest; once deleted rows make up
+LIBRARY_COMPACT_TOMBSTONE_RATIO of the vector file, the live rows are rewritten
+into a new generation. A shard written by a different embedder (EMBEDDER_ID
+changed) is re-embedded from its stored chunks the first time it is used, so
+queries are never scored against vectors from another model or backend.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.context_packing import RAG_CONTEXT_TOKEN_BUDGET, RAG_RETRIEVE_CANDIDATES, pack_context
+from services.embedding_service import embedding_service
+from services.rag_models import EMBEDDER_ID
+from services.rag_service import embed_chunks, split_into_chunks
+from services.vector_index_registry import chunk_offsets
+from utils.file_lock import FileLock
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+LIBRARY_DIR = Path(os.getenv("NOTES_LIBRARY_DIR", "data/notes_library"))
+LIBRARY_MAX_OPEN_SHARDS = int(os.getenv("LIBRARY_MAX_OPEN_SHARDS", "64"))
+# Share of deleted rows in a shard's vector file that triggers a compacting rewrite
+LIBRARY_COMPACT_TOMBSTONE_RATIO = float(os.getenv("LIBRARY_COMPACT_TOMBSTONE_RATIO", "0.5"))
+
+# Rows scored per matrix multiply; bounds memory no matter how large a library is
+SEARCH_BLOCK_ROWS = 65536
+
+# Offsets of different documents are spread this far apart so packing never merges across documents
+_DOC_OFFSET_STRIDE = 10 ** 12
+
+
+def user_shard_id(user_email: str) -> str:
+    return hashlib.sha256(user_email.strip().lower().encode("utf-8")).hexdigest()[:24]
+
+
+def document_id(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+# ============================================================================
+# USER SHARD
+# ============================================================================
+
+class UserShard:
+    """One user's documents, vectors and manifest."""
+
+    def __init__(self, root: Path):
+        self.dir = root
+        self.docs_dir = root / "docs"
+        self.docs_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = root / "manifest.json"
+        self.lock_path = root / ".lock"
+
+        self.manifest = {"embedder": EMBEDDER_ID, "dim": None, "generation": 0, "n_rows": 0, "documents": {}}
+        self._manifest_mtime = None
+        self._memmap: Optional[np.memmap] = None
+        self._chunks: Dict[str, Tuple[List[str], List[int]]] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def vectors_path(self) -> Path:
+        return self.dir / f"vectors.{self.manifest.get('generation', 0)}.f32"
+
+    def refresh(self, force: bool = False):
+        """Reload the manifest if another worker changed it."""
+        if force:
+            self._manifest_mtime = None
+        try:
+            mtime = self.manifest_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._manifest_mtime:
+            with self.manifest_path.open("r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("generation", 0) != self.manifest.get("generation", 0):
+                self._memmap = None
+            self.manifest = manifest
+            self._manifest_mtime = mtime
+
+    def _write_manifest(self, manifest: Optional[dict] = None):
+        """Write manifest (default: the current one) and make it current once it is on disk."""
+        manifest = manifest or self.manifest
+        tmp_path = self.manifest_path.with_suffix(f".{os.getpid()}.tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+        self.manifest = manifest
+        self._manifest_mtime = self.manifest_path.stat().st_mtime_ns
+
+    def _vectors(self) -> np.memmap:
+        n_rows, dim = self.manifest["n_rows"], self.manifest["dim"]
+        if self._memmap is None or self._memmap.shape[0] < n_rows:
+            self._memmap = np.memmap(self.vectors_path, dtype="float32", mode="r", shape=(n_rows, dim))
+        return self._memmap
+
+    def _dead_rows(self) -> int:
+        live = sum(meta["row_end"] - meta["row_start"] for meta in self.manifest["documents"].values())
+        return self.manifest["n_rows"] - live
+
+    def _rewrite(self, reembed: bool):
+        """
+        Write the live documents' vectors into a new generation and drop the old file.
+        reembed encodes every document again from its stored chunks instead of copying rows.
+        Caller holds the file lock.
+        """
+        old_path = self.vectors_path
+        old_vectors = None
+        if not reembed and self.manifest["n_rows"]:
+            old_vectors = np.memmap(old_path, dtype="float32", mode="r", shape=(self.manifest["n_rows"], self.manifest["dim"]))
+
+        generation = self.manifest.get("generation", 0) + 1
+        documents, n_rows, dim = {}, 0, None if reembed else self.manifest["dim"]
+        with (self.dir / f"vectors.{generation}.f32").open("wb") as f:
+            for doc_id, meta in self.manifest["documents"].items():
+                if reembed:
+                    try:
+                        chunks, _ = self.chunks(doc_id)
+                    except (OSError, ValueError) as e:
+                        print(f"⚠️ Dropping {doc_id} from the library, its chunks are unreadable: {e}")
+                        continue
+                    vectors = np.ascontiguousarray(embed_chunks(chunks), dtype="float32")
+                    dim = dim or int(vectors.shape[1])
+                else:
+                    vectors = np.asarray(old_vectors[meta["row_start"]:meta["row_end"]])
+                f.write(vectors.tobytes())
+                documents[doc_id] = dict(meta, row_start=n_rows, row_end=n_rows + len(vectors))
+                n_rows += len(vectors)
+
+        print(
+            f"🧹 Library shard {self.dir.name} {'re-embedded' if reembed else 'compacted'}: "
+            f"{self.manifest['n_rows']} -> {n_rows} vectors"
+        )
+        self.manifest = {
+            "embedder": EMBEDDER_ID,
+            "dim": dim,
+            "generation": generation,
+            "n_rows": n_rows,
+            "documents": documents,
+        }
+        self._write_manifest()
+        self._memmap = None
+        del old_vectors
+        # Readers still mapping the old file keep a valid view until they refresh
+        old_path.unlink(missing_ok=True)
+
+    def _ensure_embedder(self):
+        """Re-embed the shard if its vectors came from a different embedder than this process uses."""
+        if self.manifest.get("embedder") == EMBEDDER_ID or not self.manifest["documents"]:
+            return
+        with FileLock(self.lock_path):
+            self.refresh()
+            if self.manifest.get("embedder") != EMBEDDER_ID and self.manifest["documents"]:
+                print(f"🔁 Library shard {self.dir.name} was embedded with {self.manifest.get('embedder')}, re-embedding")
+                self._rewrite(reembed=True)
+
+    @staticmethod
+    def _describe(doc_id: str, meta: dict) -> dict:
+        return {
+            "document_id": doc_id,
+            "filename": meta["filename"],
+            "chunks": meta["chunks"],
+            "created_at": meta["created_at"],
+        }
+
+    def documents(self) -> List[dict]:
+        with self._lock:
+            self.refresh()
+            return [self._describe(doc_id, meta) for doc_id, meta in self.manifest["documents"].items()]
+
+    def get_document(self, doc_id: str) -> Optional[dict]:
+        with self._lock:
+            self.refresh()
+            meta = self.manifest["documents"].get(doc_id)
+            return self._describe(doc_id, meta) if meta else None
+
+    def add_document(self, doc_id: str, filename: str, chunks: List[str], starts: List[int], vectors: np.ndarray) -> dict:
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+
+        with self._lock:
+            self.refresh()
+            self._ensure_embedder()
+
+        with self._lock, FileLock(self.lock_path):
+            self.refresh()
+            if doc_id in self.manifest["documents"]:
+                return self._describe(doc_id, self.manifest["documents"][doc_id])
+
+            doc_path = self.docs_dir / f"{doc_id}.json"
+            row_start = self.manifest["n_rows"]
+            dim = self.manifest["dim"] or int(vectors.shape[1])
+            document = {
+                "filename": filename,
+                "chunks": len(chunks),
+                "row_start": row_start,
+                "row_end": row_start + len(vectors),
+                "created_at": datetime.now().isoformat(),
+            }
+            try:
+                with doc_path.open("w", encoding="utf-8") as f:
+                    json.dump({"chunks": chunks, "starts": starts}, f)
+
+                # Bytes past n_rows were left by an add that never reached the manifest; overwrite them
+                with self.vectors_path.open("ab") as f:
+                    f.truncate(row_start * dim * 4)
+                    f.write(vectors.tobytes())
+
+                # The manifest in memory only changes once it is on disk
+                self._write_manifest(dict(
+                    self.manifest,
+                    embedder=EMBEDDER_ID,
+                    dim=dim,
+                    n_rows=row_start + len(vectors),
+                    documents={**self.manifest["documents"], doc_id: document},
+                ))
+            except BaseException:
+                doc_path.unlink(missing_ok=True)
+                raise
+            return self._describe(doc_id, document)
+
+    def remove_document(self, doc_id: str) -> bool:
+        with self._lock, FileLock(self.lock_path):
+            self.refresh()
+            if self.manifest["documents"].pop(doc_id, None) is None:
+                return False
+            self._chunks.pop(doc_id, None)
+            (self.docs_dir / f"{doc_id}.json").unlink(missing_ok=True)
+            n_rows = self.manifest["n_rows"]
+            if n_rows and self._dead_rows() >= n_rows * LIBRARY_COMPACT_TOMBSTONE_RATIO:
+                self._rewrite(reembed=False)
+            else:
+                self._write_manifest()
+            return True
+
+    def chunks(self, doc_id: str) -> Tuple[List[str], List[int]]:
+        with self._lock:
+            cached = self._chunks.get(doc_id)
+            if cached is None:
+                with (self.docs_dir / f"{doc_id}.json").open("r", encoding="utf-8") as f:
+                    data = json.load(f)
+                cached = self._chunks[doc_id] = (data["chunks"], data.get("starts", []))
+            return cached
+
+    def search(self, q_embs: np.ndarray, doc_ids: List[str], k: int) -> List[List[Tuple[str, int, float]]]:
+        """Exact L2 top-k over the selected documents: per query, (doc_id, chunk index, distance)."""
+        with self._lock:
+            self.refresh()
+            self._ensure_embedder()
+            for attempt in range(2):
+                try:
+                    self.refresh(force=attempt > 0)
+                    ranges = [
+                        (doc_id, self.manifest["documents"][doc_id]["row_start"], self.manifest["documents"][doc_id]["row_end"])
+                        for doc_id in doc_ids
+                        if doc_id in self.manifest["documents"]
+                    ]
+                    if not ranges or not self.manifest["n_rows"]:
+                        return [[] for _ in range(len(q_embs))]
+                    vectors = self._vectors()
+                    break
+                except (OSError, ValueError):
+                    # Another worker compacted and unlinked the generation we were about to map
+                    self._memmap = None
+                    if attempt:
+                        raise
+
+        q_embs = np.ascontiguousarray(q_embs, dtype="float32")
+        q_norms = (q_embs ** 2).sum(axis=1)
+        candidates: List[List[Tuple[float, str, int]]] = [[] for _ in range(len(q_embs))]
+
+        for doc_id, row_start, row_end in ranges:
+            for block_start in range(row_start, row_end, SEARCH_BLOCK_ROWS):
+                block = np.asarray(vectors[block_start:min(row_end, block_start + SEARCH_BLOCK_ROWS)])
+                distances = q_norms[:, None] - 2 * (q_embs @ block.T) + (block ** 2).sum(axis=1)[None, :]
+
+                take = min(k, block.shape[0])
+                top = np.argpartition(distances, take - 1, axis=1)[:, :take]
+                for qi in range(len(q_embs)):
+                    for j in top[qi]:
+                        candidates[qi].append((float(distances[qi, j]), doc_id, block_start - row_start + int(j)))
+
+        return [
+            [(doc_id, chunk_idx, distance) for distance, doc_id, chunk_idx in sorted(per_query)[:k]]
+            for per_query in candidates
+        ]
+
+
+# ============================================================================
+# LIBRARY
+# ============================================================================
+
+class NotesLibrary:
+    """Routes each user to their shard and keeps only recently used shards open."""
+
+    def __init__(self, root: Path = LIBRARY_DIR, max_open_shards: int = LIBRARY_MAX_OPEN_SHARDS):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_open_shards = max_open_shards
+        self._shards: "OrderedDict[str, UserShard]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def shard(self, user_email: str) -> UserShard:
+        shard_id = user_shard_id(user_email)
+        with self._lock:
+            shard = self._shards.get(shard_id)
+            if shard is None:
+                shard = self._shards[shard_id] = UserShard(self.root / shard_id)
+                while len(self._shards) > self.max_open_shards:
+                    self._shards.popitem(last=False)
+            else:
+                self._shards.move_to_end(shard_id)
+            return shard
+
+    def ingest(self, user_email: str, filename: str, text: str) -> Tuple[dict, bool]:
+        """Store a document for the user; returns (document, created). Re-uploads are no-ops."""
+        shard = self.shard(user_email)
+        doc_id = document_id(text)
+
+        existing = shard.get_document(doc_id)
+        if existing is not None:
+            print(f"♻️ {filename} already in library as {doc_id}")
+            return existing, False
+
+        chunks = split_into_chunks(text)
+        if not chunks:
+            raise ValueError("No chunks could be created from the document")
+        vectors = embed_chunks(chunks)
+
+        document = shard.add_document(doc_id, filename, chunks, chunk_offsets(text, chunks), vectors)
+        print(f"📚 Ingested {filename} as {doc_id} ({len(chunks)} chunks)")
+        return document, True
+
+    def list_documents(self, user_email: str) -> List[dict]:
+        return self.shard(user_email).documents()
+
+    def delete_document(self, user_email: str, doc_id: str) -> bool:
+        return self.shard(user_email).remove_document(doc_id)
+
+    def retrieve_contexts(
+        self,
+        user_email: str,
+        questions: List[str],
+        document_ids: Optional[List[str]] = None,
+        k: int = RAG_RETRIEVE_CANDIDATES,
+        token_budget: int = RAG_CONTEXT_TOKEN_BUDGET,
+    ) -> Tuple[List[str], List[List[str]]]:
+        """
+        Search across the chosen documents (all of the user's by default) and pack
+        one context per question. Also returns the document ids each question's hits came from.
+        """
+        shard = self.shard(user_email)
+        doc_ids = document_ids or [doc["document_id"] for doc in shard.documents()]
+        if not questions or not doc_ids:
+            return ["" for _ in questions], [[] for _ in questions]
+
+        q_embs = embedding_service.encode(questions)
+        all_hits = shard.search(q_embs, doc_ids, k)
+
+        contexts, sources = [], []
+        for hits in all_hits:
+            # Flatten hits from several documents into one chunk list for pack_context
+            chunks, starts, packed_hits = [], [], []
+            doc_slots: Dict[str, int] = {}
+            for doc_id, chunk_idx, distance in hits:
+                doc_chunks, doc_starts = shard.chunks(doc_id)
+                slot = doc_slots.setdefault(doc_id, len(doc_slots))
+                packed_hits.append((len(chunks), distance))
+                chunks.append(doc_chunks[chunk_idx])
+                starts.append(slot * _DOC_OFFSET_STRIDE + doc_starts[chunk_idx])
+            contexts.append(pack_context(chunks, starts, packed_hits, token_budget))
+            sources.append(list(doc_slots))
+
+        return contexts, sources
+
+
+notes_library = NotesLibrary()
@@ -0,0 +1,94 @@
+"""
+Page-parallel native PDF extraction.
+
+Large PDFs are split into page-range shards, each shard is extracted by pypdf in
+a separate process, and the text is reassembled in page order. Small PDFs stay
+on the calling thread, where a process hop would cost more than it saves.
+"""
+
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import List, Tuple
+
+from pypdf import PdfReader
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+PDF_EXTRACT_MAX_WORKERS = int(os.getenv("PDF_EXTRACT_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "24"))
+PDF_MAX_PAGES_PER_SHARD = int(os.getenv("PDF_MAX_PAGES_PER_SHARD", "32"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# ============================================================================
+# WORKER
+# ============================================================================
+
+def _extract_page_range(path: str, start: int, end: int) -> Tuple[int, str]:
+    """Runs in a worker process; opens its own reader since pypdf objects don't pickle."""
+    reader = PdfReader(path)
+    return start, "".join(reader.pages[i].extract_text() or "" for i in range(start, end))
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process that already runs threads (uvicorn, torch) can deadlock
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_EXTRACT_MAX_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def page_shards(n_pages: int, workers: int) -> List[Tuple[int, int]]:
+    """Split pages into contiguous ranges, about two per worker so stragglers even out."""
+    per_shard = max(1, min(PDF_MAX_PAGES_PER_SHARD, math.ceil(n_pages / (workers * 2))))
+    return [(start, min(start + per_shard, n_pages)) for start in range(0, n_pages, per_shard)]
+
+
+# ============================================================================
+# PUBLIC API
+# ============================================================================
+
+def extract_pdf_text(pdf_path: Path | str) -> str:
+    """Native text of every page, in page order, joined without separators."""
+    path = str(pdf_path)
+    reader = PdfReader(path)
+    n_pages = len(reader.pages)
+
+    if n_pages < PDF_PARALLEL_MIN_PAGES or PDF_EXTRACT_MAX_WORKERS <= 1:
+        return "".join(page.extract_text() or "" for page in reader.pages)
+
+    shards = page_shards(n_pages, PDF_EXTRACT_MAX_WORKERS)
+    print(f"  → Extracting {n_pages} pages in {len(shards)} shards across {PDF_EXTRACT_MAX_WORKERS} processes")
+
+    try:
+        pool = _get_pool()
+        futures = [pool.submit(_extract_page_range, path, start, end) for start, end in shards]
+        parts = sorted(future.result() for future in futures)
+    except BrokenProcessPool as e:
+        print(f"  Process pool failed ({e}), extracting sequentially")
+        shutdown_pool()
+        return "".join(page.extract_text() or "" for page in reader.pages)
+
+    return "".join(text for _, text in parts)
@@ -0,0 +1,240 @@
+"""
+Question bank - validated MCQs kept by (normalized topic, difficulty) for reuse across uploads.
+
+Questions the generators validate are added in the background unless the bank
+already holds a near duplicate for the same topic and difficulty (cosine
+similarity of question + answer embeddings). Generators take questions from
+the bank first, least served first, and ask the LLM only for the shortfall.
+Each question is claimed atomically and leased for QUESTION_BANK_LEASE_SECONDS,
+so concurrent uploads on the same topic never receive the same questions.
+The freshness ratio is the share of each request that is always generated anew.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.research_cache import normalize_topic
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+QUESTION_BANK_ENABLED = os.getenv("QUESTION_BANK_ENABLED", "1") == "1"
+# Default share of a request's questions generated fresh (0 = bank first, 1 = never serve from the bank)
+QUESTION_BANK_FRESHNESS = float(os.getenv("QUESTION_BANK_FRESHNESS", "0.3"))
+QUESTION_BANK_DUPLICATE_SIMILARITY = float(os.getenv("QUESTION_BANK_DUPLICATE_SIMILARITY", "0.9"))
+# Questions kept per (topic, difficulty); also bounds the duplicate comparison
+QUESTION_BANK_MAX_PER_TOPIC = int(os.getenv("QUESTION_BANK_MAX_PER_TOPIC", "200"))
+# A served question is not served to another request for this long
+QUESTION_BANK_LEASE_SECONDS = int(os.getenv("QUESTION_BANK_LEASE_SECONDS", "300"))
+
+QUESTION_FIELDS = ("question", "options", "correct_answer", "explanation")
+
+
+def normalize_difficulty(difficulty: str) -> str:
+    difficulty = (difficulty or "").lower().strip()
+    return difficulty if difficulty in ("easy", "hard") else "medium"
+
+
+def normalize_freshness(freshness: Optional[float]) -> float:
+    if freshness is None:
+        freshness = QUESTION_BANK_FRESHNESS
+    return min(1.0, max(0.0, float(freshness)))
+
+
+def question_text(question: Dict) -> str:
+    """What near-duplicate detection compares: the stem plus its correct answer."""
+    options = question.get("options") or []
+    answer = question.get("correct_answer", 0)
+    correct = options[answer] if isinstance(answer, int) and 0 <= answer < len(options) else ""
+    return f"{question.get('question', '')} {correct}".strip()
+
+
+def unit_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype="float32")
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+# ============================================================================
+# BANK
+# ============================================================================
+
+class QuestionBank:
+    """MongoDB question_bank collection, indexed by (topic_key, difficulty, served_count)."""
+
+    def __init__(self, enabled: bool = QUESTION_BANK_ENABLED):
+        self._enabled = enabled
+        self._collection = None
+        self._connect_attempted = False
+
+        self._lock = threading.Lock()
+        # One writer: embedding and duplicate checks stay off the generation path
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="question-bank")
+        self._served = 0
+        self._added = 0
+        self._duplicates = 0
+
+    def _mongo(self):
+        """Connect on first use so importing the generators never blocks on MongoDB."""
+        if not self._enabled or self._connect_attempted:
+            return self._collection
+        with self._lock:
+            if not self._connect_attempted:
+                self._connect_attempted = True
+                try:
+                    from db.connection import db
+                    collection = db["question_bank"]
+                    collection.create_index([("topic_key", 1), ("difficulty", 1), ("served_count", 1)])
+                    self._collection = collection
+                except Exception as e:
+                    print(f"⚠️ Question bank disabled: {e}")
+        return self._collection
+
+    # ------------------------------------------------------------------------
+    # Serving
+    # ------------------------------------------------------------------------
+
+    def take(self, topic: str, difficulty: str, count: int) -> List[Dict]:
+        """
+        Up to count banked questions for topic, least served first. Each one is
+        claimed with a single find_one_and_update that also leases it, so a
+        concurrent take for the same topic moves on to other questions.
+        """
+        collection = self._mongo()
+        if collection is None or count <= 0:
+            return []
+
+        docs = []
+        query = {"topic_key": normalize_topic(topic), "difficulty": normalize_difficulty(difficulty)}
+        try:
+            while len(docs) < count:
+                now = datetime.utcnow()
+                doc = collection.find_one_and_update(
+                    {**query, "$or": [{"leased_until": {"$exists": False}}, {"leased_until": {"$lte": now}}]},
+                    {
+                        "$inc": {"served_count": 1},
+                        "$set": {"last_served_at": now, "leased_until": now + timedelta(seconds=QUESTION_BANK_LEASE_SECONDS)},
+                    },
+                    projection={field: 1 for field in QUESTION_FIELDS},
+                    sort=[("served_count", 1), ("created_at", 1)],
+                )
+                if doc is None:
+                    break
+                docs.append(doc)
+        except Exception as e:
+            # Questions claimed before the failure are still served
+            print(f"⚠️ Question bank lookup failed: {e}")
+
+        with self._lock:
+            self._served += len(docs)
+        return [{**{field: doc.get(field) for field in QUESTION_FIELDS}, "topic": topic} for doc in docs]
+
+    def take_for_topics(
+        self,
+        topics: List[str],
+        counts: List[int],
+        difficulty: str,
+        freshness: Optional[float] = None,
+    ) -> Tuple[List[List[Dict]], List[int]]:
+        """
+        Banked questions per topic and the counts still to generate. At most
+        sum(counts) minus the fresh share comes from the bank, leading topics first.
+        """
+        banked: List[List[Dict]] = [[] for _ in topics]
+        total = sum(counts)
+        budget = total - round(total * normalize_freshness(freshness))
+        if budget <= 0 or self._mongo() is None:
+            return banked, list(counts)
+
+        for i, (topic, count) in enumerate(zip(topics, counts)):
+            if budget <= 0:
+                break
+            banked[i] = self.take(topic, difficulty, min(count, budget))
+            budget -= len(banked[i])
+
+        served = sum(len(questions) for questions in banked)
+        if served:
+            print(f"🏦 Question bank served {served}/{total} questions")
+        return banked, [count - len(questions) for count, questions in zip(counts, banked)]
+
+    # ------------------------------------------------------------------------
+    # Adding
+    # ------------------------------------------------------------------------
+
+    def add(self, questions: List[Dict], difficulty: str):
+        """Queue validated questions for the bank; returns at once."""
+        if questions and self._enabled:
+            snapshot = [{field: q.get(field) for field in QUESTION_FIELDS + ("topic",)} for q in questions]
+            self._writer.submit(self._add_now, snapshot, normalize_difficulty(difficulty))
+
+    def _add_now(self, questions: List[Dict], difficulty: str):
+        collection = self._mongo()
+        if collection is None:
+            return
+
+        by_topic: Dict[str, List[Dict]] = {}
+        for q in questions:
+            if q.get("topic"):
+                by_topic.setdefault(normalize_topic(q["topic"]), []).append(q)
+
+        try:
+            from services.embedding_service import embedding_service
+
+            for topic_key, group in by_topic.items():
+                existing = list(collection.find(
+                    {"topic_key": topic_key, "difficulty": difficulty}, {"embedding": 1}
+                ).limit(QUESTION_BANK_MAX_PER_TOPIC))
+                room = QUESTION_BANK_MAX_PER_TOPIC - len(existing)
+                if room <= 0:
+                    continue
+
+                vectors = unit_rows(embedding_service.encode([question_text(q) for q in group]))
+                banked = [np.frombuffer(doc["embedding"], dtype="float32") for doc in existing if doc.get("embedding")]
+                known = np.stack(banked) if banked else np.zeros((0, vectors.shape[1]), dtype="float32")
+
+                docs = []
+                for q, vector in zip(group, vectors):
+                    # Compared against the bank and against questions accepted from this group
+                    if len(known) and float(np.max(known @ vector)) >= QUESTION_BANK_DUPLICATE_SIMILARITY:
+                        with self._lock:
+                            self._duplicates += 1
+                        continue
+                    known = np.vstack([known, vector])
+                    docs.append({
+                        **{field: q.get(field) for field in QUESTION_FIELDS},
+                        "topic": q["topic"],
+                        "topic_key": topic_key,
+                        "difficulty": difficulty,
+                        "embedding": vector.astype("float32").tobytes(),
+                        "served_count": 0,
+                        "created_at": datetime.utcnow(),
+                    })
+                    if len(docs) >= room:
+                        break
+
+                if docs:
+                    collection.insert_many(docs)
+                    with self._lock:
+                        self._added += len(docs)
+        except Exception as e:
+            print(f"⚠️ Question bank write failed: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "served": self._served,
+                "added": self._added,
+                "duplicates_skipped": self._duplicates,
+                "enabled": self._collection is not None,
+                "default_freshness": QUESTION_BANK_FRESHNESS,
+            }
+
+
+question_bank = QuestionBank()
@@ -0,0 +1,133 @@
+"""
+Question deduplication - drops near-identical MCQs before a quiz is returned.
+
+Overlapping topics ("Paging" and "Page Replacement") tend to produce the same
+question twice. All stems of a quiz are embedded in one batch and compared by
+cosine similarity; a question too close to one already kept is dropped, earlier
+questions winning. The generators then ask only for the shortfall, and never for
+more than QUESTION_OVERGENERATION_BUDGET extra questions per request. Streamed
+quizzes check each question against the ones already sent as it arrives.
+"""
+
+import math
+import os
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from services.question_bank import unit_rows
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+QUESTION_DEDUP_ENABLED = os.getenv("QUESTION_DEDUP_ENABLED", "1") == "1"
+QUESTION_DEDUP_SIMILARITY = float(os.getenv("QUESTION_DEDUP_SIMILARITY", "0.85"))
+# Extra questions a request may generate to replace duplicates, as a share of the requested count
+QUESTION_OVERGENERATION_BUDGET = float(os.getenv("QUESTION_OVERGENERATION_BUDGET", "0.5"))
+
+
+def overgeneration_allowance(num_questions: int) -> int:
+    """How many replacement questions a request for num_questions may generate in total."""
+    if not QUESTION_DEDUP_ENABLED:
+        return 0
+    return math.ceil(num_questions * max(0.0, QUESTION_OVERGENERATION_BUDGET))
+
+
+# ============================================================================
+# DEDUPLICATOR
+# ============================================================================
+
+class QuestionDeduplicator:
+    """Greedy near-duplicate filter over question stems."""
+
+    def __init__(self, threshold: float = QUESTION_DEDUP_SIMILARITY, enabled: bool = QUESTION_DEDUP_ENABLED):
+        self.threshold = threshold
+        self._enabled = enabled
+        self._lock = threading.Lock()
+        self._checked = 0
+        self._dropped = 0
+        self._topped_up = 0
+
+    def dedupe(self, questions: List[Dict]) -> List[Dict]:
+        """questions without near duplicates, in their original order. Never raises."""
+        if not self._enabled or len(questions) < 2:
+            return list(questions)
+
+        try:
+            from services.embedding_service import embedding_service
+            vectors = unit_rows(embedding_service.encode([str(q.get("question", "")) for q in questions]))
+        except Exception as e:
+            print(f"⚠️ Question dedup skipped: {e}")
+            return list(questions)
+
+        # Pairwise similarities in one product; quizzes are tens of questions
+        similarity = vectors @ vectors.T
+        kept: List[int] = []
+        for i in range(len(questions)):
+            if kept and float(np.max(similarity[i, kept])) >= self.threshold:
+                continue
+            kept.append(i)
+
+        dropped = len(questions) - len(kept)
+        self._record(len(questions), dropped)
+        if dropped:
+            print(f"🧹 Dropped {dropped} near-duplicate question(s)")
+        return [questions[i] for i in kept]
+
+    def stream_filter(self) -> "StreamDedupFilter":
+        """A filter for questions that are sent one at a time."""
+        return StreamDedupFilter(self)
+
+    def _record(self, checked: int, dropped: int):
+        with self._lock:
+            self._checked += checked
+            self._dropped += dropped
+
+    def record_top_up(self, count: int):
+        with self._lock:
+            self._topped_up += count
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "checked": self._checked,
+                "dropped": self._dropped,
+                "topped_up": self._topped_up,
+                "threshold": self.threshold,
+                "overgeneration_budget": QUESTION_OVERGENERATION_BUDGET,
+                "enabled": self._enabled,
+            }
+
+
+class StreamDedupFilter:
+    """Incremental version of dedupe: admit() each question before sending it."""
+
+    def __init__(self, deduplicator: QuestionDeduplicator):
+        self._deduplicator = deduplicator
+        self._kept: Optional[np.ndarray] = None
+
+    def admit(self, question: Dict) -> bool:
+        """False if question is a near duplicate of one admitted before. Never raises."""
+        if not self._deduplicator._enabled:
+            return True
+
+        try:
+            from services.embedding_service import embedding_service
+            vector = unit_rows(embedding_service.encode([str(question.get("question", ""))]))
+        except Exception as e:
+            print(f"⚠️ Question dedup skipped: {e}")
+            return True
+
+        duplicate = self._kept is not None and float(np.max(self._kept @ vector[0])) >= self._deduplicator.threshold
+        self._deduplicator._record(1, int(duplicate))
+        if duplicate:
+            print("🧹 Dropped a near-duplicate streamed question")
+            return False
+        self._kept = vector if self._kept is None else np.vstack([self._kept, vector])
+        return True
+
+
+question_deduplicator = QuestionDeduplicator()
@@ -0,0 +1,138 @@
+"""
+RAG model loading - torch/faiss/SentenceTransformer and the Groq client are loaded
+on first use or by a background warm-up, so workers that only serve auth, chat or
+doubt traffic boot without paying for the ML stack.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+GROQ_MODEL_NAME = "llama-3.3-70b-versatile"
+
+# torch       - float32 PyTorch (original behaviour)
+# torch-int8  - PyTorch with dynamic int8 quantization of the Linear layers
+# onnx-int8   - ONNX Runtime CPU with the model repo's pre-quantized int8 export
+EMBEDDING_BACKENDS = ("torch", "torch-int8", "onnx-int8")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+
+# Vectors differ slightly between backends, so caches and indexes are keyed by this
+EMBEDDER_ID = f"{EMBEDDING_MODEL_NAME}:{EMBEDDING_BACKEND}"
+
+# Set RAG_WARMUP=0 to skip the background load and load purely on first request
+RAG_WARMUP = os.getenv("RAG_WARMUP", "1") == "1"
+
+
+# ============================================================================
+# LAZY SINGLETONS
+# ============================================================================
+
+_lock = threading.RLock()
+_embedder = None
+_groq_client = None
+_warmup_error: Optional[str] = None
+
+# Wall time of each heavy load step, reported by /ready
+load_seconds: Dict[str, float] = {}
+
+
+def _timed(step: str, loader):
+    started = time.perf_counter()
+    result = loader()
+    load_seconds[step] = round(time.perf_counter() - started, 3)
+    print(f"⏱️ {step} loaded in {load_seconds[step]}s")
+    return result
+
+
+def load_embedder(backend: str = EMBEDDING_BACKEND):
+    """
+    Build a SentenceTransformer for the given backend. Every backend exposes the
+    same encode() interface, so callers don't care which one is configured.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}', expected one of {EMBEDDING_BACKENDS}")
+
+    if backend == "onnx-int8":
+        # Needs sentence-transformers>=3.2 and `pip install optimum[onnxruntime]`
+        return SentenceTransformer(
+            EMBEDDING_MODEL_NAME,
+            device="cpu",
+            backend="onnx",
+            model_kwargs={"file_name": EMBEDDING_ONNX_FILE},
+        )
+
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME, device="cpu" if backend == "torch-int8" else None)
+
+    if backend == "torch-int8":
+        import torch
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    return model
+
+
+def get_embedder():
+    """Return the shared embedder for EMBEDDING_BACKEND, importing torch and the model on first call."""
+    global _embedder
+    if _embedder is None:
+        with _lock:
+            if _embedder is None:
+                _embedder = _timed(f"sentence_transformers[{EMBEDDING_BACKEND}]", load_embedder)
+    return _embedder
+
+
+def get_groq_client():
+    """The shared LLM client (services.llm_client), started with its connection pool on first call."""
+    global _groq_client
+    if _groq_client is None:
+        with _lock:
+            if _groq_client is None:
+                def _load():
+                    from services.llm_client import llm_client
+                    return llm_client.start()
+                _groq_client = _timed("groq", _load)
+    return _groq_client
+
+
+def warm_up():
+    """Load everything /analyze needs; safe to call more than once."""
+    global _warmup_error
+    try:
+        _timed("faiss", lambda: __import__("faiss"))
+        _timed("langchain_text_splitters", lambda: __import__("langchain_text_splitters"))
+        get_embedder()
+        get_groq_client()
+        _warmup_error = None
+        print("✅ RAG models ready")
+    except Exception as e:
+        _warmup_error = str(e)
+        print(f"❌ RAG warm-up failed: {e}")
+
+
+def start_background_warm_up():
+    if not RAG_WARMUP:
+        return
+    threading.Thread(target=warm_up, name="rag-warmup", daemon=True).start()
+
+
+def is_rag_ready() -> bool:
+    return _embedder is not None and _groq_client is not None
+
+
+def readiness() -> dict:
+    return {
+        "serving": True,
+        "rag_ready": is_rag_ready(),
+        "rag_error": _warmup_error,
+        "embedding_backend": EMBEDDING_BACKEND,
+        "load_seconds": dict(load_seconds),
+    }
@@ -0,0 +1,191 @@
+"""
+RAG service - the notes question-answering pipeline behind /analyze and the notes library.
+
+Extraction, chunking, embedding, index lookup, context packing and concurrent
+answer generation live here; app.py and the library routes only handle HTTP.
+"""
+
+import asyncio
+import os
+from pathlib import Path
+
+from services.answer_cache import answer_cache, answer_cache_key
+from services.context_packing import (
+    RAG_CONTEXT_TOKEN_BUDGET, RAG_RETRIEVE_CANDIDATES, estimate_tokens, pack_context,
+)
+from services.embedding_cache import embedding_cache
+from services.embedding_service import embedding_service
+from services.hybrid_retrieval import retrieve_hits
+from services.pdf_extraction import extract_pdf_text
+from services.llm_client import LLMError, llm_client
+from services.rag_models import EMBEDDER_ID, GROQ_MODEL_NAME
+from services.vector_index_registry import index_registry, DocumentIndex
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+CHUNK_SIZE = 550
+CHUNK_OVERLAP = 80
+
+# Bump whenever the answer prompt below changes so cached answers are not reused
+ANSWER_PROMPT_VERSION = "v1"
+
+# Max Groq calls in flight per /analyze request (a full sheet is 25 questions)
+ANALYZE_MAX_CONCURRENCY = int(os.getenv("ANALYZE_MAX_CONCURRENCY", "25"))
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def extract_text(pdf_path: Path | str) -> str:
+    path = Path(pdf_path)
+    print(f"Extracting: {path.name}")
+
+    try:
+        text = extract_pdf_text(path).strip()
+        if len(text) > 250:
+            print(f"  → Native text extracted ({len(text)} chars)")
+            return text
+    except Exception as e:
+        print(f"  Native extraction failed: {e}")
+
+    return ""
+
+
+def split_into_chunks(text: str) -> list[str]:
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+    chunks = splitter.split_text(text)
+    print(f"Created {len(chunks)} chunks")
+    return chunks
+
+
+def embed_chunks(chunks: list[str]):
+    """Embed chunks, encoding only the ones not already in the embedding cache."""
+    return embedding_cache.encode(chunks, encode_fn=embedding_service.encode, model_name=EMBEDDER_ID)
+
+
+def build_vector_store(text: str) -> DocumentIndex:
+    """Return the index for these notes, reusing a saved one when the notes were seen before."""
+    if not text.strip():
+        raise ValueError("No text could be extracted from the document")
+
+    return index_registry.get_or_build(
+        text,
+        chunker=split_into_chunks,
+        embed=embed_chunks,
+        namespace=f"{EMBEDDER_ID}:{CHUNK_SIZE}:{CHUNK_OVERLAP}",
+    )
+
+
+def retrieve_contexts(
+    doc_index: DocumentIndex,
+    questions: list[str],
+    k: int = RAG_RETRIEVE_CANDIDATES,
+    token_budget: int = RAG_CONTEXT_TOKEN_BUDGET,
+) -> list[str]:
+    """
+    Retrieve hits for all questions (BM25 fast path, then one batched encode + FAISS
+    query for the rest, per RETRIEVAL_MODE), and pack each question's hits into a
+    de-duplicated, token-budgeted context.
+    """
+    documents = doc_index.chunks
+    if not questions or not documents:
+        return ["" for _ in questions]
+
+    all_hits = retrieve_hits(
+        doc_index.index,
+        doc_index.bm25,
+        len(documents),
+        questions,
+        k,
+        encode=embedding_service.encode,
+    )
+
+    return [pack_context(documents, doc_index.starts, hits, token_budget) for hits in all_hits]
+
+
+def retrieve_context(doc_index: DocumentIndex, question: str, k: int = RAG_RETRIEVE_CANDIDATES) -> str:
+    return retrieve_contexts(doc_index, [question], k)[0]
+
+
+def build_answer_prompt(context: str, question: str) -> str:
+    return f"""You are a helpful teaching assistant.
+Answer the question concisely and accurately using **only** the provided context.
+If the context doesn't contain the answer, say so clearly.
+
+Context:
+{context}
+
+Question: {question}
+
+Answer:"""
+
+
+def log_prompt_tokens(contexts: list[str], questions: list[str]):
+    """Per-request prompt size, to track what context packing saves."""
+    prompt_tokens = [estimate_tokens(build_answer_prompt(c, q)) for c, q in zip(contexts, questions)]
+    context_tokens = sum(estimate_tokens(c) for c in contexts)
+    print(
+        f"🧮 Prompt tokens for {len(questions)} questions: {sum(prompt_tokens)} total "
+        f"({context_tokens} context, max {max(prompt_tokens, default=0)} per prompt, "
+        f"budget {RAG_CONTEXT_TOKEN_BUDGET}/question)"
+    )
+
+
+async def generate_answer(context: str, question: str) -> tuple[str, bool]:
+    """Return (answer, served_from_cache)."""
+    if len(context.strip()) < 40:
+        return "Not enough relevant information found in the provided notes.", False
+
+    cache_key = answer_cache_key(GROQ_MODEL_NAME, ANSWER_PROMPT_VERSION, context, question)
+    # The cache may go to MongoDB, so keep it off the event loop
+    cached_answer = await asyncio.to_thread(answer_cache.get, cache_key)
+    if cached_answer is not None:
+        return cached_answer, True
+
+    prompt = build_answer_prompt(context, question)
+
+    try:
+        answer = await llm_client.acomplete(
+            [{"role": "user", "content": prompt}],
+            model=GROQ_MODEL_NAME,
+            temperature=0.25,
+            max_tokens=400,
+            label="answer",
+        )
+    except LLMError as e:
+        return f"[Generation failed: {str(e)}]", False
+
+    answer = answer.strip()
+    await asyncio.to_thread(answer_cache.set, cache_key, answer)
+    return answer, False
+
+
+def schedule_answers(contexts: list[str], questions: list[str]) -> list[asyncio.Task]:
+    """Start one generate_answer task per question, bounded by ANALYZE_MAX_CONCURRENCY."""
+    semaphore = asyncio.Semaphore(ANALYZE_MAX_CONCURRENCY)
+
+    async def _answer(index: int, context: str, question: str) -> tuple[int, str, bool]:
+        async with semaphore:
+            answer, cached = await generate_answer(context, question)
+        return index, answer, cached
+
+    return [
+        asyncio.create_task(_answer(i, c, q))
+        for i, (c, q) in enumerate(zip(contexts, questions))
+    ]
+
+
+async def generate_answers(contexts: list[str], questions: list[str]) -> list[tuple[str, bool]]:
+    """Run generate_answer for every question concurrently; (answer, cached) pairs in question order."""
+    results = await asyncio.gather(*schedule_answers(contexts, questions))
+    return [(answer, cached) for _, answer, cached in results]
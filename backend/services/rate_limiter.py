@@ -0,0 +1,142 @@
+"""
+Rate limiter - token buckets for Groq's requests-per-minute and tokens-per-minute limits.
+
+A call reserves one request plus an estimate of its tokens before it is sent, and
+settles the difference once the API reports real usage. Underestimates leave the
+token bucket in debt, which later callers wait out, so the limit holds on average
+even though completion lengths are only known afterwards.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Optional
+
+from services.context_packing import estimate_tokens
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Defaults match Groq's free tier for llama-3.3-70b-versatile; <= 0 disables a limit
+GROQ_REQUESTS_PER_MINUTE = int(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30"))
+GROQ_TOKENS_PER_MINUTE = int(os.getenv("GROQ_TOKENS_PER_MINUTE", "12000"))
+
+# Completion tokens reserved up front; settle() corrects it once usage is known
+GROQ_COMPLETION_TOKEN_ESTIMATE = int(os.getenv("GROQ_COMPLETION_TOKEN_ESTIMATE", "1200"))
+
+
+def estimate_request_tokens(prompt_text: str, max_tokens: int) -> int:
+    return estimate_tokens(prompt_text) + min(max_tokens, GROQ_COMPLETION_TOKEN_ESTIMATE)
+
+
+# ============================================================================
+# TOKEN BUCKET
+# ============================================================================
+
+class TokenBucket:
+    """Holds up to capacity units, refilled continuously; the level may go negative (debt)."""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.level = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount units are available (0 if they are now)."""
+        self._refill()
+        deficit = amount - self.level
+        return deficit / self.refill_per_second if deficit > 0 else 0.0
+
+    def consume(self, amount: float):
+        self._refill()
+        self.level -= amount
+
+    def give_back(self, amount: float):
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+# ============================================================================
+# LIMITER
+# ============================================================================
+
+class RateLimiter:
+    """Blocks callers until both the request and token budgets allow another call."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests: Optional[TokenBucket] = (
+            TokenBucket(requests_per_minute, requests_per_minute / 60) if requests_per_minute > 0 else None
+        )
+        self.tokens: Optional[TokenBucket] = (
+            TokenBucket(tokens_per_minute, tokens_per_minute / 60) if tokens_per_minute > 0 else None
+        )
+        self._lock = threading.Lock()
+
+    def _clamp(self, tokens: int) -> int:
+        if self.tokens is not None:
+            return min(tokens, int(self.tokens.capacity))
+        return tokens
+
+    def _try_reserve(self, tokens: int) -> float:
+        """Reserve one request plus tokens and return 0, or return the seconds to wait first."""
+        with self._lock:
+            wait = 0.0
+            if self.requests is not None:
+                wait = max(wait, self.requests.wait_time(1))
+            if self.tokens is not None:
+                wait = max(wait, self.tokens.wait_time(tokens))
+
+            if wait <= 0:
+                if self.requests is not None:
+                    self.requests.consume(1)
+                if self.tokens is not None:
+                    self.tokens.consume(tokens)
+            return wait
+
+    def acquire(self, tokens: int) -> int:
+        """Wait for capacity and reserve one request plus tokens; returns the tokens reserved."""
+        tokens = self._clamp(tokens)
+        waited = 0.0
+        while True:
+            wait = self._try_reserve(tokens)
+            if wait <= 0:
+                if waited >= 1:
+                    print(f"⏳ Rate limiter held a Groq call for {waited:.1f}s")
+                return tokens
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self, tokens: int) -> int:
+        """acquire() for coroutines: waits with asyncio.sleep instead of blocking the loop."""
+        tokens = self._clamp(tokens)
+        waited = 0.0
+        while True:
+            wait = self._try_reserve(tokens)
+            if wait <= 0:
+                if waited >= 1:
+                    print(f"⏳ Rate limiter held a Groq call for {waited:.1f}s")
+                return tokens
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def settle(self, reserved: int, used: Optional[int]):
+        """Correct a reservation with the tokens the API actually counted."""
+        if self.tokens is None or used is None:
+            return
+        with self._lock:
+            if used < reserved:
+                self.tokens.give_back(reserved - used)
+            else:
+                self.tokens.consume(used - reserved)
+
+
+groq_rate_limiter = RateLimiter(GROQ_REQUESTS_PER_MINUTE, GROQ_TOKENS_PER_MINUTE)
@@ -0,0 +1,177 @@
+"""
+Research cache - reuses topic research across quiz/flashcard generation and across users.
+
+Keyed by (research prompt version, difficulty, normalized topic). The first tier is
+an in-process TTL LRU; a MongoDB collection with a TTL index is the shared second
+tier, so popular topics are researched once per TTL rather than once per upload.
+Concurrent requests for the same key wait for a single research call.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from utils.ttl_cache import TTLCache
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+RESEARCH_CACHE_TTL_SECONDS = int(os.getenv("RESEARCH_CACHE_TTL_SECONDS", str(14 * 24 * 3600)))
+RESEARCH_CACHE_MAX_ENTRIES = int(os.getenv("RESEARCH_CACHE_MAX_ENTRIES", "2000"))
+RESEARCH_CACHE_MONGO = os.getenv("RESEARCH_CACHE_MONGO", "1") == "1"
+
+
+def normalize_topic(topic: str) -> str:
+    """Lowercase, drop leading numbering/bullets and collapse whitespace and punctuation."""
+    topic = topic.strip().lower()
+    topic = re.sub(r"^(\d+[\.\)]|[•\-*])\s*", "", topic)
+    topic = re.sub(r"[^\w\s()+#]", " ", topic)
+    return re.sub(r"\s+", " ", topic).strip()
+
+
+def research_cache_key(prompt_version: str, difficulty: str, topic: str) -> str:
+    digest = hashlib.sha256()
+    for part in (prompt_version, difficulty.lower().strip(), normalize_topic(topic)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+class ResearchCache:
+    """In-memory TTL LRU in front of a MongoDB collection with a TTL index."""
+
+    def __init__(self, use_mongo: bool = RESEARCH_CACHE_MONGO):
+        self.memory = TTLCache(RESEARCH_CACHE_MAX_ENTRIES, RESEARCH_CACHE_TTL_SECONDS)
+        self._use_mongo = use_mongo
+        self._collection = None
+
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._memory_hits = 0
+        self._mongo_hits = 0
+        self._misses = 0
+
+    def _mongo(self):
+        """Connect on first use so importing the generators never blocks on MongoDB."""
+        if not self._use_mongo:
+            return self._collection
+        with self._lock:
+            if self._use_mongo:
+                self._use_mongo = False
+                try:
+                    from db.connection import db
+                    collection = db["topic_research"]
+                    # Mongo removes documents once expires_at has passed
+                    collection.create_index("expires_at", expireAfterSeconds=0)
+                    self._collection = collection
+                except Exception as e:
+                    print(f"⚠️ Research cache MongoDB tier disabled: {e}")
+        return self._collection
+
+    def _lookup(self, key: str) -> Optional[str]:
+        research = self.memory.get(key)
+        if research is not None:
+            self._count("memory")
+            return research
+
+        collection = self._mongo()
+        if collection is not None:
+            try:
+                doc = collection.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+            except Exception as e:
+                print(f"⚠️ Research cache lookup failed: {e}")
+                doc = None
+            if doc:
+                remaining = (doc["expires_at"] - datetime.utcnow()).total_seconds()
+                self.memory.set(key, doc["research"], ttl_seconds=remaining)
+                self._count("mongo")
+                return doc["research"]
+
+        return None
+
+    def _store(self, key: str, topic: str, difficulty: str, research: str):
+        self.memory.set(key, research)
+
+        collection = self._mongo()
+        if collection is not None:
+            try:
+                collection.update_one(
+                    {"_id": key},
+                    {"$set": {
+                        "topic": normalize_topic(topic),
+                        "difficulty": difficulty,
+                        "research": research,
+                        "expires_at": datetime.utcnow() + timedelta(seconds=RESEARCH_CACHE_TTL_SECONDS),
+                    }},
+                    upsert=True,
+                )
+            except Exception as e:
+                print(f"⚠️ Research cache write failed: {e}")
+
+    def get_or_research(
+        self,
+        topic: str,
+        difficulty: str,
+        prompt_version: str,
+        research_fn: Callable[[], Optional[str]],
+    ) -> Optional[str]:
+        """Return cached research, or run research_fn once and cache a non-empty result."""
+        key = research_cache_key(prompt_version, difficulty, topic)
+
+        research = self._lookup(key)
+        if research is not None:
+            return research
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        try:
+            with key_lock:
+                # Another thread may have researched this topic while we waited
+                research = self.memory.get(key)
+                if research is not None:
+                    self._count("memory")
+                    return research
+
+                self._count("miss")
+                research = research_fn()
+                if research:
+                    self._store(key, topic, difficulty, research)
+        finally:
+            with self._lock:
+                self._key_locks.pop(key, None)
+        return research
+
+    def _count(self, outcome: str):
+        with self._lock:
+            if outcome == "memory":
+                self._memory_hits += 1
+            elif outcome == "mongo":
+                self._mongo_hits += 1
+            else:
+                self._misses += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._memory_hits + self._mongo_hits + self._misses
+            hits = self._memory_hits + self._mongo_hits
+            return {
+                "memory_hits": self._memory_hits,
+                "mongo_hits": self._mongo_hits,
+                "misses": self._misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                "memory_entries": len(self.memory),
+                "mongo_enabled": self._collection is not None,
+            }
+
+
+research_cache = ResearchCache()
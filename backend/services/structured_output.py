@@ -0,0 +1,204 @@
+"""
+Structured output - parsing and validating the JSON items LLM generation returns.
+
+Generation prompts ask for one object of item arrays, e.g. {"questions": [...],
+"flashcards": [...]}, and non-streamed calls request Groq's JSON mode. A response
+that parses is used whole; otherwise every well-formed item is salvaged from the
+broken arrays with JsonArrayItemParser, so one bad item or a truncated completion
+no longer costs the whole response. Items are then validated against pydantic
+schemas and invalid ones dropped, leaving callers to re-prompt for the shortfall.
+"""
+
+import json
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+from pydantic import BaseModel, Field, ValidationError, field_validator, model_validator
+
+from utils.json_stream import JsonArrayItemParser
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Ask Groq for JSON-mode output on non-streamed generation calls
+LLM_JSON_MODE = os.getenv("LLM_JSON_MODE", "1") == "1"
+# Follow-up calls asking only for the items still missing after validation (0 = accept the shortfall)
+STRUCTURED_OUTPUT_REPROMPTS = int(os.getenv("STRUCTURED_OUTPUT_REPROMPTS", "1"))
+
+OPTION_LETTERS = "ABCD"
+
+
+# ============================================================================
+# ITEM SCHEMAS
+# ============================================================================
+
+def _as_text(value):
+    """Strip strings; numbers (numeric options and answers) become text, anything else fails validation."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = str(value)
+    return value.strip() if isinstance(value, str) else value
+
+
+class QuestionItem(BaseModel):
+    """An MCQ with four non-empty options and the index of the correct one."""
+    question: str = Field(min_length=1)
+    options: List[str] = Field(min_length=4)
+    correct_answer: int
+    explanation: Optional[str] = None
+
+    @field_validator("question", "explanation", mode="before")
+    @classmethod
+    def _text(cls, value):
+        return _as_text(value)
+
+    @field_validator("options", mode="before")
+    @classmethod
+    def _option_texts(cls, value):
+        return [_as_text(option) for option in value] if isinstance(value, list) else value
+
+    @field_validator("options")
+    @classmethod
+    def _options_filled(cls, value):
+        if not all(value):
+            raise ValueError("options must not be empty")
+        return value[:4]
+
+    @field_validator("correct_answer", mode="before")
+    @classmethod
+    def _answer_letter(cls, value):
+        # "B" or "b" as well as 1
+        if isinstance(value, str) and len(value.strip()) == 1 and value.strip().upper() in OPTION_LETTERS:
+            return OPTION_LETTERS.index(value.strip().upper())
+        return value
+
+    @model_validator(mode="after")
+    def _answer_in_range(self):
+        if not 0 <= self.correct_answer < len(self.options):
+            raise ValueError("correct_answer must index one of the four options")
+        return self
+
+
+class FlashcardItem(BaseModel):
+    """A flashcard with a non-empty front and back."""
+    front: str = Field(min_length=1)
+    back: str = Field(min_length=1)
+
+    @field_validator("front", "back", mode="before")
+    @classmethod
+    def _text(cls, value):
+        return _as_text(value)
+
+
+# ============================================================================
+# PARSING
+# ============================================================================
+
+class StructuredOutputStats:
+    """Counters for /generation/stats."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.responses = 0
+        self.salvaged = 0
+        self.items_valid = 0
+        self.items_rejected = 0
+        self.reprompts = 0
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "responses": self.responses,
+                "salvaged_responses": self.salvaged,
+                "items_valid": self.items_valid,
+                "items_rejected": self.items_rejected,
+                "reprompts": self.reprompts,
+                "json_mode": LLM_JSON_MODE,
+            }
+
+
+structured_output_stats = StructuredOutputStats()
+
+
+def parse_json_object(response: Optional[str]) -> Optional[Dict]:
+    """The JSON object in response, allowing text or a markdown fence around it; None if it does not parse."""
+    if not response:
+        return None
+    start, end = response.find("{"), response.rfind("}")
+    if start < 0 or end <= start:
+        return None
+    try:
+        data = json.loads(response[start:end + 1])
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def salvage_items(response: Optional[str], keys: Iterable[str]) -> Dict[str, list]:
+    """
+    Raw items of each named array: all of them when the response parses, otherwise
+    every item object that is itself well-formed.
+    """
+    keys = list(keys)
+    structured_output_stats.add(responses=1)
+    data = parse_json_object(response)
+    if data is not None:
+        return {key: data[key] if isinstance(data.get(key), list) else [] for key in keys}
+
+    items: Dict[str, list] = {key: [] for key in keys}
+    if response:
+        for key, item in JsonArrayItemParser(keys).feed(response):
+            items[key].append(item)
+        structured_output_stats.add(salvaged=1)
+        print(f"🩹 Salvaged {sum(len(found) for found in items.values())} item(s) from malformed JSON")
+    return items
+
+
+# ============================================================================
+# VALIDATION
+# ============================================================================
+
+def _validated(items: Optional[list], schema):
+    valid = []
+    for item in items or []:
+        try:
+            valid.append(schema.model_validate(item))
+        except ValidationError:
+            pass
+    structured_output_stats.add(items_valid=len(valid), items_rejected=len(items or []) - len(valid))
+    return valid
+
+
+def validate_questions(questions: Optional[list], topic: str) -> List[Dict]:
+    """MCQs that pass QuestionItem, as dicts tagged with topic."""
+    return [
+        {
+            "question": item.question,
+            "options": item.options,
+            "correct_answer": item.correct_answer,
+            "explanation": item.explanation or f"This is the correct answer about {topic}.",
+            "topic": topic,
+        }
+        for item in _validated(questions, QuestionItem)
+    ]
+
+
+def validate_flashcards(flashcards: Optional[list], topic: str) -> List[Dict]:
+    """Flashcards that pass FlashcardItem, with the question/answer aliases the frontend reads."""
+    return [
+        {"front": item.front, "back": item.back, "question": item.front, "answer": item.back, "topic": topic}
+        for item in _validated(flashcards, FlashcardItem)
+    ]
+
+
+ITEM_VALIDATORS: Dict[str, Callable[[Optional[list], str], List[Dict]]] = {
+    "questions": validate_questions,
+    "flashcards": validate_flashcards,
+}
@@ -0,0 +1,201 @@
+"""
+Topic extraction - ranked, capped topics for quiz and flashcard generation.
+
+Every topic costs at least one Groq call, so instead of returning every fragment
+of the document this picks the few phrases that best describe it:
+  1. One pass splits the text into segments (lines, bullets, list separators,
+     sentences) and collects candidate phrases: short heading-like segments and
+     capitalized phrases inside longer prose.
+  2. Candidates are scored by TF-IDF salience of their words, treating segments as
+     documents: words repeated across the notes score high, words found in nearly
+     every segment (or only once) score low.
+  3. Candidates with the same stemmed word set merge, and a candidate whose words
+     mostly overlap an already selected topic is skipped.
+Work is linear in the text length apart from sorting the candidates.
+"""
+
+import math
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from services.bm25_index import STOPWORDS
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+TOPIC_EXTRACTION_MAX = int(os.getenv("TOPIC_EXTRACTION_MAX", "12"))
+# Questions (or flashcards) each topic should carry; sets how many topics are kept
+TOPIC_ITEMS_PER_TOPIC = int(os.getenv("TOPIC_ITEMS_PER_TOPIC", "2"))
+
+MAX_TOPIC_WORDS = 6
+MAX_TOPIC_CHARS = 80
+DUPLICATE_JACCARD = 0.5
+
+# Structural words that never make a topic on their own
+GENERIC_WORDS = {
+    "unit", "chapter", "module", "section", "part", "lecture", "lesson", "page", "topic", "topics",
+    "introduction", "intro", "overview", "basics", "basic", "concept", "concepts", "summary",
+    "notes", "note", "example", "examples", "syllabus", "contents", "table", "figure", "fig",
+    "definition", "etc", "ie", "eg", "also", "using", "used", "use", "types", "type",
+}
+
+SEGMENT_SPLIT_RE = re.compile(r"[\n\r;|,•▪●◦–—:]|\s-\s|\.\s+")
+PREFIX_RE = re.compile(r"^\s*(?:\(?[0-9ivxIVX]+[\.\)]|[a-zA-Z][\.\)]|[-*>])\s+")
+WORD_RE = re.compile(r"[A-Za-z][A-Za-z0-9+#]*")
+CAPITALIZED_RE = re.compile(
+    r"\b[A-Z][A-Za-z0-9+#]*(?:\s+(?:of|and|in|for|the|to|&)?\s*[A-Z][A-Za-z0-9+#]*)*(?:\s*\([A-Z]{2,}\))?"
+)
+
+
+def topic_cap(num_items: int) -> int:
+    """How many topics to generate num_items questions or flashcards from."""
+    return max(1, min(TOPIC_EXTRACTION_MAX, math.ceil(num_items / max(1, TOPIC_ITEMS_PER_TOPIC))))
+
+
+def stem(word: str) -> str:
+    word = word.lower()
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("ses", "xes", "ches", "shes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def content_stems(phrase: str) -> List[str]:
+    stems = []
+    for word in WORD_RE.findall(phrase):
+        lowered = word.lower()
+        if lowered in STOPWORDS or lowered in GENERIC_WORDS or len(lowered) < 2:
+            continue
+        stems.append(stem(lowered))
+    return stems
+
+
+@dataclass
+class TopicCandidate:
+    text: str
+    stems: List[str]
+    occurrences: int = 0
+    headings: int = 0
+    score: float = 0.0
+    key: str = field(default="", repr=False)
+
+
+# ============================================================================
+# EXTRACTION
+# ============================================================================
+
+def _clean(segment: str) -> str:
+    segment = PREFIX_RE.sub("", segment.strip()).strip(" .,;:!?'\"[]{}*#-_")
+    # List separators inside parentheses leave halves like "Algorithms (FIFO" and "Optimal)"
+    if segment.count("(") > segment.count(")"):
+        segment = segment[:segment.rfind("(")]
+    elif segment.count(")") > segment.count("("):
+        segment = segment[:segment.rfind(")")]
+    return segment.strip(" .,;:!?'\"[]{}*#-_")
+
+
+def rank_topic_candidates(text: str) -> List[TopicCandidate]:
+    """All distinct candidates, best first."""
+    term_counts: Counter = Counter()
+    doc_freq: Counter = Counter()
+    candidates: Dict[str, TopicCandidate] = {}
+    n_segments = 0
+
+    def add_candidate(phrase: str, stems: List[str], heading: bool):
+        key = " ".join(sorted(set(stems)))
+        candidate = candidates.get(key)
+        if candidate is None:
+            candidate = candidates[key] = TopicCandidate(text=phrase, stems=sorted(set(stems)), key=key)
+        candidate.occurrences += 1
+        candidate.headings += int(heading)
+
+    for raw_segment in SEGMENT_SPLIT_RE.split(text):
+        segment = _clean(raw_segment)
+        if not segment:
+            continue
+        stems = content_stems(segment)
+        if not stems:
+            continue
+
+        n_segments += 1
+        term_counts.update(stems)
+        doc_freq.update(set(stems))
+
+        words = segment.split()
+        if len(words) <= MAX_TOPIC_WORDS and len(segment) <= MAX_TOPIC_CHARS:
+            add_candidate(segment, stems, heading=True)
+        else:
+            for match in CAPITALIZED_RE.finditer(segment):
+                phrase = _clean(match.group())
+                phrase_stems = content_stems(phrase)
+                if phrase_stems and len(phrase.split()) <= MAX_TOPIC_WORDS:
+                    add_candidate(phrase, phrase_stems, heading=False)
+
+    if not candidates:
+        return []
+
+    weights = {
+        term: math.log(1 + count) * math.log(1 + n_segments / doc_freq[term])
+        for term, count in term_counts.items()
+    }
+    for candidate in candidates.values():
+        salience = sum(weights.get(s, 0.0) for s in candidate.stems) / math.sqrt(len(candidate.stems))
+        repeat_bonus = 1 + 0.5 * math.log(candidate.occurrences)
+        heading_bonus = 1.2 if candidate.headings else 1.0
+        candidate.score = salience * repeat_bonus * heading_bonus
+
+    return sorted(candidates.values(), key=lambda c: c.score, reverse=True)
+
+
+def _is_near_duplicate(stems: set, selected: List[set]) -> bool:
+    for other in selected:
+        overlap = len(stems & other)
+        if not overlap:
+            continue
+        if stems <= other or other <= stems or overlap / len(stems | other) >= DUPLICATE_JACCARD:
+            return True
+    return False
+
+
+def extract_topics(text: str, max_topics: int = TOPIC_EXTRACTION_MAX) -> List[str]:
+    """Up to max_topics salient, mutually distinct topic phrases, best first."""
+    topics: List[str] = []
+    selected: List[set] = []
+    for candidate in rank_topic_candidates(text):
+        if len(topics) >= max_topics:
+            break
+        stems = set(candidate.stems)
+        if _is_near_duplicate(stems, selected):
+            continue
+        selected.append(stems)
+        topics.append(candidate.text)
+    return topics
+
+
+# ============================================================================
+# TOPIC PLANNING
+# ============================================================================
+
+def allocate_topic_counts(total: int, num_topics: int) -> List[int]:
+    """Spread total items over topics: at least one each, earlier topics take the remainder."""
+    per_topic = max(1, total // num_topics)
+    extra = total % num_topics
+    return [per_topic + (1 if i < extra else 0) for i in range(num_topics)]
+
+
+def topics_needed(counts: List[int], target: int) -> int:
+    """How many leading topics the sequential loop would process to reach target items."""
+    total = 0
+    for i, count in enumerate(counts):
+        if total >= target:
+            return i
+        total += count
+    return len(counts)
@@ -0,0 +1,262 @@
+"""
+Document index registry - content-addressed FAISS indexes for the /analyze RAG flow.
+
+Each set of notes is identified by a hash of its text (plus the chunking/embedding
+settings), so the same notes uploaded again reuse the saved index instead of being
+re-chunked and re-embedded. Indexes live on disk and a bounded LRU keeps the hot
+ones in memory.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from services.ann_index import build_index, configure_search, index_nbytes
+from services.bm25_index import BM25Index
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+INDEX_DIR = Path(os.getenv("VECTOR_INDEX_DIR", "data/vector_indexes"))
+INDEX_CACHE_MAX_BYTES = int(os.getenv("VECTOR_INDEX_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+INDEX_FILENAME = "index.faiss"
+CHUNKS_FILENAME = "chunks.json"
+BM25_FILENAME = "bm25.json"
+
+
+# ============================================================================
+# DOCUMENT INDEX
+# ============================================================================
+
+@dataclass
+class DocumentIndex:
+    """A FAISS index together with the chunk texts its vectors point to."""
+    doc_hash: str
+    index: "faiss.Index"
+    chunks: List[str]
+    # Offset of each chunk in the source text, used to merge overlapping chunks
+    starts: List[int] = field(default_factory=list)
+    # Lexical index over the same chunks, for the hybrid retrieval fast path
+    bm25: Optional[BM25Index] = None
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate in-memory size, used for the LRU memory cap."""
+        chunk_bytes = sum(len(chunk) for chunk in self.chunks)
+        bm25_bytes = 0
+        if self.bm25 is not None:
+            bm25_bytes = 16 * sum(len(posting) for posting in self.bm25.postings.values())
+        return index_nbytes(self.index) + chunk_bytes + bm25_bytes
+
+
+def chunk_offsets(text: str, chunks: List[str]) -> List[int]:
+    """Locate each chunk in the text, scanning forward like the splitter produced them."""
+    starts = []
+    cursor = 0
+    for chunk in chunks:
+        start = text.find(chunk, cursor)
+        if start < 0:
+            start = text.find(chunk)
+        if start < 0:
+            return []
+        starts.append(start)
+        cursor = start + 1
+    return starts
+
+
+# ============================================================================
+# REGISTRY
+# ============================================================================
+
+class DocumentIndexRegistry:
+    """Disk-backed store of document indexes with an in-memory LRU in front."""
+
+    def __init__(self, root: Path = INDEX_DIR, max_bytes: int = INDEX_CACHE_MAX_BYTES):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self._lru: "OrderedDict[str, DocumentIndex]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._build_locks: Dict[str, threading.Lock] = {}
+
+    @staticmethod
+    def content_hash(text: str, namespace: str = "") -> str:
+        """Hash notes text together with the settings that shaped its index."""
+        digest = hashlib.sha256()
+        digest.update(namespace.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_or_build(
+        self,
+        text: str,
+        chunker: Callable[[str], List[str]],
+        embed: Callable[[List[str]], np.ndarray],
+        namespace: str = "",
+    ) -> DocumentIndex:
+        """
+        Return the index for these notes, building it only if it has never been seen.
+        Lookup order: memory LRU -> disk -> chunk + embed + save.
+        """
+        doc_hash = self.content_hash(text, namespace)
+
+        doc_index = self._get_cached(doc_hash)
+        if doc_index is not None:
+            print(f"♻️ Reusing in-memory index {doc_hash[:12]}")
+            return doc_index
+
+        # One builder per document; concurrent requests for the same notes wait for it
+        build_lock = self._build_lock(doc_hash)
+        try:
+            with build_lock:
+                doc_index = self._get_cached(doc_hash)
+                if doc_index is not None:
+                    return doc_index
+
+                doc_index = self._load(doc_hash)
+                if doc_index is not None:
+                    if not doc_index.starts:
+                        doc_index.starts = chunk_offsets(text, doc_index.chunks)
+                    print(f"💾 Loaded index {doc_hash[:12]} from disk ({len(doc_index.chunks)} chunks)")
+                else:
+                    chunks = chunker(text)
+                    if not chunks:
+                        raise ValueError("No chunks could be created from the document")
+                    embeddings = np.ascontiguousarray(embed(chunks), dtype="float32")
+                    doc_index = DocumentIndex(
+                        doc_hash,
+                        build_index(embeddings),
+                        chunks,
+                        chunk_offsets(text, chunks),
+                        BM25Index.build(chunks),
+                    )
+                    self._save(doc_index)
+                    print(f"🆕 Built index {doc_hash[:12]} ({len(chunks)} chunks)")
+
+                self._put(doc_index)
+        finally:
+            # Waiters already hold the lock object; later requests find the index cached
+            with self._lock:
+                if self._build_locks.get(doc_hash) is build_lock:
+                    del self._build_locks[doc_hash]
+
+        return doc_index
+
+    def get(self, doc_hash: str) -> Optional[DocumentIndex]:
+        """Fetch an index by hash from memory or disk without building it."""
+        doc_index = self._get_cached(doc_hash)
+        if doc_index is None:
+            doc_index = self._load(doc_hash)
+            if doc_index is not None:
+                self._put(doc_index)
+        return doc_index
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_memory": len(self._lru),
+                "memory_bytes": self._bytes,
+                "memory_cap_bytes": self.max_bytes,
+            }
+
+    # ------------------------------------------------------------------------
+    # internals
+    # ------------------------------------------------------------------------
+
+    def _build_lock(self, doc_hash: str) -> threading.Lock:
+        with self._lock:
+            return self._build_locks.setdefault(doc_hash, threading.Lock())
+
+    def _get_cached(self, doc_hash: str) -> Optional[DocumentIndex]:
+        with self._lock:
+            doc_index = self._lru.get(doc_hash)
+            if doc_index is not None:
+                self._lru.move_to_end(doc_hash)
+            return doc_index
+
+    def _put(self, doc_index: DocumentIndex):
+        with self._lock:
+            if doc_index.doc_hash in self._lru:
+                self._lru.move_to_end(doc_index.doc_hash)
+                return
+
+            self._lru[doc_index.doc_hash] = doc_index
+            self._bytes += doc_index.nbytes
+
+            # Evict least recently used, but always keep the entry just added
+            while self._bytes > self.max_bytes and len(self._lru) > 1:
+                evicted_hash, evicted = self._lru.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def _path(self, doc_hash: str) -> Path:
+        return self.root / doc_hash
+
+    def _save(self, doc_index: DocumentIndex):
+        import faiss
+
+        final_dir = self._path(doc_index.doc_hash)
+        tmp_dir = self.root / f".{doc_index.doc_hash}.{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+
+        try:
+            faiss.write_index(doc_index.index, str(tmp_dir / INDEX_FILENAME))
+            with (tmp_dir / CHUNKS_FILENAME).open("w", encoding="utf-8") as f:
+                json.dump({"chunks": doc_index.chunks, "starts": doc_index.starts}, f)
+            if doc_index.bm25 is not None:
+                with (tmp_dir / BM25_FILENAME).open("w", encoding="utf-8") as f:
+                    json.dump(doc_index.bm25.to_dict(), f)
+
+            # Rename is atomic, so readers never see a half-written index
+            if final_dir.exists():
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+            else:
+                tmp_dir.rename(final_dir)
+        except Exception as e:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            print(f"⚠️ Could not persist index {doc_index.doc_hash[:12]}: {e}")
+
+    def _load(self, doc_hash: str) -> Optional[DocumentIndex]:
+        import faiss
+
+        path = self._path(doc_hash)
+        index_file = path / INDEX_FILENAME
+        chunks_file = path / CHUNKS_FILENAME
+
+        if not (index_file.exists() and chunks_file.exists()):
+            return None
+
+        try:
+            index = configure_search(faiss.read_index(str(index_file)))
+            with chunks_file.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+
+            bm25_file = path / BM25_FILENAME
+            if bm25_file.exists():
+                with bm25_file.open("r", encoding="utf-8") as f:
+                    bm25 = BM25Index.from_dict(json.load(f))
+            else:
+                # Index saved before BM25 existed; rebuilding it is cheap
+                bm25 = BM25Index.build(data["chunks"])
+
+            return DocumentIndex(doc_hash, index, data["chunks"], data.get("starts", []), bm25)
+        except Exception as e:
+            print(f"⚠️ Corrupt index {doc_hash[:12]} on disk, rebuilding: {e}")
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+
+
+index_registry = DocumentIndexRegistry()
@@ -0,0 +1,25 @@
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: single-process use only
+    fcntl = None
+
+
+class FileLock:
+    """Exclusive lock across worker processes sharing a data directory."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._fh = None
+
+    def __enter__(self):
+        self._fh = self.path.open("a")
+        if fcntl is not None:
+            fcntl.flock(self._fh, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._fh, fcntl.LOCK_UN)
+        self._fh.close()
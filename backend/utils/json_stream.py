@@ -0,0 +1,122 @@
+"""
+Incremental JSON parsing for streamed LLM responses.
+
+Generation prompts ask for one object such as {"questions": [...], "flashcards": [...]}.
+JsonArrayItemParser is fed the completion as it streams and returns each object of
+a watched top-level array as soon as that object closes, without waiting for the
+rest of the response. Text before the opening brace (e.g. "Here is the JSON:" or a
+markdown fence) and after the closing brace is ignored.
+"""
+
+import json
+from typing import Iterable, List, Optional, Tuple
+
+
+class JsonArrayItemParser:
+    """Streaming extractor for objects inside named arrays of the top-level JSON object."""
+
+    def __init__(self, keys: Iterable[str]):
+        self.keys = set(keys)
+        self.done = False
+
+        self._buf = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start: Optional[int] = None
+        self._last_string: Optional[str] = None
+        self._pending_key: Optional[str] = None
+        self._array_key: Optional[str] = None
+        self._array_depth: Optional[int] = None
+        self._item_start: Optional[int] = None
+
+    def feed(self, text: str) -> List[Tuple[str, dict]]:
+        """Consume more text; return (array key, object) for every item completed by it."""
+        items: List[Tuple[str, dict]] = []
+        if self.done:
+            return items
+
+        self._buf += text
+        buf = self._buf
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._string_start is not None:
+                        try:
+                            self._last_string = json.loads(buf[self._string_start:i + 1])
+                        except ValueError:
+                            self._last_string = None
+                        self._string_start = None
+
+            elif not self._stack:
+                # Before the top-level object: skip everything but its opening brace
+                if ch == "{":
+                    self._stack.append("{")
+
+            elif ch == '"':
+                self._in_string = True
+                # Only keys of the top-level object need decoding
+                if len(self._stack) == 1:
+                    self._string_start = i
+
+            elif ch == ":":
+                if len(self._stack) == 1:
+                    self._pending_key = self._last_string
+
+            elif ch == ",":
+                if len(self._stack) == 1:
+                    self._pending_key = None
+                    self._last_string = None
+
+            elif ch == "{":
+                if self._array_key is not None and len(self._stack) == self._array_depth:
+                    self._item_start = i
+                self._stack.append("{")
+
+            elif ch == "[":
+                self._stack.append("[")
+                if len(self._stack) == 2 and self._pending_key in self.keys:
+                    self._array_key = self._pending_key
+                    self._array_depth = len(self._stack)
+
+            elif ch in "}]":
+                self._stack.pop()
+                depth = len(self._stack)
+                if ch == "}" and self._item_start is not None and depth == self._array_depth:
+                    try:
+                        item = json.loads(buf[self._item_start:i + 1])
+                    except ValueError:
+                        item = None
+                    if isinstance(item, dict):
+                        items.append((self._array_key, item))
+                    self._item_start = None
+                elif ch == "]" and self._array_depth is not None and depth == self._array_depth - 1:
+                    self._array_key = None
+                    self._array_depth = None
+                if not self._stack:
+                    self.done = True
+                    break
+
+            i += 1
+
+        self._compact(i)
+        return items
+
+    def _compact(self, pos: int):
+        """Drop consumed text that no open item or key still points into."""
+        keep_from = min(p for p in (pos, self._item_start, self._string_start) if p is not None)
+        self._buf = self._buf[keep_from:]
+        self._pos = pos - keep_from
+        if self._item_start is not None:
+            self._item_start -= keep_from
+        if self._string_start is not None:
+            self._string_start -= keep_from
@@ -0,0 +1,14 @@
+import json
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+
+def format_stream_record(record: dict, stream_format: str) -> str:
+    """One NDJSON line, or one SSE event named after the record's type."""
+    payload = json.dumps(record, ensure_ascii=False)
+    if stream_format == "sse":
+        return f"event: {record['type']}\ndata: {payload}\n\n"
+    return payload + "\n"